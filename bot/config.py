@@ -1,6 +1,7 @@
 import os
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
+from typing import FrozenSet
 
 load_dotenv()
 
@@ -8,7 +9,30 @@ load_dotenv()
 class Settings(BaseSettings):
     BOT_TOKEN: str
     ADMIN_TELEGRAM_ID: int
+    # Дополнительные администраторы через запятую: "123,456"
+    ADMIN_TELEGRAM_IDS: str = ""
     DATABASE_URL: str = "sqlite+aiosqlite:///data/bot.db"
+    # Реплика для отчётов и статистики; пусто — основная БД
+    # (для SQLite чтение всё равно идёт через отдельные read-only соединения)
+    DATABASE_READ_URL: str = ""
+    # Пул соединений и кэш подготовленных запросов (PostgreSQL/asyncpg)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    # Клиент Bot API: пул соединений, повторы, предохранитель
+    TELEGRAM_POOL_LIMIT: int = 100
+    TELEGRAM_KEEPALIVE: int = 60
+    TELEGRAM_RETRY_ATTEMPTS: int = 3
+    TELEGRAM_BREAKER_THRESHOLD: int = 5
+    TELEGRAM_BREAKER_COOLDOWN: int = 30
+    # Свой сервер Bot API (локальный или tools/fake_telegram_api.py); пусто — api.telegram.org
+    TELEGRAM_API_URL: str = ""
+    # Часовой пояс команды по умолчанию: дедлайны, «сегодня», отображение времени
+    TIMEZONE: str = "Europe/Minsk"
+    # Как часто (сек) каждый экземпляр перечитывает роли, команды и часовые пояса
+    INDEX_REFRESH_SECONDS: int = 60
     LOG_LEVEL: str = "INFO"
     
     class Config:
@@ -16,7 +40,12 @@ class Settings(BaseSettings):
         case_sensitive = True
         env_file_encoding = "utf-8"
         extra = "ignore"
+    
+    @property
+    def admin_ids(self) -> FrozenSet[int]:
+        """Все Telegram ID администраторов из конфигурации"""
+        extra_ids = {int(value) for value in self.ADMIN_TELEGRAM_IDS.split(",") if value.strip()}
+        return frozenset({self.ADMIN_TELEGRAM_ID} | extra_ids)
 
 
 settings = Settings()
-
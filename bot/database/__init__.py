@@ -1,5 +1,4 @@
-from .database import init_db, get_session
-from .models import Base, User, Task, GroupAnalytics, GroupMember, CleanupLog
-
-__all__ = ["init_db", "get_session", "Base", "User", "Task", "GroupAnalytics", "GroupMember", "CleanupLog"]
+from .database import init_db, get_session, insert_ignore, upsert, after_commit, read_only
+from .models import Base, User, Task, GroupAnalytics, GroupMember, GroupRoster, CleanupLog, TeamMembership, OutboxMessage, Broadcast, BroadcastRecipient, TaskTemplate, JobLease, ManagerReport, TaskEvent, ExportWatermark
 
+__all__ = ["init_db", "get_session", "insert_ignore", "upsert", "after_commit", "read_only", "Base", "User", "Task", "GroupAnalytics", "GroupMember", "GroupRoster", "CleanupLog", "TeamMembership", "OutboxMessage", "Broadcast", "BroadcastRecipient", "TaskTemplate", "JobLease", "ManagerReport", "TaskEvent", "ExportWatermark"]
@@ -1,17 +1,61 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import bindparam, event, inspect, insert, or_, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import sqlite, postgresql
 from bot.config import settings
 from bot.database.models import Base
+from bot.database.types import UTCDateTime
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Sequence
+from zoneinfo import ZoneInfo
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _engine_options(url: str) -> Dict[str, Any]:
+    """Параметры движка под конкретный бэкенд"""
+    backend = make_url(url).get_backend_name()
+    if backend == "postgresql":
+        return {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+            "connect_args": {
+                "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+                "server_settings": {"application_name": "gruzcobot", "timezone": "UTC"},
+            },
+        }
+    if backend == "sqlite":
+        # Ожидание блокировки вместо мгновенной ошибки "database is locked"
+        return {"connect_args": {"timeout": 30}}
+    return {"pool_pre_ping": True}
+
+
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=False,
-    future=True
+    future=True,
+    **_engine_options(settings.DATABASE_URL)
 )
 
+
+@event.listens_for(engine.sync_engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    if engine.dialect.name != "sqlite":
+        return
+    # WAL: читатели не блокируются единственным писателем
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -19,10 +63,254 @@ async_session_maker = async_sessionmaker(
 )
 
 
+def _create_read_engine():
+    """Движок для тяжёлых чтений (отчёты, статистика, поиск).
+
+    PostgreSQL — реплика из DATABASE_READ_URL, SQLite — отдельный пул
+    соединений только для чтения к тому же файлу: в режиме WAL они не
+    блокируют запись. Без реплики и для SQLite в памяти чтение идёт
+    через основной движок.
+    """
+    url = settings.DATABASE_READ_URL or settings.DATABASE_URL
+    parsed = make_url(url)
+    if not settings.DATABASE_READ_URL and (
+        parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:")
+    ):
+        return engine
+    return create_async_engine(url, echo=False, future=True, **_engine_options(url))
+
+
+read_engine = _create_read_engine()
+
+
+if read_engine is not engine:
+    @event.listens_for(read_engine.sync_engine, "connect")
+    def _configure_sqlite_reader(dbapi_connection, connection_record):
+        if read_engine.dialect.name != "sqlite":
+            return
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+read_session_maker = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+
+@dataclass
+class QueryStats:
+    """Счётчики запросов и commit в рамках одного апдейта"""
+    queries: int = 0
+    commits: int = 0
+
+
+# Устанавливается middleware на время обработки апдейта
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+_AFTER_COMMIT = "after_commit_callbacks"
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    stats = query_stats.get()
+    if stats is not None:
+        stats.queries += 1
+
+
+event.listen(engine.sync_engine, "before_cursor_execute", _count_query)
+if read_engine is not engine:
+    event.listen(read_engine.sync_engine, "before_cursor_execute", _count_query)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    stats = query_stats.get()
+    if stats is not None:
+        stats.commits += 1
+    for callback in session.info.pop(_AFTER_COMMIT, ()):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in after-commit callback: {e}", exc_info=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session):
+    session.info.pop(_AFTER_COMMIT, None)
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], None]):
+    """Выполнить callback после успешного commit сессии; при откате он отбрасывается.
+
+    Так побочные эффекты в памяти (пробуждение outbox, трекер дедлайнов,
+    сброс кэшей) не срабатывают для несохранённых изменений.
+    """
+    session.info.setdefault(_AFTER_COMMIT, []).append(callback)
+
+
+def read_only(method):
+    """Пометить метод сервиса как только читающий.
+
+    Метод выполняется в короткой сессии на движке чтения, поэтому отчёты
+    не занимают соединения и блокировки, нужные записи задач. Новая сессия
+    видит только зафиксированные данные (реплика ещё и с отставанием),
+    так что помечать стоит отчёты и статистику, а не проверки перед записью.
+    Если в переданной сессии есть несброшенные изменения, чтение остаётся в ней.
+    """
+    @functools.wraps(method)
+    async def wrapper(session: AsyncSession, *args, **kwargs):
+        if read_engine is engine or session.new or session.dirty or session.deleted:
+            return await method(session, *args, **kwargs)
+        async with read_session_maker() as read_session:
+            return await method(read_session, *args, **kwargs)
+    return wrapper
+
+
+def _upgrade_schema(conn):
+    """Добавить недостающие колонки и индексы в существующие таблицы.
+
+    create_all создаёт только новые таблицы, поэтому колонки, добавленные
+    в модели позже, докатываются здесь через ALTER TABLE ADD COLUMN.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            conn.execute(text(ddl))
+            logger.info(f"Added column {table.name}.{column.name}")
+            migration = _DATA_MIGRATIONS.get((table.name, column.name))
+            if migration is not None:
+                migration(conn)
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    _backfill_change_timestamps(conn)
+
+
+def _backfill_change_timestamps(conn):
+    """Заполнить пустые метки изменения (updated_at и т.п.) у старых строк.
+
+    По этим колонкам BI-выгрузка отбирает изменённые строки; строка с NULL
+    не попала бы ни в одну инкрементальную выгрузку. Ставится текущее
+    время, чтобы такие строки ушли в ближайшую выгрузку.
+    """
+    now = datetime.utcnow()
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if column.onupdate is None or not isinstance(column.type, UTCDateTime):
+                continue
+            result = conn.execute(table.update().where(column.is_(None)).values({column.name: now}))
+            if result.rowcount:
+                logger.info(f"Backfilled {result.rowcount} empty {table.name}.{column.name}")
+
+
+def _localize_legacy_deadlines(conn):
+    """Перевести дедлайны, записанные до появления часовых поясов, в UTC.
+
+    Раньше «ДД.ММ.ГГГГ 23:59:59» сохранялось как есть, по местному времени
+    команды. Теперь в БД хранится UTC, поэтому старые значения сдвигаются
+    из пояса TIMEZONE.
+    """
+    zone = ZoneInfo(settings.TIMEZONE)
+
+    def to_utc(value):
+        if value is None:
+            return None
+        return value.replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+
+    for table_name, columns in (("tasks", ("deadline",)), ("task_events", ("old_deadline", "new_deadline"))):
+        table = Base.metadata.tables[table_name]
+        rows = conn.execute(select(table.c.id, *[table.c[name] for name in columns])).all()
+        if not rows:
+            continue
+        params = [
+            {"row_id": row[0], **{name: to_utc(value) for name, value in zip(columns, row[1:])}}
+            for row in rows
+        ]
+        conn.execute(
+            table.update().where(table.c.id == bindparam("row_id")).values(
+                {name: bindparam(name) for name in columns}
+            ),
+            params
+        )
+        logger.info(f"Converted {len(rows)} {table.name} deadlines from {settings.TIMEZONE} to UTC")
+
+
+# Одноразовые преобразования данных при добавлении колонки
+_DATA_MIGRATIONS = {
+    ("users", "timezone"): _localize_legacy_deadlines,
+}
+
+
+# Полнотекстовый индекс задач (SQLite FTS5), синхронизируется триггерами
+_FTS_STATEMENTS = (
+    """CREATE VIRTUAL TABLE tasks_fts USING fts5(
+        text, not_completed_reason,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, text, not_completed_reason)
+        VALUES (new.id, new.text, new.not_completed_reason);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, text, not_completed_reason)
+        VALUES ('delete', old.id, old.text, old.not_completed_reason);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF text, not_completed_reason ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, text, not_completed_reason)
+        VALUES ('delete', old.id, old.text, old.not_completed_reason);
+        INSERT INTO tasks_fts(rowid, text, not_completed_reason)
+        VALUES (new.id, new.text, new.not_completed_reason);
+    END""",
+)
+
+_fulltext_enabled = False
+
+
+def fulltext_enabled() -> bool:
+    """Доступен ли полнотекстовый индекс задач"""
+    return _fulltext_enabled
+
+
+def _setup_fulltext(conn) -> bool:
+    if conn.dialect.name != "sqlite":
+        return False
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+    ).scalar()
+    try:
+        if not exists:
+            conn.execute(text(_FTS_STATEMENTS[0]))
+        for statement in _FTS_STATEMENTS[1:]:
+            conn.execute(text(statement))
+        if not exists:
+            # Индексируем задачи, созданные до появления индекса
+            conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+            logger.info("Created full-text index for tasks")
+    except Exception as e:
+        logger.warning(f"SQLite FTS5 is unavailable, falling back to LIKE search: {e}")
+        return False
+    return True
+
+
 async def init_db():
     """Инициализация базы данных"""
+    global _fulltext_enabled
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+    async with engine.begin() as conn:
+        _fulltext_enabled = await conn.run_sync(_setup_fulltext)
     logger.info("Database initialized")
 
 
@@ -31,3 +319,36 @@ async def get_session() -> AsyncSession:
     async with async_session_maker() as session:
         yield session
 
+
+def insert_ignore(session: AsyncSession, model, conflict_columns: Sequence[str]):
+    """INSERT, пропускающий строки с конфликтом по уникальным колонкам"""
+    dialect = session.bind.dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing(index_elements=list(conflict_columns))
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing(index_elements=list(conflict_columns))
+    return insert(model)
+
+
+def upsert(session: AsyncSession, model, conflict_columns: Sequence[str], update_columns: Sequence[str]):
+    """INSERT ... ON CONFLICT DO UPDATE: вставка или обновление одним запросом.
+
+    Значения для обновления берутся из вставляемой строки (excluded).
+    Строка перезаписывается, только если значения действительно изменились,
+    колонки с onupdate (updated_at) при этом обновляются тоже.
+    На бэкендах без ON CONFLICT возвращается обычный INSERT.
+    """
+    dialect = session.bind.dialect.name
+    if dialect == "sqlite":
+        statement = sqlite.insert(model)
+    elif dialect == "postgresql":
+        statement = postgresql.insert(model)
+    else:
+        return insert(model)
+    table = model.__table__
+    touched = [column.name for column in table.columns if column.onupdate is not None and column.name not in update_columns]
+    return statement.on_conflict_do_update(
+        index_elements=list(conflict_columns),
+        set_={column: statement.excluded[column] for column in [*update_columns, *touched]},
+        where=or_(*(table.c[column].is_distinct_from(statement.excluded[column]) for column in update_columns))
+    )
@@ -1,7 +1,8 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Float
+from sqlalchemy import Column, BigInteger, Integer, String, Boolean, ForeignKey, Text, Float, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from bot.database.types import UTCDateTime
 
 Base = declarative_base()
 
@@ -10,12 +11,15 @@ class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(Integer, unique=True, nullable=False, index=True)
+    telegram_id = Column(BigInteger, unique=True, nullable=False, index=True)
     username = Column(String(255), nullable=True)
     first_name = Column(String(255), nullable=True)
     last_name = Column(String(255), nullable=True)
-    role = Column(String(20), default="manager", nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    role = Column(String(20), default="manager", nullable=False)  # "admin", "team_lead" or "manager"
+    # Часовой пояс IANA (Europe/Minsk); пусто — пояс команды или TIMEZONE из конфигурации
+    timezone = Column(String(64), nullable=True)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    updated_at = Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     tasks = relationship("Task", back_populates="manager", lazy="dynamic")
     
@@ -25,16 +29,28 @@ class User(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Одна задача на дату повторения шаблона — генерация идемпотентна
+        Index("uq_tasks_template_deadline", "template_id", "deadline", unique=True),
+        Index("ix_tasks_status_deadline", "status", "deadline"),
+        # Постраничный список активных задач менеджера по курсору (deadline, id)
+        Index("ix_tasks_manager_status_deadline", "manager_id", "status", "deadline", "id"),
+    )
     
     id = Column(Integer, primary_key=True)
     manager_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     text = Column(Text, nullable=False)
-    deadline = Column(DateTime, nullable=False)
+    deadline = Column(UTCDateTime, nullable=False)
     status = Column(String(20), default="active", nullable=False)
-    completed_at = Column(DateTime, nullable=True)
+    completed_at = Column(UTCDateTime, nullable=True)
     not_completed_reason = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    updated_at = Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    template_id = Column(Integer, ForeignKey("task_templates.id", ondelete="SET NULL"), nullable=True)
+    # Последнее отправленное напоминание: 0 — нет, 1 — за 24 ч, 2 — за 1 ч, 3 — просрочка
+    reminder_stage = Column(Integer, default=0, server_default="0", nullable=False)
+    # Версия для оптимистичных переходов: растёт при каждой смене состояния
+    version = Column(Integer, default=0, server_default="0", nullable=False)
     
     manager = relationship("User", back_populates="tasks")
     
@@ -46,12 +62,12 @@ class GroupAnalytics(Base):
     __tablename__ = "group_analytics"
     
     id = Column(Integer, primary_key=True)
-    group_id = Column(Integer, unique=True, nullable=False, index=True)
+    group_id = Column(BigInteger, unique=True, nullable=False, index=True)
     group_title = Column(String(255), nullable=True)
     total_members = Column(Integer, default=0)
     left_members = Column(Integer, default=0)
     kicked_members = Column(Integer, default=0)
-    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_updated = Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     members = relationship("GroupMember", back_populates="group", cascade="all, delete-orphan")
     
@@ -61,14 +77,20 @@ class GroupAnalytics(Base):
 
 class GroupMember(Base):
     __tablename__ = "group_members"
+    __table_args__ = (
+        Index("ix_group_members_group_telegram", "group_id", "telegram_id"),
+        # Постраничный список вышедших/исключённых по курсору (updated_at, id)
+        Index("ix_group_members_group_status_updated", "group_id", "status", "updated_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True)
     group_id = Column(Integer, ForeignKey("group_analytics.id"), nullable=False)
-    telegram_id = Column(Integer, nullable=False, index=True)
+    telegram_id = Column(BigInteger, nullable=False, index=True)
     username = Column(String(255), nullable=True)
     first_name = Column(String(255), nullable=True)
     status = Column(String(20), default="active", nullable=False)
-    left_at = Column(DateTime, nullable=True)
+    left_at = Column(UTCDateTime, nullable=True)
+    updated_at = Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     group = relationship("GroupAnalytics", back_populates="members")
     
@@ -76,14 +98,209 @@ class GroupMember(Base):
         return f"<GroupMember(telegram_id={self.telegram_id}, status={self.status})>"
 
 
+class GroupRoster(Base):
+    """Компактный состав группы: отсортированные Telegram ID (int64) одним BLOB.
+
+    200 тыс. участников занимают ~1,6 МБ вместо 200 тыс. ORM-объектов;
+    множества сравниваются слиянием отсортированных массивов.
+    """
+    __tablename__ = "group_rosters"
+    
+    group_id = Column(Integer, ForeignKey("group_analytics.id", ondelete="CASCADE"), primary_key=True)
+    member_ids = Column(LargeBinary, nullable=False)
+    member_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<GroupRoster(group_id={self.group_id}, members={self.member_count})>"
+
+
 class CleanupLog(Base):
     __tablename__ = "cleanup_logs"
     
     id = Column(Integer, primary_key=True)
-    last_cleanup_date = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_cleanup_date = Column(UTCDateTime, default=datetime.utcnow, nullable=False)
     tasks_deleted = Column(Integer, default=0)
     cleanup_type = Column(String(20), default="manual", nullable=False)  # "manual" or "auto"
     
     def __repr__(self):
         return f"<CleanupLog(last_cleanup={self.last_cleanup_date}, deleted={self.tasks_deleted})>"
 
+
+
+class TeamMembership(Base):
+    __tablename__ = "team_memberships"
+    __table_args__ = (
+        UniqueConstraint("lead_id", "manager_id", name="uq_team_lead_manager"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    lead_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    manager_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<TeamMembership(lead_id={self.lead_id}, manager_id={self.manager_id})>"
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    reply_markup = Column(Text, nullable=True)  # JSON InlineKeyboardMarkup
+    dedup_key = Column(String(255), unique=True, nullable=True)
+    status = Column(String(20), default="pending", nullable=False)  # "pending", "sending", "sent", "failed"
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(UTCDateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    sent_at = Column(UTCDateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<OutboxMessage(id={self.id}, chat_id={self.chat_id}, status={self.status})>"
+
+
+class Broadcast(Base):
+    """Рассылка администратора менеджерам или отслеживаемым группам"""
+    __tablename__ = "broadcasts"
+    
+    id = Column(Integer, primary_key=True)
+    author_id = Column(BigInteger, nullable=False)  # Telegram ID администратора
+    audience = Column(String(20), nullable=False)  # "managers", "groups"
+    text = Column(Text, nullable=False)  # HTML
+    status = Column(String(20), default="running", nullable=False)  # "running", "paused", "cancelled", "completed"
+    total = Column(Integer, default=0, nullable=False)
+    # Сообщение с ходом рассылки и кнопками управления
+    status_chat_id = Column(BigInteger, nullable=True)
+    status_message_id = Column(Integer, nullable=True)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    finished_at = Column(UTCDateTime, nullable=True)
+    
+    recipients = relationship("BroadcastRecipient", back_populates="broadcast", cascade="all, delete-orphan")
+    
+    def __repr__(self):
+        return f"<Broadcast(id={self.id}, audience={self.audience}, status={self.status})>"
+
+
+class BroadcastRecipient(Base):
+    __tablename__ = "broadcast_recipients"
+    __table_args__ = (
+        UniqueConstraint("broadcast_id", "chat_id", name="uq_broadcast_recipients_chat"),
+        Index("ix_broadcast_recipients_queue", "broadcast_id", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    broadcast_id = Column(Integer, ForeignKey("broadcasts.id", ondelete="CASCADE"), nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
+    status = Column(String(20), default="pending", nullable=False)  # "pending", "sending", "sent", "failed", "cancelled"
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(UTCDateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(UTCDateTime, nullable=True)
+    
+    broadcast = relationship("Broadcast", back_populates="recipients")
+    
+    def __repr__(self):
+        return f"<BroadcastRecipient(broadcast_id={self.broadcast_id}, chat_id={self.chat_id}, status={self.status})>"
+
+
+class TaskTemplate(Base):
+    __tablename__ = "task_templates"
+    __table_args__ = (
+        Index("ix_task_templates_active_generated", "is_active", "generated_until"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    manager_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_by = Column(BigInteger, nullable=True)  # Telegram ID автора
+    text = Column(Text, nullable=False)
+    rule = Column(String(100), nullable=False)  # "daily", "weekdays", "weekly:mon,fri", "monthly:1,15"
+    is_active = Column(Boolean, default=True, nullable=False)
+    # Задачи уже созданы по эту дату включительно
+    generated_until = Column(UTCDateTime, nullable=True)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    
+    manager = relationship("User")
+    
+    def __repr__(self):
+        return f"<TaskTemplate(id={self.id}, rule={self.rule}, active={self.is_active})>"
+
+
+class JobLease(Base):
+    __tablename__ = "job_leases"
+    
+    name = Column(String(100), primary_key=True)
+    owner = Column(String(255), nullable=True)  # Идентификатор экземпляра бота
+    expires_at = Column(UTCDateTime, nullable=True)
+    last_run_at = Column(UTCDateTime, nullable=True)  # Последний успешный запуск задания
+    
+    def __repr__(self):
+        return f"<JobLease(name={self.name}, owner={self.owner}, expires_at={self.expires_at})>"
+
+
+class ManagerReport(Base):
+    __tablename__ = "manager_reports"
+    __table_args__ = (
+        UniqueConstraint("period", "period_start", "manager_id", name="uq_manager_report_period"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    period = Column(String(10), nullable=False)  # "daily" or "weekly"
+    period_start = Column(UTCDateTime, nullable=False)
+    manager_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Задачи с дедлайном в периоде и выполнения, пришедшиеся на период
+    due = Column(Integer, default=0, nullable=False)
+    completed = Column(Integer, default=0, nullable=False)
+    completed_on_time = Column(Integer, default=0, nullable=False)
+    on_time_rate = Column(Float, nullable=True)  # Доля выполненных в срок, %
+    avg_lateness_hours = Column(Float, nullable=True)  # Среднее опоздание по выполненным с опозданием
+    reschedules = Column(Integer, default=0, nullable=False)
+    # Активные задачи с истекшим дедлайном на конец периода
+    overdue_backlog = Column(Integer, default=0, nullable=False)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    
+    manager = relationship("User")
+    
+    def __repr__(self):
+        return f"<ManagerReport(period={self.period}, start={self.period_start}, manager_id={self.manager_id})>"
+
+
+class TaskEvent(Base):
+    __tablename__ = "task_events"
+    __table_args__ = (
+        Index("ix_task_events_task_created", "task_id", "created_at"),
+        Index("ix_task_events_manager_type_created", "manager_id", "event_type", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    # Без внешнего ключа: история переживает удаление задачи при очистке
+    task_id = Column(Integer, nullable=False)
+    manager_id = Column(Integer, nullable=False)
+    event_type = Column(String(20), nullable=False)  # "created", "rescheduled", "completed", "archived"
+    old_deadline = Column(UTCDateTime, nullable=True)
+    new_deadline = Column(UTCDateTime, nullable=True)
+    reason = Column(Text, nullable=True)
+    created_at = Column(UTCDateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<TaskEvent(task_id={self.task_id}, type={self.event_type}, created_at={self.created_at})>"
+
+
+class ExportWatermark(Base):
+    __tablename__ = "export_watermarks"
+    
+    table_name = Column(String(100), primary_key=True)
+    # Строки, изменённые до этого момента, уже выгружены
+    watermark = Column(UTCDateTime, nullable=False)
+    rows_exported = Column(Integer, default=0, nullable=False)
+    exported_at = Column(UTCDateTime, default=datetime.utcnow)
+    # JSON: ключи строк, выгруженных в окне перекрытия, — [первичный ключ..., время изменения]
+    overlap_keys = Column(Text, nullable=True)
+    
+    def __repr__(self):
+        return f"<ExportWatermark(table={self.table_name}, watermark={self.watermark})>"
@@ -0,0 +1,33 @@
+from sqlalchemy import DateTime
+from sqlalchemy.types import TypeDecorator
+from datetime import datetime, timezone
+
+
+class UTCDateTime(TypeDecorator):
+    """Метка времени в UTC.
+
+    В БД хранится как ``TIMESTAMP WITH TIME ZONE`` (на SQLite — обычный
+    DATETIME). Код бота работает с naive-датами в UTC: aware-значения
+    при записи приводятся к UTC, при чтении возвращаются naive в UTC,
+    независимо от бэкенда и часового пояса сервера БД.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        if dialect.name == "postgresql":
+            # asyncpg для timestamptz ожидает aware-значение
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
@@ -0,0 +1,3 @@
+from .role_filter import RoleFilter
+
+__all__ = ["RoleFilter"]
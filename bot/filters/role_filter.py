@@ -0,0 +1,19 @@
+from aiogram.filters import Filter
+from aiogram.types import TelegramObject
+from bot.services.permission_service import permission_index
+
+
+class RoleFilter(Filter):
+    """Пропускает события только от пользователей с указанными ролями.
+
+    Проверка выполняется по in-memory индексу прав, без запросов к БД.
+    """
+    
+    def __init__(self, *roles: str):
+        self.roles = frozenset(roles)
+    
+    async def __call__(self, event: TelegramObject) -> bool:
+        from_user = getattr(event, "from_user", None)
+        if not from_user:
+            return False
+        return permission_index.role_of(from_user.id) in self.roles
@@ -1,62 +1,86 @@
 from aiogram import Router, F, Bot
 from aiogram.types import CallbackQuery, Message
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from datetime import datetime
-from pytz import timezone
-from bot.keyboards.admin_keyboards import get_admin_menu, get_manager_list_keyboard
+from bot.keyboards.admin_keyboards import get_admin_menu, get_staff_menu, get_manager_list_keyboard
+from bot.keyboards.callbacks import SelectManagerCallback
 from bot.services.user_service import UserService
 from bot.services.task_service import TaskService
 from bot.services.file_service import FileService
+from bot.services.export_service import ExportService, BI_EXPORTS_DIR, BI_EXPORT_JOB
+from bot.services.lease_service import LeaseService
 from bot.services.analytics_service import AnalyticsService
-from bot.database.database import get_session
+from bot.services.telegram_session import ResilientSession
+from bot.services.render_service import message_renderer
+from bot.services.workload_service import WorkloadService, format_workload, WORKLOAD_LEGEND
+from bot.services.time_service import time_zones, format_local, local_today, end_of_day, DATETIME_FORMAT
+from sqlalchemy.ext.asyncio import AsyncSession
 from bot.database.models import GroupAnalytics, User
 from bot.states.admin_states import AdminStates
+from bot.filters.role_filter import RoleFilter
+from bot.services.permission_service import (
+    PermissionService, permission_index, ROLES, ROLE_ADMIN, ROLE_TEAM_LEAD
+)
 from sqlalchemy import select
+import html
 import logging
 import re
 
-# Белорусское время (UTC+3)
-BELARUS_TZ = timezone('Europe/Minsk')
-
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Ограничение длины сообщения Telegram: остальные менеджеры — одной строкой
+WORKLOAD_ROWS = 30
+# Раздел доступен администраторам и руководителям групп,
+# отдельные действия дополнительно ограничены ролью администратора
+router.message.filter(RoleFilter(ROLE_ADMIN, ROLE_TEAM_LEAD))
+router.callback_query.filter(RoleFilter(ROLE_ADMIN, ROLE_TEAM_LEAD))
+
 
 @router.callback_query(F.data == "admin_add_task")
-async def start_add_task(callback: CallbackQuery, state: FSMContext):
+async def start_add_task(callback: CallbackQuery, session: AsyncSession, state: FSMContext, is_admin=False):
     """Начать процесс добавления задачи"""
     await callback.answer()
     
-    async for session in get_session():
-        managers = await UserService.get_all_managers(session)
+    managers = await UserService.get_all_managers(session)
+    managed_ids = permission_index.managed_ids(callback.from_user.id)
+    if managed_ids is not None:
+        managers = [manager for manager in managers if manager.id in managed_ids]
         
-        if not managers:
-            await callback.message.edit_text(
-                "❌ Нет доступных менеджеров!",
-                reply_markup=get_admin_menu()
-            )
-            break
-        
-        await state.set_state(AdminStates.waiting_for_manager_selection)
-        await callback.message.edit_text(
-            "👤 Выберите менеджера для назначения задачи:",
-            reply_markup=get_manager_list_keyboard(managers)
+    if not managers:
+        await message_renderer.edit(
+            callback.message,
+            "❌ Нет доступных менеджеров!",
+            reply_markup=get_staff_menu(is_admin)
         )
-        break
+        return
+        
+    await state.set_state(AdminStates.waiting_for_manager_selection)
+    await message_renderer.edit(
+        callback.message,
+        "👤 Выберите менеджера для назначения задачи:",
+        reply_markup=get_manager_list_keyboard(managers)
+    )
 
 
-@router.callback_query(F.data.startswith("select_manager_"))
-async def select_manager(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(SelectManagerCallback.filter())
+async def select_manager(callback: CallbackQuery, callback_data: SelectManagerCallback, state: FSMContext):
     """Выбрать менеджера"""
     await callback.answer()
     
-    manager_id = int(callback.data.split("_")[2])
+    manager_id = callback_data.manager_id
+    if not permission_index.can_manage(callback.from_user.id, manager_id):
+        await state.clear()
+        await message_renderer.edit(callback.message, "⛔ Недостаточно прав для этого менеджера.")
+        return
+    
     await state.update_data(manager_id=manager_id)
     await state.set_state(AdminStates.waiting_for_task_text)
     
-    await callback.message.edit_text(
+    await message_renderer.edit(
+        callback.message,
         "📝 Введите текст задачи:"
     )
 
@@ -81,7 +105,7 @@ async def process_task_text(message: Message, state: FSMContext):
 
 
 @router.message(AdminStates.waiting_for_task_deadline)
-async def process_task_deadline(message: Message, state: FSMContext):
+async def process_task_deadline(message: Message, session: AsyncSession, state: FSMContext, is_admin=False):
     """Обработать дедлайн задачи"""
     date_str = message.text.strip()
     
@@ -94,36 +118,42 @@ async def process_task_deadline(message: Message, state: FSMContext):
         return
     
     try:
-        deadline = datetime.strptime(date_str, "%d.%m.%Y")
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        deadline = deadline.replace(hour=23, minute=59, second=59)
+        data = await state.get_data()
+        manager_id = data.get("manager_id")
+        task_text = data.get("task_text")
         
-        if deadline.date() <= today.date():
+        # Дедлайн — конец дня по времени менеджера
+        zone = time_zones.zone_for(manager_id)
+        deadline_day = datetime.strptime(date_str, "%d.%m.%Y").date()
+        deadline = end_of_day(deadline_day, zone)
+        
+        if deadline_day <= local_today(zone):
             await message.answer(
                 "❌ Дата должна быть в будущем! Попробуйте снова:"
             )
             return
         
-        data = await state.get_data()
-        manager_id = data.get("manager_id")
-        task_text = data.get("task_text")
+        if not permission_index.can_manage(message.from_user.id, manager_id):
+            await state.clear()
+            await message.answer("⛔ Недостаточно прав для этого менеджера.", reply_markup=get_staff_menu(is_admin))
+            return
         
-        async for session in get_session():
-            task = await TaskService.create_task(session, manager_id, task_text, deadline)
+        task = await TaskService.create_task(session, manager_id, task_text, deadline)
             
-            result = await session.execute(select(User).where(User.id == manager_id))
-            manager = result.scalar_one_or_none()
+        result = await session.execute(select(User).where(User.id == manager_id))
+        manager = result.scalar_one_or_none()
             
-            manager_name = manager.first_name if manager else "N/A"
+        manager_name = manager.first_name if manager else "N/A"
+        # Подтверждение — только после фиксации задачи
+        await session.commit()
             
-            await message.answer(
-                f"✅ Задача успешно создана!\n\n"
-                f"📌 Текст: {task_text}\n"
-                f"📅 Дедлайн: {deadline.strftime('%d.%m.%Y')}\n"
-                f"👤 Менеджер: {manager_name}",
-                reply_markup=get_admin_menu()
-            )
-            break
+        await message.answer(
+            f"✅ Задача успешно создана!\n\n"
+            f"📌 Текст: {task_text}\n"
+            f"📅 Дедлайн: {format_local(deadline, zone)}\n"
+            f"👤 Менеджер: {manager_name}",
+            reply_markup=get_staff_menu(is_admin)
+        )
         
         await state.clear()
         
@@ -135,340 +165,461 @@ async def process_task_deadline(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "admin_cancel")
-async def cancel_admin_action(callback: CallbackQuery, state: FSMContext):
+async def cancel_admin_action(callback: CallbackQuery, state: FSMContext, is_admin=False):
     """Отменить действие администратора"""
     await callback.answer()
     await state.clear()
-    await callback.message.edit_text(
+    await message_renderer.edit(
+        callback.message,
         "❌ Действие отменено.",
-        reply_markup=get_admin_menu()
+        reply_markup=get_staff_menu(is_admin)
     )
 
 
 @router.callback_query(F.data == "admin_all_tasks")
-async def show_all_tasks(callback: CallbackQuery):
+async def show_all_tasks(callback: CallbackQuery, session: AsyncSession, is_admin=False):
     """Показать все задачи"""
     await callback.answer()
     
     try:
-        async for session in get_session():
-            tasks = await TaskService.get_all_tasks(session)
+        tasks = await TaskService.get_all_tasks(
+            session, manager_ids=permission_index.managed_ids(callback.from_user.id)
+        )
             
-            if not tasks:
-                await callback.message.edit_text(
-                    "📋 Нет задач в системе.",
-                    reply_markup=get_admin_menu()
-                )
-                break
+        if not tasks:
+            await message_renderer.edit(
+                callback.message,
+                "📋 Нет задач в системе.",
+                reply_markup=get_staff_menu(is_admin)
+            )
+            return
             
-            text = f"📋 <b>Все задачи ({len(tasks)}):</b>\n\n"
+        text = f"📋 <b>Все задачи ({len(tasks)}):</b>\n\n"
             
-            for task in tasks[:50]:
-                status_emoji = {
-                    "active": "🟡",
-                    "completed": "✅",
-                    "not_completed": "❌"
-                }
-                emoji = status_emoji.get(task.status, "⚪")
+        for task in tasks[:50]:
+            status_emoji = {
+                "active": "🟡",
+                "completed": "✅",
+                "not_completed": "❌"
+            }
+            emoji = status_emoji.get(task.status, "⚪")
                 
-                # Безопасное получение имени менеджера
-                if task.manager:
-                    manager_name = task.manager.first_name or task.manager.username or f"ID: {task.manager.telegram_id}"
-                else:
-                    manager_name = "N/A"
+            # Безопасное получение имени менеджера
+            if task.manager:
+                manager_name = task.manager.first_name or task.manager.username or f"ID: {task.manager.telegram_id}"
+            else:
+                manager_name = "N/A"
                 
-                deadline_str = task.deadline.strftime("%d.%m.%Y")
-                task_text = task.text[:60] + "..." if len(task.text) > 60 else task.text
+            deadline_str = format_local(task.deadline, time_zones.zone_for(task.manager_id))
+            task_text = task.text[:60] + "..." if len(task.text) > 60 else task.text
                 
-                text += (
-                    f"{emoji} <b>#{task.id}</b> | {manager_name}\n"
-                    f"   {task_text}\n"
-                    f"   📅 {deadline_str} | Статус: {task.status}\n\n"
-                )
+            text += (
+                f"{emoji} <b>#{task.id}</b> | {manager_name}\n"
+                f"   {task_text}\n"
+                f"   📅 {deadline_str} | Статус: {task.status}\n\n"
+            )
             
-            if len(tasks) > 50:
-                text += f"\n... и ещё {len(tasks) - 50} задач"
+        if len(tasks) > 50:
+            text += f"\n... и ещё {len(tasks) - 50} задач"
             
-            await callback.message.edit_text(
-                text,
-                reply_markup=get_admin_menu(),
-                parse_mode="HTML"
-            )
-            break
+        await message_renderer.edit(
+            callback.message,
+            text,
+            reply_markup=get_staff_menu(is_admin),
+            parse_mode="HTML"
+        )
     except Exception as e:
         logger.error(f"Error in show_all_tasks: {e}", exc_info=True)
-        await callback.message.edit_text(
+        await message_renderer.edit(
+            callback.message,
             "❌ Произошла ошибка при получении списка задач.",
-            reply_markup=get_admin_menu()
+            reply_markup=get_staff_menu(is_admin)
         )
 
 
 @router.callback_query(F.data == "admin_all_employees")
-async def show_all_employees(callback: CallbackQuery):
+async def show_all_employees(callback: CallbackQuery, session: AsyncSession, is_admin=False):
     """Показать всех сотрудников с детальной статистикой"""
     await callback.answer()
     
     try:
-        async for session in get_session():
-            stats = await TaskService.get_detailed_manager_statistics(session)
-            
-            if not stats:
-                await callback.message.edit_text(
-                    "👥 <b>ВСЕ СОТРУДНИКИ</b>\n\n"
-                    "Нет зарегистрированных сотрудников.",
-                    reply_markup=get_admin_menu(),
-                    parse_mode="HTML"
-                )
-                break
+        stats = await TaskService.get_detailed_manager_statistics(
+            session, manager_ids=permission_index.managed_ids(callback.from_user.id)
+        )
             
-            text = f"👥 <b>ВСЕ СОТРУДНИКИ ({len(stats)})</b>\n\n"
+        if not stats:
+            await message_renderer.edit(
+                callback.message,
+                "👥 <b>ВСЕ СОТРУДНИКИ</b>\n\n"
+                "Нет зарегистрированных сотрудников.",
+                reply_markup=get_staff_menu(is_admin),
+                parse_mode="HTML"
+            )
+            return
             
-            for stat in stats:
-                text += (
-                    f"<b>{stat['name']}</b>\n"
-                    f"   ✅ Выполнено: {stat['completed']}\n"
-                    f"   ❌ Не выполнено: {stat['not_completed']}\n"
-                    f"   🟡 Активных: {stat['active']}\n"
-                    f"   📊 Процент выполнения: {stat['percentage']}%\n"
-                    f"   📋 Всего задач: {stat['total']}\n\n"
-                )
+        text = f"👥 <b>ВСЕ СОТРУДНИКИ ({len(stats)})</b>\n\n"
             
-            await callback.message.edit_text(
-                text,
-                reply_markup=get_admin_menu(),
-                parse_mode="HTML"
+        for stat in stats:
+            text += (
+                f"<b>{stat['name']}</b>\n"
+                f"   ✅ Выполнено: {stat['completed']}\n"
+                f"   ❌ Не выполнено: {stat['not_completed']}\n"
+                f"   🟡 Активных: {stat['active']}\n"
+                f"   📊 Процент выполнения: {stat['percentage']}%\n"
+                f"   📋 Всего задач: {stat['total']}\n\n"
             )
-            break
+            
+        await message_renderer.edit(
+            callback.message,
+            text,
+            reply_markup=get_staff_menu(is_admin),
+            parse_mode="HTML"
+        )
     except Exception as e:
         logger.error(f"Error in show_all_employees: {e}", exc_info=True)
-        await callback.message.edit_text(
+        await message_renderer.edit(
+            callback.message,
             "❌ Произошла ошибка при получении списка сотрудников.",
-            reply_markup=get_admin_menu()
+            reply_markup=get_staff_menu(is_admin)
         )
 
 
 @router.callback_query(F.data == "admin_rating")
-async def show_rating(callback: CallbackQuery):
+async def show_rating(callback: CallbackQuery, session: AsyncSession, is_admin=False):
     """Показать рейтинг менеджеров"""
     await callback.answer()
     
     try:
-        async for session in get_session():
-            stats = await TaskService.get_manager_statistics(session)
+        stats = await TaskService.get_manager_statistics(
+            session, manager_ids=permission_index.managed_ids(callback.from_user.id)
+        )
             
-            if not stats:
-                await callback.message.edit_text(
-                    "📊 Нет данных для рейтинга.\n\nДобавьте задачи менеджерам, чтобы увидеть статистику.",
-                    reply_markup=get_admin_menu()
-                )
-                break
+        if not stats:
+            await message_renderer.edit(
+                callback.message,
+                "📊 Нет данных для рейтинга.\n\nДобавьте задачи менеджерам, чтобы увидеть статистику.",
+                reply_markup=get_staff_menu(is_admin)
+            )
+            return
             
-            text = "🏆 <b>РЕЙТИНГ МЕНЕДЖЕРОВ</b>\n\n"
+        text = "🏆 <b>РЕЙТИНГ МЕНЕДЖЕРОВ</b>\n\n"
             
-            for i, stat in enumerate(stats, 1):
-                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+        for i, stat in enumerate(stats, 1):
+            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
                 
-                text += (
-                    f"{medal} <b>{stat['name']}</b>\n"
-                    f"   ✅ Выполнено: {stat['completed']}\n"
-                    f"   ❌ Не выполнено: {stat['not_completed']}\n"
-                    f"   📊 Процент выполнения: {stat['percentage']}%\n"
-                    f"   📋 Всего задач: {stat['total']}\n\n"
-                )
-            
-            await callback.message.edit_text(
-                text,
-                reply_markup=get_admin_menu(),
-                parse_mode="HTML"
+            text += (
+                f"{medal} <b>{stat['name']}</b>\n"
+                f"   ✅ Выполнено: {stat['completed']}\n"
+                f"   ❌ Не выполнено: {stat['not_completed']}\n"
+                f"   📊 Процент выполнения: {stat['percentage']}%\n"
+                f"   📋 Всего задач: {stat['total']}\n\n"
             )
-            break
+            
+        await message_renderer.edit(
+            callback.message,
+            text,
+            reply_markup=get_staff_menu(is_admin),
+            parse_mode="HTML"
+        )
     except Exception as e:
         logger.error(f"Error in show_rating: {e}", exc_info=True)
-        await callback.message.edit_text(
+        await message_renderer.edit(
+            callback.message,
             "❌ Произошла ошибка при получении рейтинга.",
-            reply_markup=get_admin_menu()
+            reply_markup=get_staff_menu(is_admin)
         )
 
 
-@router.callback_query(F.data == "admin_cleanup")
-async def cleanup_completed_tasks(callback: CallbackQuery):
+@router.callback_query(F.data == "admin_workload")
+async def show_workload(callback: CallbackQuery, session: AsyncSession, is_admin=False):
+    """Показать нагрузку менеджеров: сначала у кого больше просрочек"""
+    await callback.answer()
+    
+    managers = await UserService.get_all_managers(session)
+    managed_ids = permission_index.managed_ids(callback.from_user.id)
+    if managed_ids is not None:
+        managers = [manager for manager in managers if manager.id in managed_ids]
+    if not managers:
+        await message_renderer.edit(
+            callback.message,
+            "❌ Нет доступных менеджеров!",
+            reply_markup=get_staff_menu(is_admin)
+        )
+        return
+    
+    workloads = await WorkloadService.get_workloads(session, [manager.id for manager in managers])
+    managers.sort(key=lambda m: (
+        -workloads[m.id].overdue, -workloads[m.id].due_today, -workloads[m.id].total, m.first_name or ""
+    ))
+    
+    text = f"📈 <b>НАГРУЗКА МЕНЕДЖЕРОВ</b>\n<i>{WORKLOAD_LEGEND}</i>\n\n"
+    for manager in managers[:WORKLOAD_ROWS]:
+        name = html.escape(manager.first_name or manager.username or f"ID: {manager.telegram_id}")
+        workload = workloads[manager.id]
+        text += f"<b>{name}</b> ({workload.total})\n   {format_workload(workload)}\n"
+    if len(managers) > WORKLOAD_ROWS:
+        rest = managers[WORKLOAD_ROWS:]
+        text += (
+            f"\n…и ещё {len(rest)}: просрочено {sum(workloads[m.id].overdue for m in rest)}, "
+            f"активных {sum(workloads[m.id].total for m in rest)}\n"
+        )
+    
+    await message_renderer.edit(
+        callback.message,
+        text,
+        reply_markup=get_staff_menu(is_admin),
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(F.data == "admin_cleanup", RoleFilter(ROLE_ADMIN))
+async def cleanup_completed_tasks(callback: CallbackQuery, session: AsyncSession):
     """Очистить выполненные задачи"""
     await callback.answer()
     
     try:
-        async for session in get_session():
-            # Получаем задачи с загруженным менеджером для сохранения в файл
-            old_tasks = await TaskService.get_completed_tasks_older_than_with_manager(session, days=7)
+        # Получаем задачи с загруженным менеджером для сохранения в файл
+        old_tasks = await TaskService.get_completed_tasks_older_than_with_manager(session, days=7)
             
-            # Отладочная информация
-            logger.info(f"Found {len(old_tasks)} completed tasks older than 7 days")
+        # Отладочная информация
+        logger.info(f"Found {len(old_tasks)} completed tasks older than 7 days")
             
-            if not old_tasks:
-                # Проверяем, есть ли вообще выполненные задачи
-                from sqlalchemy import select
-                from bot.database.models import Task
-                all_completed = await session.execute(
-                    select(Task).where(Task.status == "completed")
-                )
-                all_completed_tasks = list(all_completed.scalars().all())
+        if not old_tasks:
+            # Проверяем, есть ли вообще выполненные задачи
+            from sqlalchemy import select
+            from bot.database.models import Task
+            all_completed = await session.execute(
+                select(Task).where(Task.status == "completed")
+            )
+            all_completed_tasks = list(all_completed.scalars().all())
                 
-                if all_completed_tasks:
-                    # Показываем информацию о выполненных задачах
-                    oldest_task = min(all_completed_tasks, key=lambda t: t.completed_at if t.completed_at else datetime.utcnow())
-                    days_old = (datetime.utcnow() - (oldest_task.completed_at or datetime.utcnow())).days
+            if all_completed_tasks:
+                # Показываем информацию о выполненных задачах
+                oldest_task = min(all_completed_tasks, key=lambda t: t.completed_at if t.completed_at else datetime.utcnow())
+                days_old = (datetime.utcnow() - (oldest_task.completed_at or datetime.utcnow())).days
                     
-                    await callback.message.edit_text(
-                        f"✅ Нет выполненных задач старше 7 дней для очистки.\n\n"
-                        f"📊 Всего выполненных задач: {len(all_completed_tasks)}\n"
-                        f"📅 Самая старая выполнена {days_old} дней назад",
-                        reply_markup=get_admin_menu()
-                    )
-                else:
-                    await callback.message.edit_text(
-                        "✅ Нет выполненных задач старше 7 дней для очистки.\n\n"
-                        "📊 Выполненных задач в системе нет.",
-                        reply_markup=get_admin_menu()
-                    )
-                break
-            
-            # Сохраняем задачи в файл ПЕРЕД удалением
-            filepath = await FileService.save_completed_tasks_to_file(old_tasks)
-            
-            task_ids = [task.id for task in old_tasks]
-            deleted_count = await TaskService.delete_tasks(session, task_ids)
+                await message_renderer.edit(
+                    callback.message,
+                    f"✅ Нет выполненных задач старше 7 дней для очистки.\n\n"
+                    f"📊 Всего выполненных задач: {len(all_completed_tasks)}\n"
+                    f"📅 Самая старая выполнена {days_old} дней назад",
+                    reply_markup=get_admin_menu()
+                )
+            else:
+                await message_renderer.edit(
+                    callback.message,
+                    "✅ Нет выполненных задач старше 7 дней для очистки.\n\n"
+                    "📊 Выполненных задач в системе нет.",
+                    reply_markup=get_admin_menu()
+                )
+            return
             
-            # Обновляем лог последней очистки
-            from bot.database.models import CleanupLog
-            from sqlalchemy import select
+        # Сохраняем задачи в файл ПЕРЕД удалением
+        filepath = await FileService.save_completed_tasks_to_file(old_tasks)
             
-            result = await session.execute(select(CleanupLog).order_by(CleanupLog.id.desc()).limit(1))
-            cleanup_log = result.scalar_one_or_none()
+        task_ids = [task.id for task in old_tasks]
+        deleted_count = await TaskService.delete_tasks(session, task_ids)
             
-            if cleanup_log:
-                cleanup_log.last_cleanup_date = datetime.utcnow()
-                cleanup_log.tasks_deleted = deleted_count
-                cleanup_log.cleanup_type = "manual"
-            else:
-                cleanup_log = CleanupLog(
-                    last_cleanup_date=datetime.utcnow(),
-                    tasks_deleted=deleted_count,
-                    cleanup_type="manual"
-                )
-                session.add(cleanup_log)
+        # Обновляем лог последней очистки
+        from bot.database.models import CleanupLog
+        from sqlalchemy import select
             
-            await session.commit()
+        result = await session.execute(select(CleanupLog).order_by(CleanupLog.id.desc()).limit(1))
+        cleanup_log = result.scalar_one_or_none()
             
-            await callback.message.edit_text(
-                f"✅ Очистка завершена!\n\n"
-                f"🗑️ Удалено задач: {deleted_count}\n\n"
-                f"💾 Данные сохранены в файл:\n"
-                f"<code>{filepath}</code>",
-                reply_markup=get_admin_menu(),
-                parse_mode="HTML"
+        if cleanup_log:
+            cleanup_log.last_cleanup_date = datetime.utcnow()
+            cleanup_log.tasks_deleted = deleted_count
+            cleanup_log.cleanup_type = "manual"
+        else:
+            cleanup_log = CleanupLog(
+                last_cleanup_date=datetime.utcnow(),
+                tasks_deleted=deleted_count,
+                cleanup_type="manual"
             )
-            break
+            session.add(cleanup_log)
+        await session.commit()
+            
+        await message_renderer.edit(
+            callback.message,
+            f"✅ Очистка завершена!\n\n"
+            f"🗑️ Удалено задач: {deleted_count}\n\n"
+            f"💾 Данные сохранены в файл:\n"
+            f"<code>{filepath}</code>",
+            reply_markup=get_admin_menu(),
+            parse_mode="HTML"
+        )
     except Exception as e:
         logger.error(f"Error in cleanup_completed_tasks: {e}", exc_info=True)
-        await callback.message.edit_text(
+        await message_renderer.edit(
+            callback.message,
             "❌ Произошла ошибка при очистке задач.",
             reply_markup=get_admin_menu()
         )
 
 
-@router.callback_query(F.data == "admin_group_analysis")
-async def show_group_analysis_menu(callback: CallbackQuery, bot):
+def _member_label(member) -> str:
+    """Имя участника группы для списка вышедших/исключенных"""
+    if member.username:
+        return f"@{member.username}"
+    if member.first_name:
+        return f"{member.first_name} (ID: {member.telegram_id})"
+    return f"ID: {member.telegram_id}"
+
+
+@router.callback_query(F.data == "admin_group_analysis", RoleFilter(ROLE_ADMIN))
+async def show_group_analysis_menu(callback: CallbackQuery, session: AsyncSession, bot):
     """Показать меню анализа групп"""
     await callback.answer()
     
-    async for session in get_session():
-        result = await session.execute(select(GroupAnalytics))
-        groups = result.scalars().all()
+    result = await session.execute(select(GroupAnalytics))
+    groups = result.scalars().all()
+    zone = time_zones.zone_for_telegram(callback.from_user.id)
         
-        if not groups:
-            text = (
-                "📊 <b>АНАЛИЗ TELEGRAM-ГРУПП</b>\n\n"
-                "Добавьте бота в группу для начала анализа.\n\n"
-                "Для получения аналитики добавьте бота в группу с правами администратора."
-            )
-        else:
-            text = "📊 <b>АНАЛИЗ TELEGRAM-ГРУПП</b>\n\n"
-            for group in groups:
-                # Обновляем количество участников
-                try:
-                    member_count = await bot.get_chat_member_count(group.group_id)
-                    if group.total_members != member_count:
-                        group.total_members = member_count
-                        await session.commit()
-                except Exception as e:
-                    logger.error(f"Error updating member count for group {group.group_id}: {e}")
-                
-                # Получаем список вышедших и исключенных участников
-                left_members = await AnalyticsService.get_left_members(session, group.id)
-                
-                # Разделяем на вышедших и исключенных
-                left_list = [m for m in left_members if m.status == "left"]
-                kicked_list = [m for m in left_members if m.status == "kicked"]
-                
-                # Формируем username для вышедших
-                left_usernames = []
-                for m in left_list[:10]:
-                    if m.username:
-                        left_usernames.append(f"@{m.username}")
-                    elif m.first_name:
-                        left_usernames.append(f"{m.first_name} (ID: {m.telegram_id})")
-                    else:
-                        left_usernames.append(f"ID: {m.telegram_id}")
+    if not groups:
+        text = (
+            "📊 <b>АНАЛИЗ TELEGRAM-ГРУПП</b>\n\n"
+            "Добавьте бота в группу для начала анализа.\n\n"
+            "Для получения аналитики добавьте бота в группу с правами администратора."
+        )
+    else:
+        text = "📊 <b>АНАЛИЗ TELEGRAM-ГРУПП</b>\n\n"
+        counts = await AnalyticsService.count_members_by_status(session, [group.id for group in groups])
+        for group in groups:
+            # Обновляем количество участников
+            try:
+                member_count = await bot.get_chat_member_count(group.group_id)
+                if group.total_members != member_count:
+                    group.total_members = member_count
+            except Exception as e:
+                logger.error(f"Error updating member count for group {group.group_id}: {e}")
                 
-                # Формируем username для исключенных
-                kicked_usernames = []
-                for m in kicked_list[:10]:
-                    if m.username:
-                        kicked_usernames.append(f"@{m.username}")
-                    elif m.first_name:
-                        kicked_usernames.append(f"{m.first_name} (ID: {m.telegram_id})")
-                    else:
-                        kicked_usernames.append(f"ID: {m.telegram_id}")
+            # Последние вышедшие и исключенные — LIMIT в запросе, итоги — через GROUP BY
+            left_members = await AnalyticsService.get_left_members(session, group.id, "left", limit=5)
+            kicked_members = await AnalyticsService.get_left_members(session, group.id, "kicked", limit=5)
+            left_usernames = [_member_label(m) for m in left_members]
+            kicked_usernames = [_member_label(m) for m in kicked_members]
                 
-                text += (
-                    f"<b>{group.group_title or f'Группа {group.group_id}'}</b>\n"
-                    f"👥 Всего участников: {group.total_members}\n"
-                    f"🚪 Вышли: {group.left_members}\n"
-                    f"👢 Исключены: {group.kicked_members}\n"
-                )
+            text += (
+                f"<b>{group.group_title or f'Группа {group.group_id}'}</b>\n"
+                f"👥 Всего участников: {group.total_members}\n"
+                f"🚪 Вышли: {group.left_members}\n"
+                f"👢 Исключены: {group.kicked_members}\n"
+            )
                 
-                # Показываем вышедших
-                if left_usernames:
-                    text += f"\n🚪 <b>Вышедшие участники:</b>\n"
-                    text += ", ".join(left_usernames[:5])
-                    if len(left_usernames) > 5:
-                        text += f" и ещё {len(left_usernames) - 5}"
-                    text += "\n"
+            # Показываем вышедших
+            if left_usernames:
+                text += f"\n🚪 <b>Вышедшие участники:</b>\n"
+                text += ", ".join(left_usernames)
+                left_total = counts.get((group.id, "left"), 0)
+                if left_total > len(left_usernames):
+                    text += f" и ещё {left_total - len(left_usernames)}"
+                text += "\n"
                 
-                # Показываем исключенных
-                if kicked_usernames:
-                    text += f"\n👢 <b>Исключенные участники:</b>\n"
-                    text += ", ".join(kicked_usernames[:5])
-                    if len(kicked_usernames) > 5:
-                        text += f" и ещё {len(kicked_usernames) - 5}"
-                    text += "\n"
+            # Показываем исключенных
+            if kicked_usernames:
+                text += f"\n👢 <b>Исключенные участники:</b>\n"
+                text += ", ".join(kicked_usernames)
+                kicked_total = counts.get((group.id, "kicked"), 0)
+                if kicked_total > len(kicked_usernames):
+                    text += f" и ещё {kicked_total - len(kicked_usernames)}"
+                text += "\n"
                 
-                # Конвертируем UTC время в белорусское время
-                if group.last_updated:
-                    # Если last_updated naive (без timezone), считаем что это UTC
-                    if group.last_updated.tzinfo is None:
-                        utc_time = timezone('UTC').localize(group.last_updated)
-                    else:
-                        utc_time = group.last_updated
-                    belarus_time = utc_time.astimezone(BELARUS_TZ)
-                    time_str = belarus_time.strftime('%d.%m.%Y %H:%M')
-                else:
-                    time_str = "N/A"
-                text += f"\n🕐 Обновлено: {time_str} (МСК+1)\n\n"
+            time_str = format_local(group.last_updated, zone, DATETIME_FORMAT)
+            text += f"\n🕐 Обновлено: {time_str} ({zone.key})\n\n"
         
-        await callback.message.edit_text(
-            text,
-            reply_markup=get_admin_menu(),
+    await message_renderer.edit(
+        callback.message,
+        text,
+        reply_markup=get_admin_menu(),
+        parse_mode="HTML"
+    )
+
+
+
+@router.message(Command("set_role"), RoleFilter(ROLE_ADMIN))
+async def cmd_set_role(message: Message, session: AsyncSession, command: CommandObject):
+    """Назначить роль: /set_role <telegram_id> <admin|team_lead|manager>"""
+    args = (command.args or "").split()
+    if len(args) != 2 or not args[0].isdigit() or args[1] not in ROLES:
+        await message.answer(
+            "❌ Использование: <code>/set_role &lt;telegram_id&gt; &lt;admin|team_lead|manager&gt;</code>",
             parse_mode="HTML"
         )
-        break
+        return
+    
+    telegram_id, role = int(args[0]), args[1]
+    user = await PermissionService.set_role(session, telegram_id, role)
+    if not user:
+        await message.answer("❌ Пользователь не найден. Он должен хотя бы раз запустить бота.")
+    else:
+        await message.answer(f"✅ Пользователю {telegram_id} назначена роль: {role}")
+
 
+@router.message(Command("team_add", "team_remove"), RoleFilter(ROLE_ADMIN))
+async def cmd_team_membership(message: Message, session: AsyncSession, command: CommandObject):
+    """Состав команды: /team_add|/team_remove <lead_telegram_id> <manager_telegram_id>"""
+    args = (command.args or "").split()
+    if len(args) != 2 or not all(arg.isdigit() for arg in args):
+        await message.answer(
+            f"❌ Использование: <code>/{command.command} &lt;lead_telegram_id&gt; &lt;manager_telegram_id&gt;</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    lead_id, manager_id = int(args[0]), int(args[1])
+    if command.command == "team_add":
+        ok = await PermissionService.add_team_member(session, lead_id, manager_id)
+        text = "✅ Менеджер добавлен в команду." if ok else "❌ Руководитель или менеджер не найден."
+    else:
+        ok = await PermissionService.remove_team_member(session, lead_id, manager_id)
+        text = "✅ Менеджер удалён из команды." if ok else "❌ Такой связи нет."
+    await message.answer(text)
+
+
+@router.message(Command("export"), RoleFilter(ROLE_ADMIN))
+async def cmd_export(message: Message, session: AsyncSession, command: CommandObject):
+    """Выгрузка данных для BI: /export — изменения с прошлой выгрузки, /export full — полностью"""
+    full = (command.args or "").strip().lower() == "full"
+    await message.answer("⏳ Выгрузка данных...")
+    
+    results = []
+    
+    async def export():
+        results.extend(await ExportService.export_all(session, full=full))
+    
+    # Под той же арендой, что и плановая выгрузка: водяные знаки общие
+    try:
+        acquired = await LeaseService.run_exclusive(BI_EXPORT_JOB, export)
+    except Exception as e:
+        logger.error(f"Error exporting data: {e}", exc_info=True)
+        await message.answer("❌ Произошла ошибка при выгрузке данных.")
+        return
+    if not acquired:
+        await message.answer("⏳ Сейчас уже идёт выгрузка. Повторите команду позже.")
+        return
+    
+    text = f"📦 <b>Выгрузка {'полная' if full else 'инкрементальная'}</b>\n\n"
+    for result in results:
+        text += f"• <code>{result.table}</code>: {result.rows} строк\n"
+    text += f"\n📁 Файлы: <code>{html.escape(BI_EXPORTS_DIR)}</code>"
+    await message.answer(text, parse_mode="HTML")
+
+
+@router.message(Command("api_stats"), RoleFilter(ROLE_ADMIN))
+async def cmd_api_stats(message: Message, bot: Bot):
+    """Задержки запросов к Telegram API по методам и состояние предохранителя"""
+    if not isinstance(bot.session, ResilientSession):
+        await message.answer("ℹ️ Статистика запросов недоступна для этой сессии бота.")
+        return
+    
+    lines = bot.session.latency.summary()
+    breaker = bot.session.breaker
+    text = "📡 <b>Telegram API</b>\n\n"
+    text += "\n".join(f"• <code>{html.escape(line)}</code>" for line in lines) or "Запросов пока не было."
+    text += f"\n\n🔌 Предохранитель: {'разомкнут' if breaker.is_open else 'замкнут'}, ошибок подряд: {breaker.failures}"
+    text += (
+        f"\n✏️ Редактирования: {message_renderer.edits}, только клавиатура: {message_renderer.markup_edits}, "
+        f"пропущено без изменений: {message_renderer.skipped}"
+    )
+    await message.answer(text, parse_mode="HTML")
@@ -0,0 +1,147 @@
+from aiogram import Router, F
+from aiogram.types import CallbackQuery, Message
+from aiogram.fsm.context import FSMContext
+from bot.keyboards.admin_keyboards import (
+    get_staff_menu, get_broadcast_audience_keyboard, get_broadcast_confirm_keyboard, get_broadcast_control_keyboard
+)
+from bot.keyboards.callbacks import BroadcastAction, BroadcastCallback
+from bot.services.broadcast_service import (
+    BroadcastService, render_broadcast_status, AUDIENCE_MANAGERS, AUDIENCE_GROUPS, AUDIENCE_TITLES,
+    STATUS_RUNNING, STATUS_PAUSED, STATUS_CANCELLED
+)
+from bot.services.permission_service import ROLE_ADMIN
+from bot.services.render_service import message_renderer
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.filters.role_filter import RoleFilter
+from bot.states.admin_states import AdminStates
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+router.message.filter(RoleFilter(ROLE_ADMIN))
+router.callback_query.filter(RoleFilter(ROLE_ADMIN))
+
+# Лимит Telegram на длину текста сообщения
+MAX_BROADCAST_LENGTH = 4096
+
+# Переходы статуса по кнопкам: действие → (новый статус, из каких статусов)
+_TRANSITIONS = {
+    BroadcastAction.PAUSE: (STATUS_PAUSED, (STATUS_RUNNING,)),
+    BroadcastAction.RESUME: (STATUS_RUNNING, (STATUS_PAUSED,)),
+    BroadcastAction.CANCEL: (STATUS_CANCELLED, (STATUS_RUNNING, STATUS_PAUSED)),
+}
+
+
+@router.callback_query(F.data == "admin_broadcast")
+async def start_broadcast(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+    """Начать рассылку: выбор получателей"""
+    await callback.answer()
+    await state.clear()
+    managers = await BroadcastService.count_audience(session, AUDIENCE_MANAGERS)
+    groups = await BroadcastService.count_audience(session, AUDIENCE_GROUPS)
+    await message_renderer.edit(
+        callback.message,
+        "📣 <b>Рассылка</b>\n\nКому отправить сообщение?",
+        reply_markup=get_broadcast_audience_keyboard(managers, groups),
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(F.data.in_({"broadcast_managers", "broadcast_groups"}))
+async def select_broadcast_audience(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+    """Получатели выбраны: запросить текст"""
+    audience = AUDIENCE_MANAGERS if callback.data == "broadcast_managers" else AUDIENCE_GROUPS
+    count = await BroadcastService.count_audience(session, audience)
+    if not count:
+        await callback.answer("Получателей пока нет", show_alert=True)
+        return
+
+    await callback.answer()
+    await state.set_state(AdminStates.broadcast_waiting_for_text)
+    await state.update_data(broadcast_audience=audience)
+    await message_renderer.edit(
+        callback.message,
+        f"📝 Рассылка {AUDIENCE_TITLES[audience]} ({count})\n\n"
+        f"Отправьте текст сообщения. Форматирование (жирный, курсив, ссылки) сохранится."
+    )
+
+
+@router.message(AdminStates.broadcast_waiting_for_text)
+async def process_broadcast_text(message: Message, session: AsyncSession, state: FSMContext):
+    """Показать сообщение перед отправкой и попросить подтверждение"""
+    if not message.text:
+        await message.answer("❌ Поддерживается только текст. Отправьте текст сообщения:")
+        return
+    if len(message.html_text) > MAX_BROADCAST_LENGTH:
+        await message.answer(f"❌ Слишком длинный текст (больше {MAX_BROADCAST_LENGTH} символов). Сократите его:")
+        return
+
+    data = await state.get_data()
+    audience = data["broadcast_audience"]
+    count = await BroadcastService.count_audience(session, audience)
+    await state.update_data(broadcast_text=message.html_text)
+    await state.set_state(AdminStates.broadcast_confirm)
+    await message.answer(
+        f"📣 Отправить {AUDIENCE_TITLES[audience]} ({count})?\n\n{message.html_text}",
+        reply_markup=get_broadcast_confirm_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(AdminStates.broadcast_confirm, F.data == "broadcast_confirm")
+async def confirm_broadcast(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+    """Создать рассылку; это сообщение становится сообщением о её ходе"""
+    await callback.answer()
+    data = await state.get_data()
+    await state.clear()
+
+    broadcast = await BroadcastService.create(
+        session, callback.from_user.id, data["broadcast_audience"], data["broadcast_text"]
+    )
+    await BroadcastService.set_status_message(
+        session, broadcast.id, callback.message.chat.id, callback.message.message_id
+    )
+    progress = await BroadcastService.get_progress(session, broadcast.id)
+    # Сообщение о ходе показывается после фиксации рассылки
+    await session.commit()
+    await message_renderer.edit(
+        callback.message,
+        render_broadcast_status(broadcast, progress),
+        reply_markup=get_broadcast_control_keyboard(broadcast.id, broadcast.status),
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(BroadcastCallback.filter())
+async def control_broadcast(
+    callback: CallbackQuery,
+    callback_data: BroadcastCallback,
+    session: AsyncSession,
+    is_admin=False
+):
+    """Пауза, продолжение, отмена рассылки и обновление хода"""
+    transition = _TRANSITIONS.get(callback_data.action)
+    if transition is not None:
+        status, from_statuses = transition
+        changed = await BroadcastService.set_status(session, callback_data.broadcast_id, status, from_statuses)
+        await session.commit()
+        if not changed:
+            await callback.answer("Статус рассылки уже изменился", show_alert=True)
+        else:
+            await callback.answer()
+            logger.info(f"Broadcast {callback_data.broadcast_id} set to {status} by {callback.from_user.id}")
+    else:
+        await callback.answer()
+
+    broadcast = await BroadcastService.get(session, callback_data.broadcast_id)
+    if broadcast is None:
+        await message_renderer.edit(callback.message, "❌ Рассылка не найдена.", reply_markup=get_staff_menu(is_admin))
+        return
+    progress = await BroadcastService.get_progress(session, broadcast.id)
+    await message_renderer.edit(
+        callback.message,
+        render_broadcast_status(broadcast, progress),
+        reply_markup=get_broadcast_control_keyboard(broadcast.id, broadcast.status),
+        parse_mode="HTML"
+    )
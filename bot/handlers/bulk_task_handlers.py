@@ -0,0 +1,229 @@
+from aiogram import Router, F, Bot
+from aiogram.types import CallbackQuery, Message
+from aiogram.fsm.context import FSMContext
+from bot.keyboards.admin_keyboards import (
+    get_staff_menu, get_bulk_mode_keyboard, get_manager_multiselect_keyboard
+)
+from bot.keyboards.callbacks import BulkToggleCallback
+from bot.services.user_service import UserService
+from bot.services.task_service import TaskService
+from bot.services.bulk_task_service import BulkTaskService, parse_deadline, MAX_BULK_ROWS
+from bot.services.permission_service import permission_index, ROLE_ADMIN, ROLE_TEAM_LEAD
+from bot.services.render_service import message_renderer
+from bot.services.time_service import time_zones, end_of_day
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.filters.role_filter import RoleFilter
+from bot.states.admin_states import AdminStates
+from typing import Optional
+import html
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+router.message.filter(RoleFilter(ROLE_ADMIN, ROLE_TEAM_LEAD))
+router.callback_query.filter(RoleFilter(ROLE_ADMIN, ROLE_TEAM_LEAD))
+
+# Ограничение размера загружаемого CSV
+MAX_DOCUMENT_SIZE = 1024 * 1024
+
+
+async def _available_managers(session, telegram_id: int):
+    managers = await UserService.get_all_managers(session)
+    managed_ids = permission_index.managed_ids(telegram_id)
+    if managed_ids is not None:
+        managers = [manager for manager in managers if manager.id in managed_ids]
+    return managers
+
+
+@router.callback_query(F.data == "admin_bulk_tasks")
+async def start_bulk_tasks(callback: CallbackQuery, state: FSMContext):
+    """Начать массовое добавление задач"""
+    await callback.answer()
+    await state.clear()
+    await message_renderer.edit(
+        callback.message,
+        "📦 <b>Массовое добавление задач</b>\n\nВыберите режим:",
+        reply_markup=get_bulk_mode_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(F.data == "bulk_mode_one")
+async def bulk_mode_one(callback: CallbackQuery, session: AsyncSession, state: FSMContext, is_admin=False):
+    """Одна задача нескольким менеджерам: выбор менеджеров"""
+    await callback.answer()
+
+    managers = await _available_managers(session, callback.from_user.id)
+
+    if not managers:
+        await message_renderer.edit(callback.message, "❌ Нет доступных менеджеров!", reply_markup=get_staff_menu(is_admin))
+        return
+
+    await state.set_state(AdminStates.bulk_selecting_managers)
+    await state.update_data(bulk_selected=[])
+    await message_renderer.edit(
+        callback.message,
+        "👥 Отметьте менеджеров, которым нужно назначить задачу:",
+        reply_markup=get_manager_multiselect_keyboard(managers, frozenset())
+    )
+
+
+@router.callback_query(
+    AdminStates.bulk_selecting_managers,
+    BulkToggleCallback.filter() | (F.data == "bulk_select_all")
+)
+async def bulk_toggle_manager(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    state: FSMContext,
+    callback_data: Optional[BulkToggleCallback] = None
+):
+    """Отметить или снять отметку с менеджера"""
+    await callback.answer()
+
+    managers = await _available_managers(session, callback.from_user.id)
+
+    available_ids = {manager.id for manager in managers}
+    data = await state.get_data()
+    selected = set(data.get("bulk_selected", [])) & available_ids
+
+    if callback_data is None:
+        selected = set() if selected == available_ids else available_ids
+    elif callback_data.manager_id in available_ids:
+        selected ^= {callback_data.manager_id}
+
+    await state.update_data(bulk_selected=sorted(selected))
+    await message_renderer.edit_reply_markup(
+        callback.message,
+        reply_markup=get_manager_multiselect_keyboard(managers, frozenset(selected))
+    )
+
+
+@router.callback_query(AdminStates.bulk_selecting_managers, F.data == "bulk_selection_done")
+async def bulk_selection_done(callback: CallbackQuery, state: FSMContext):
+    """Завершить выбор менеджеров"""
+    data = await state.get_data()
+    selected = data.get("bulk_selected", [])
+    if not selected:
+        await callback.answer("Отметьте хотя бы одного менеджера", show_alert=True)
+        return
+
+    await callback.answer()
+    await state.set_state(AdminStates.bulk_waiting_for_task_text)
+    await message_renderer.edit(callback.message, f"📝 Выбрано менеджеров: {len(selected)}\n\nВведите текст задачи:")
+
+
+@router.message(AdminStates.bulk_waiting_for_task_text)
+async def bulk_process_task_text(message: Message, state: FSMContext):
+    """Обработать текст задачи для нескольких менеджеров"""
+    task_text = (message.text or "").strip()
+
+    if len(task_text) < 3:
+        await message.answer("❌ Текст задачи должен содержать минимум 3 символа. Попробуйте снова:")
+        return
+
+    await state.update_data(task_text=task_text)
+    await state.set_state(AdminStates.bulk_waiting_for_task_deadline)
+    await message.answer(
+        "📅 Введите дедлайн в формате <b>ДД.ММ.ГГГГ</b> (например, 25.12.2024):\n\n"
+        "⚠️ <b>Важно:</b> Дата должна быть в будущем!",
+        parse_mode="HTML"
+    )
+
+
+@router.message(AdminStates.bulk_waiting_for_task_deadline)
+async def bulk_process_task_deadline(message: Message, session: AsyncSession, state: FSMContext, is_admin=False):
+    """Создать одну задачу для всех выбранных менеджеров"""
+    deadline_day = parse_deadline(message.text or "", time_zones.zone_for_telegram(message.from_user.id))
+    if deadline_day is None:
+        await message.answer(
+            "❌ Неверная или прошедшая дата! Используйте формат <b>ДД.ММ.ГГГГ</b> (например, 25.12.2024)",
+            parse_mode="HTML"
+        )
+        return
+
+    data = await state.get_data()
+    task_text = data.get("task_text")
+    manager_ids = [
+        manager_id for manager_id in data.get("bulk_selected", [])
+        if permission_index.can_manage(message.from_user.id, manager_id)
+    ]
+    tasks = [
+        {"manager_id": manager_id, "text": task_text, "deadline": end_of_day(deadline_day, time_zones.zone_for(manager_id))}
+        for manager_id in manager_ids
+    ]
+
+    created = await TaskService.create_tasks_bulk(session, tasks)
+    # Подтверждение — только после фиксации задач
+    await session.commit()
+
+    await state.clear()
+    await message.answer(
+        f"✅ Задача назначена менеджерам: {created}\n\n"
+        f"📌 Текст: {task_text}\n"
+        f"📅 Дедлайн: {deadline_day.strftime('%d.%m.%Y')}",
+        reply_markup=get_staff_menu(is_admin)
+    )
+
+
+@router.callback_query(F.data == "bulk_mode_list")
+async def bulk_mode_list(callback: CallbackQuery, state: FSMContext):
+    """Список задач: запросить текст или CSV-файл"""
+    await callback.answer()
+    await state.set_state(AdminStates.bulk_waiting_for_task_list)
+    await message_renderer.edit(
+        callback.message,
+        "📄 Отправьте список задач сообщением или CSV-файлом.\n\n"
+        "Одна задача на строку:\n"
+        "<code>менеджер; текст задачи; ДД.ММ.ГГГГ</code>\n\n"
+        "Менеджер — Telegram ID или @username.\n"
+        f"Максимум {MAX_BULK_ROWS} строк за раз.",
+        parse_mode="HTML"
+    )
+
+
+@router.message(AdminStates.bulk_waiting_for_task_list, F.text | F.document)
+async def bulk_process_task_list(message: Message, session: AsyncSession, state: FSMContext, bot: Bot, is_admin=False):
+    """Разобрать список задач и создать их одной транзакцией"""
+    if message.document:
+        if message.document.file_size and message.document.file_size > MAX_DOCUMENT_SIZE:
+            await message.answer("❌ Файл слишком большой (максимум 1 МБ).")
+            return
+        buffer = io.BytesIO()
+        await bot.download(message.document, destination=buffer)
+        try:
+            content = BulkTaskService.read_document(buffer.getvalue())
+        except ValueError:
+            await message.answer("❌ Не удалось прочитать файл. Сохраните CSV в кодировке UTF-8.")
+            return
+    else:
+        content = message.text
+
+    parsed = await BulkTaskService.parse(
+        session, content, manager_ids=permission_index.managed_ids(message.from_user.id)
+    )
+    if parsed.tasks:
+        created = await TaskService.create_tasks_bulk(session, parsed.tasks)
+        await session.commit()
+
+    errors_text = ""
+    if parsed.errors:
+        errors_text = "\n\n⚠️ <b>Пропущены строки:</b>\n" + "\n".join(html.escape(error) for error in parsed.errors[:15])
+        if len(parsed.errors) > 15:
+            errors_text += f"\n... и ещё {len(parsed.errors) - 15}"
+
+    if not parsed.tasks:
+        await message.answer(
+            "❌ Не найдено ни одной корректной задачи. Исправьте список и отправьте снова." + errors_text,
+            parse_mode="HTML"
+        )
+        return
+
+    await state.clear()
+    await message.answer(
+        f"✅ Создано задач: {created}" + errors_text,
+        reply_markup=get_staff_menu(is_admin),
+        parse_mode="HTML"
+    )
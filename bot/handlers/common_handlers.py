@@ -1,23 +1,33 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
-from bot.keyboards.admin_keyboards import get_admin_menu
+from aiogram.filters import Command, CommandObject
+from bot.keyboards.admin_keyboards import get_admin_menu, get_team_lead_menu
 from bot.keyboards.manager_keyboards import get_manager_menu
+from bot.services.user_service import UserService
+from bot.services.time_service import time_zones, is_valid_zone
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from bot.services.render_service import message_renderer
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = Router()
+# Подключается последним: ловит кнопки, не подошедшие ни одному обработчику
+fallback_router = Router()
 
 
 @router.message(Command("start"))
-async def cmd_start(message: Message, user=None, is_admin=False):
+async def cmd_start(message: Message, user=None, is_admin=False, is_team_lead=False):
     """Обработчик команды /start"""
     logger.info(f"Received /start from user {message.from_user.id}, is_admin={is_admin}")
     try:
         if is_admin:
             text = "👋 Добро пожаловать, администратор!\n\nВыберите действие:"
             await message.answer(text, reply_markup=get_admin_menu())
+        elif is_team_lead:
+            text = "👋 Добро пожаловать, руководитель группы!\n\nВыберите действие:"
+            await message.answer(text, reply_markup=get_team_lead_menu())
         else:
             text = "👋 Добро пожаловать!\n\nВыберите действие:"
             await message.answer(text, reply_markup=get_manager_menu())
@@ -27,14 +37,56 @@ async def cmd_start(message: Message, user=None, is_admin=False):
         await message.answer("❌ Произошла ошибка. Попробуйте позже.")
 
 
+@router.message(Command("timezone"))
+async def cmd_timezone(message: Message, session: AsyncSession, command: CommandObject, is_admin=False):
+    """Часовой пояс: /timezone [Зона|reset]; администратор — /timezone <telegram_id> <Зона|reset>"""
+    args = (command.args or "").split()
+    telegram_id = message.from_user.id
+    if len(args) == 2 and is_admin and args[0].isdigit():
+        telegram_id = int(args[0])
+        args = args[1:]
+    
+    if not args:
+        zone = time_zones.zone_for_telegram(telegram_id)
+        await message.answer(
+            f"🕐 Часовой пояс: <b>{zone.key}</b>, сейчас {datetime.now(zone).strftime('%d.%m.%Y %H:%M')}\n\n"
+            f"Изменить: <code>/timezone Europe/Moscow</code>, вернуть пояс команды: <code>/timezone reset</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    zone_name = None if args[0].lower() == "reset" else args[0]
+    if len(args) != 1 or (zone_name is not None and not is_valid_zone(zone_name)):
+        await message.answer(
+            "❌ Неизвестный часовой пояс. Укажите зону IANA, например <code>Europe/Minsk</code> или <code>Asia/Almaty</code>.",
+            parse_mode="HTML"
+        )
+        return
+    
+    user = await UserService.set_timezone(session, telegram_id, zone_name)
+    if not user:
+        await message.answer("❌ Пользователь не найден. Он должен хотя бы раз запустить бота.")
+        return
+    zone = time_zones.zone_for_telegram(telegram_id)
+    await message.answer(f"✅ Часовой пояс: {zone.key}. Новые дедлайны считаются по нему.")
+
+
 @router.callback_query(F.data == "back_to_menu")
-async def back_to_menu(callback: CallbackQuery, user=None, is_admin=None):
+async def back_to_menu(callback: CallbackQuery, user=None, is_admin=None, is_team_lead=None):
     """Возврат в главное меню"""
     await callback.answer()
     if is_admin:
         text = "👋 Главное меню администратора"
-        await callback.message.edit_text(text, reply_markup=get_admin_menu())
+        await message_renderer.edit(callback.message, text, reply_markup=get_admin_menu())
+    elif is_team_lead:
+        text = "👋 Главное меню руководителя группы"
+        await message_renderer.edit(callback.message, text, reply_markup=get_team_lead_menu())
     else:
         text = "👋 Главное меню"
-        await callback.message.edit_text(text, reply_markup=get_manager_menu())
+        await message_renderer.edit(callback.message, text, reply_markup=get_manager_menu())
+
 
+@fallback_router.callback_query()
+async def stale_callback(callback: CallbackQuery):
+    """Кнопка старого формата данных или недоступная пользователю"""
+    await callback.answer("⌛ Кнопка недоступна или устарела. Откройте меню заново: /start", show_alert=True)
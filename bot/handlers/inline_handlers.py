@@ -0,0 +1,201 @@
+from aiogram import Router
+from aiogram.types import (
+    InlineQuery, InlineQueryResultArticle, InputTextMessageContent,
+    InlineKeyboardMarkup, InlineKeyboardButton
+)
+from bot.handlers.search_handlers import search_scope, STATUS_EMOJI
+from bot.keyboards.callbacks import TaskAction, TaskCallback
+from bot.services.inline_cache import inline_cache, TaskSnapshot, ManagerSnapshot
+from bot.services.search_service import SearchService
+from bot.services.task_service import TaskService
+from bot.services.permission_service import permission_index
+from bot.services.time_service import time_zones, format_local, DATETIME_FORMAT
+from bot.database.models import User
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Sequence
+import html
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Telegram показывает не больше 50 результатов на ответ
+MAX_RESULTS = 50
+MAX_MANAGER_RESULTS = 10
+MAX_TASK_RESULTS = 20
+# Ответ кэшируется и на стороне Telegram: повторный ввод того же запроса
+# в течение этого времени до бота не доходит
+CACHE_TIME = 10
+
+
+def _task_snapshot(task) -> TaskSnapshot:
+    return TaskSnapshot(
+        id=task.id,
+        manager_id=task.manager_id,
+        text=task.text,
+        deadline=task.deadline,
+        status=task.status,
+        not_completed_reason=task.not_completed_reason
+    )
+
+
+async def _manager_tasks(session: AsyncSession, user: User, query: str) -> Sequence[TaskSnapshot]:
+    """Активные задачи менеджера; полный список кэшируется и фильтруется в памяти"""
+    cached = inline_cache.get("tasks", user.id, query)
+    if cached is not None:
+        return cached
+
+    tasks = await TaskService.get_active_tasks_by_manager(session, user.id)
+
+    snapshots = [_task_snapshot(task) for task in tasks]
+    inline_cache.put("tasks", user.id, "", snapshots, complete=True)
+    return inline_cache.get("tasks", user.id, query)
+
+
+async def _staff_managers(session: AsyncSession, user: User, query: str) -> Sequence[ManagerSnapshot]:
+    """Статистика подчинённых менеджеров, отфильтрованная по имени"""
+    cached = inline_cache.get("managers", user.telegram_id, query)
+    if cached is not None:
+        return cached
+
+    stats = await TaskService.get_detailed_manager_statistics(
+        session, manager_ids=permission_index.managed_ids(user.telegram_id)
+    )
+
+    snapshots = [
+        ManagerSnapshot(
+            id=stat["user_id"],
+            telegram_id=stat["telegram_id"],
+            name=stat["name"],
+            username=stat["username"],
+            total=stat["total"],
+            completed=stat["completed"],
+            not_completed=stat["not_completed"],
+            active=stat["active"],
+            percentage=stat["percentage"]
+        )
+        for stat in stats
+    ]
+    inline_cache.put("managers", user.telegram_id, "", snapshots, complete=True)
+    return inline_cache.get("managers", user.telegram_id, query)
+
+
+async def _staff_tasks(session: AsyncSession, user: User, query: str) -> Sequence[TaskSnapshot]:
+    """Задачи подчинённых по полнотекстовому поиску"""
+    cached = inline_cache.get("search", user.telegram_id, query)
+    if cached is not None:
+        return cached
+
+    tasks, total = await SearchService.search_tasks(
+        session, query, manager_ids=search_scope(user), limit=MAX_TASK_RESULTS
+    )
+
+    snapshots = [_task_snapshot(task) for task in tasks]
+    # Набор полный, если в него вошли все совпадения: уточнения запроса
+    # можно будет отфильтровать из него
+    inline_cache.put("search", user.telegram_id, query, snapshots, complete=total <= MAX_TASK_RESULTS)
+    return snapshots
+
+
+def _task_article(task: TaskSnapshot, with_actions: bool) -> InlineQueryResultArticle:
+    deadline_str = format_local(task.deadline, time_zones.zone_for(task.manager_id), DATETIME_FORMAT)
+    emoji = STATUS_EMOJI.get(task.status, "⚪")
+    reply_markup = None
+    if with_actions:
+        reply_markup = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="✅ ВЫПОЛНЕНО", callback_data=TaskCallback(action=TaskAction.COMPLETE, task_id=task.id).pack())
+        ]])
+    return InlineQueryResultArticle(
+        id=f"task_{task.id}",
+        title=f"{emoji} #{task.id} {task.text[:60]}",
+        description=f"до {deadline_str}",
+        input_message_content=InputTextMessageContent(
+            message_text=(
+                f"📌 <b>Задача #{task.id}</b>\n\n"
+                f"{html.escape(task.text)}\n\n"
+                f"📅 Дедлайн: {deadline_str}"
+            ),
+            parse_mode="HTML"
+        ),
+        reply_markup=reply_markup
+    )
+
+
+def _manager_article(manager: ManagerSnapshot) -> InlineQueryResultArticle:
+    name = html.escape(manager.name)
+    return InlineQueryResultArticle(
+        id=f"manager_{manager.id}",
+        title=f"👤 {manager.name}",
+        description=(
+            f"Активных: {manager.active} | Выполнено: {manager.completed}/{manager.total} "
+            f"({manager.percentage}%)"
+        ),
+        input_message_content=InputTextMessageContent(
+            message_text=(
+                f"👤 <b>{name}</b>\n\n"
+                f"📋 Всего задач: {manager.total}\n"
+                f"✅ Выполнено: {manager.completed}\n"
+                f"❌ Не выполнено: {manager.not_completed}\n"
+                f"🟡 Активных: {manager.active}\n"
+                f"📊 Процент выполнения: {manager.percentage}%"
+            ),
+            parse_mode="HTML"
+        )
+    )
+
+
+def _summary_article(managers: Sequence[ManagerSnapshot]) -> InlineQueryResultArticle:
+    total = sum(manager.total for manager in managers)
+    completed = sum(manager.completed for manager in managers)
+    not_completed = sum(manager.not_completed for manager in managers)
+    active = sum(manager.active for manager in managers)
+    percentage = round(completed / total * 100, 2) if total else 0
+    return InlineQueryResultArticle(
+        id="summary",
+        title="📊 Общая статистика",
+        description=f"Менеджеров: {len(managers)} | Активных задач: {active} | Выполнено: {percentage}%",
+        input_message_content=InputTextMessageContent(
+            message_text=(
+                f"📊 <b>Общая статистика</b>\n\n"
+                f"👥 Менеджеров: {len(managers)}\n"
+                f"📋 Всего задач: {total}\n"
+                f"✅ Выполнено: {completed}\n"
+                f"❌ Не выполнено: {not_completed}\n"
+                f"🟡 Активных: {active}\n"
+                f"📊 Процент выполнения: {percentage}%"
+            ),
+            parse_mode="HTML"
+        )
+    )
+
+
+@router.inline_query()
+async def inline_lookup(inline_query: InlineQuery, session: AsyncSession, user=None):
+    """Inline-режим: @бот <запрос>.
+
+    Менеджер видит свои активные задачи и может отметить их выполненными,
+    руководитель — общую статистику, менеджеров и задачи команды.
+    """
+    if not user:
+        await inline_query.answer([], cache_time=CACHE_TIME, is_personal=True)
+        return
+
+    query = inline_query.query.strip()
+    results: List[InlineQueryResultArticle] = []
+
+    if permission_index.is_staff(user.telegram_id):
+        if not query:
+            managers = await _staff_managers(session, user, "")
+            results.append(_summary_article(managers))
+            results.extend(_manager_article(manager) for manager in managers[:MAX_MANAGER_RESULTS])
+        else:
+            managers = await _staff_managers(session, user, query)
+            results.extend(_manager_article(manager) for manager in managers[:MAX_MANAGER_RESULTS])
+            tasks = await _staff_tasks(session, user, query)
+            results.extend(_task_article(task, with_actions=False) for task in tasks)
+    else:
+        tasks = await _manager_tasks(session, user, query)
+        results.extend(_task_article(task, with_actions=True) for task in tasks[:MAX_RESULTS])
+
+    await inline_query.answer(results[:MAX_RESULTS], cache_time=CACHE_TIME, is_personal=True)
@@ -2,10 +2,17 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from datetime import datetime
+from typing import Optional, Tuple
 from bot.keyboards.manager_keyboards import get_manager_menu, get_tasks_keyboard, get_task_actions_keyboard
-from bot.services.task_service import TaskService
-from bot.database.database import get_session
+from bot.keyboards.callbacks import TaskAction, TaskCallback, TasksPageCallback, decode_cursor
+from bot.services.task_service import TaskService, TRANSITION_CONFLICT, TRANSITION_NOT_FOUND
+from bot.services.task_event_service import TaskEventService, EVENT_RESCHEDULED
+from bot.services.render_service import message_renderer
+from bot.services.workload_service import WorkloadService, format_workload, WORKLOAD_LEGEND
+from bot.services.time_service import time_zones, format_local, local_today, end_of_day, DATETIME_FORMAT
+from sqlalchemy.ext.asyncio import AsyncSession
 from bot.states.manager_states import ManagerStates
+import html
 import logging
 import re
 
@@ -13,118 +20,223 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
+PAGE_SIZE = 10
+
+
+async def _show_tasks_page(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    user,
+    page: int = 0,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    backward: bool = False
+):
+    """Показать страницу активных задач по keyset-курсору"""
+    workload = await WorkloadService.get_workload(session, user.id)
+    if not workload.total:
+        await message_renderer.edit(
+            callback.message,
+            "✅ У вас нет активных задач!",
+            reply_markup=get_manager_menu()
+        )
+        return
+
+    tasks, has_more = await TaskService.get_active_tasks_page(
+        session, user.id, PAGE_SIZE, cursor=cursor, backward=backward
+    )
+    if backward:
+        # Назад идём со следующей страницы; если раньше задач нет — это первая
+        has_next = True
+        if not has_more:
+            page = 0
+    else:
+        has_next = has_more
+    if not tasks:
+        # Задачи страницы успели выполнить — начинаем сначала
+        page = 0
+        tasks, has_next = await TaskService.get_active_tasks_page(session, user.id, PAGE_SIZE)
+
+    zone = time_zones.zone_for(user.id)
+    text = (
+        f"📋 <b>Ваши активные задачи ({workload.total}):</b>\n"
+        f"{format_workload(workload)}\n"
+        f"<i>{WORKLOAD_LEGEND}</i>\n\n"
+    )
+    start = page * PAGE_SIZE
+    for i, task in enumerate(tasks, start + 1):
+        deadline_str = format_local(task.deadline, zone)
+        text += f"{i}. {task.text[:50]}... (до {deadline_str})\n"
+
+    await message_renderer.edit(
+        callback.message,
+        text,
+        reply_markup=get_tasks_keyboard(tasks, page=page, has_next=has_next, zone=zone),
+        parse_mode="HTML"
+    )
+
 
 @router.callback_query(F.data == "manager_my_tasks")
-async def show_my_tasks(callback: CallbackQuery, user=None):
+async def show_my_tasks(callback: CallbackQuery, session: AsyncSession, user=None):
     """Показать активные задачи менеджера"""
     await callback.answer()
-    
-    async for session in get_session():
-        tasks = await TaskService.get_active_tasks_by_manager(session, user.id)
-        
-        if not tasks:
-            await callback.message.edit_text(
-                "✅ У вас нет активных задач!",
-                reply_markup=get_manager_menu()
-            )
-        else:
-            text = f"📋 <b>Ваши активные задачи ({len(tasks)}):</b>\n\n"
-            for i, task in enumerate(tasks[:10], 1):
-                deadline_str = task.deadline.strftime("%d.%m.%Y")
-                text += f"{i}. {task.text[:50]}... (до {deadline_str})\n"
-            
-            await callback.message.edit_text(
-                text,
-                reply_markup=get_tasks_keyboard(tasks),
-                parse_mode="HTML"
-            )
-        break
+    await _show_tasks_page(callback, session, user)
 
 
-@router.callback_query(F.data.startswith("task_") & ~F.data.startswith("task_complete_") & ~F.data.startswith("task_not_complete_") & ~F.data.startswith("tasks_page_"))
-async def show_task_details(callback: CallbackQuery, user=None):
+async def show_task_details(
+    callback: CallbackQuery,
+    callback_data: TaskCallback,
+    session: AsyncSession,
+    state: FSMContext,
+    user=None
+):
     """Показать детали задачи"""
     await callback.answer()
     
-    task_id = int(callback.data.split("_")[1])
-    
-    async for session in get_session():
-        task = await TaskService.get_task_by_id(session, task_id)
+    task = await TaskService.get_task_by_id(session, callback_data.task_id)
         
-        if not task or task.manager_id != user.id or task.status != "active":
-            await callback.message.edit_text(
-                "❌ Задача не найдена или недоступна!",
-                reply_markup=get_manager_menu()
-            )
-            break
-        
-        deadline_str = task.deadline.strftime("%d.%m.%Y %H:%M")
-        text = (
-            f"📌 <b>Задача #{task.id}</b>\n\n"
-            f"<b>Текст:</b> {task.text}\n"
-            f"<b>Дедлайн:</b> {deadline_str}\n\n"
-            f"Выберите действие:"
+    if not task or task.manager_id != user.id or task.status != "active":
+        await message_renderer.edit(
+            callback.message,
+            "❌ Задача не найдена или недоступна!",
+            reply_markup=get_manager_menu()
         )
+        return
         
-        await callback.message.edit_text(
-            text,
-            reply_markup=get_task_actions_keyboard(task_id),
-            parse_mode="HTML"
-        )
-        break
+    history = await TaskEventService.get_task_history(session, task.id)
+    reschedules = [event for event in history if event.event_type == EVENT_RESCHEDULED]
+        
+    zone = time_zones.zone_for(user.id)
+    deadline_str = format_local(task.deadline, zone, DATETIME_FORMAT)
+    text = (
+        f"📌 <b>Задача #{task.id}</b>\n\n"
+        f"<b>Текст:</b> {task.text}\n"
+        f"<b>Дедлайн:</b> {deadline_str}\n"
+    )
+    if reschedules:
+        text += f"<b>Переносов:</b> {len(reschedules)}\n"
+        for event in reschedules[-3:]:
+            text += (
+                f"   🔄 {format_local(event.old_deadline, zone, '%d.%m')} → {format_local(event.new_deadline, zone, '%d.%m')}: "
+                f"{html.escape(event.reason or '')}\n"
+            )
+    text += "\nВыберите действие:"
+        
+    await message_renderer.edit(
+        callback.message,
+        text,
+        reply_markup=get_task_actions_keyboard(task.id, task.version),
+        parse_mode="HTML"
+    )
 
 
-@router.callback_query(F.data.startswith("task_complete_"))
-async def complete_task(callback: CallbackQuery, user=None):
+async def complete_task(
+    callback: CallbackQuery,
+    callback_data: TaskCallback,
+    session: AsyncSession,
+    state: FSMContext,
+    user=None
+):
     """Отметить задачу как выполненную"""
-    await callback.answer()
-    
-    task_id = int(callback.data.split("_")[2])
-    
-    async for session in get_session():
-        task = await TaskService.get_task_by_id(session, task_id)
-        
-        if not task or task.manager_id != user.id:
-            await callback.message.edit_text(
-                "❌ Задача не найдена!",
-                reply_markup=get_manager_menu()
-            )
-            break
+    task_id = callback_data.task_id
+    result = None
+    if user:
+        result = await TaskService.complete_task(
+            session, task_id, manager_id=user.id, expected_version=callback_data.version
+        )
+        # Ответ пользователю — только после фиксации
+        await session.commit()
+    # Повторное нажатие: задача уже выполнена — считаем действие успешным
+    done = result is not None and (result.applied or result.status == "completed")
         
-        await TaskService.complete_task(session, task_id)
+    if callback.message is None:
+        # Кнопка под сообщением из inline-режима: меню показать негде
+        if result is None or result.outcome == TRANSITION_NOT_FOUND:
+            await callback.answer("❌ Задача не найдена!", show_alert=True)
+            return
+        if not done:
+            await callback.answer("⚠️ Задача изменилась. Откройте её заново.", show_alert=True)
+            return
+        await callback.answer("✅ Задача отмечена как выполненная!")
+        await callback.bot.edit_message_text(
+            f"✅ <b>Задача #{task_id} выполнена</b>\n\n{html.escape(result.text)}",
+            inline_message_id=callback.inline_message_id,
+            parse_mode="HTML"
+        )
+        return
         
-        await callback.message.edit_text(
+    await callback.answer()
+    if result is None or result.outcome == TRANSITION_NOT_FOUND:
+        await message_renderer.edit(
+            callback.message,
+            "❌ Задача не найдена!",
+            reply_markup=get_manager_menu()
+        )
+    elif not done:
+        await message_renderer.edit(
+            callback.message,
+            "⚠️ Задача была изменена, пока вы её смотрели. Откройте список задач заново.",
+            reply_markup=get_manager_menu()
+        )
+    else:
+        await message_renderer.edit(
+            callback.message,
             "✅ Задача отмечена как выполненная!",
             reply_markup=get_manager_menu()
         )
-        break
 
 
-@router.callback_query(F.data.startswith("task_not_complete_"))
-async def not_complete_task(callback: CallbackQuery, state: FSMContext, user=None):
+async def not_complete_task(
+    callback: CallbackQuery,
+    callback_data: TaskCallback,
+    session: AsyncSession,
+    state: FSMContext,
+    user=None
+):
     """Начать процесс отметки задачи как невыполненной"""
     await callback.answer()
     
-    task_id = int(callback.data.split("_")[3])
-    
-    async for session in get_session():
-        task = await TaskService.get_task_by_id(session, task_id)
+    task = await TaskService.get_task_by_id(session, callback_data.task_id)
         
-        if not task or task.manager_id != user.id:
-            await callback.message.edit_text(
-                "❌ Задача не найдена!",
-                reply_markup=get_manager_menu()
-            )
-            break
+    if not task or task.manager_id != user.id or task.status != "active":
+        await message_renderer.edit(
+            callback.message,
+            "❌ Задача не найдена!",
+            reply_markup=get_manager_menu()
+        )
+        return
         
-        await state.update_data(task_id=task_id)
-        await state.set_state(ManagerStates.waiting_for_not_completed_reason)
+    # Перенос применится, только если задача не изменится, пока вводится причина
+    version = task.version if callback_data.version is None else callback_data.version
+    await state.update_data(task_id=task.id, task_version=version)
+    await state.set_state(ManagerStates.waiting_for_not_completed_reason)
         
-        await callback.message.edit_text(
-            "❌ Задача не выполнена.\n\n"
-            "📝 Пожалуйста, укажите причину, почему задача не выполнена:"
-        )
-        break
+    await message_renderer.edit(
+        callback.message,
+        "❌ Задача не выполнена.\n\n"
+        "📝 Пожалуйста, укажите причину, почему задача не выполнена:"
+    )
+
+
+# Действие выбирается по коду из данных кнопки одним поиском в словаре
+_TASK_ACTIONS = {
+    TaskAction.VIEW: show_task_details,
+    TaskAction.COMPLETE: complete_task,
+    TaskAction.NOT_COMPLETE: not_complete_task,
+}
+
+
+@router.callback_query(TaskCallback.filter())
+async def task_action(
+    callback: CallbackQuery,
+    callback_data: TaskCallback,
+    session: AsyncSession,
+    state: FSMContext,
+    user=None
+):
+    """Действия с задачей из списка, карточки и inline-режима"""
+    await _TASK_ACTIONS[callback_data.action](
+        callback, callback_data, session=session, state=state, user=user
+    )
 
 
 @router.message(ManagerStates.waiting_for_not_completed_reason)
@@ -149,7 +261,7 @@ async def process_not_completed_reason(message: Message, state: FSMContext):
 
 
 @router.message(ManagerStates.waiting_for_new_deadline)
-async def process_new_deadline(message: Message, state: FSMContext, user=None):
+async def process_new_deadline(message: Message, session: AsyncSession, state: FSMContext, user=None):
     """Обработать новый дедлайн"""
     date_str = message.text.strip()
     
@@ -161,12 +273,12 @@ async def process_new_deadline(message: Message, state: FSMContext, user=None):
         )
         return
     
+    zone = time_zones.zone_for(user.id)
     try:
-        new_deadline = datetime.strptime(date_str, "%d.%m.%Y")
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        new_deadline = new_deadline.replace(hour=23, minute=59, second=59)
+        deadline_day = datetime.strptime(date_str, "%d.%m.%Y").date()
+        new_deadline = end_of_day(deadline_day, zone)
         
-        if new_deadline.date() <= today.date():
+        if deadline_day <= local_today(zone):
             await message.answer(
                 "❌ Дата должна быть в будущем (не сегодня и не в прошлом)! Попробуйте снова:"
             )
@@ -176,26 +288,35 @@ async def process_new_deadline(message: Message, state: FSMContext, user=None):
         task_id = data.get("task_id")
         reason = data.get("reason")
         
-        async for session in get_session():
-            task = await TaskService.update_task_deadline(
-                session, task_id, new_deadline, reason
-            )
+        result = await TaskService.update_task_deadline(
+            session,
+            task_id,
+            new_deadline,
+            reason,
+            manager_id=user.id,
+            expected_version=data.get("task_version")
+        )
+        await session.commit()
             
-            if task:
-                deadline_str = new_deadline.strftime("%d.%m.%Y")
-                await message.answer(
-                    f"✅ Дедлайн обновлён!\n\n"
-                    f"📅 Новый дедлайн: {deadline_str}\n"
-                    f"📝 Причина: {reason}\n\n"
-                    f"Задача снова активна.",
-                    reply_markup=get_manager_menu()
-                )
-            else:
-                await message.answer(
-                    "❌ Ошибка при обновлении дедлайна!",
-                    reply_markup=get_manager_menu()
-                )
-            break
+        if result.applied:
+            deadline_str = format_local(new_deadline, zone)
+            await message.answer(
+                f"✅ Дедлайн обновлён!\n\n"
+                f"📅 Новый дедлайн: {deadline_str}\n"
+                f"📝 Причина: {reason}\n\n"
+                f"Задача снова активна.",
+                reply_markup=get_manager_menu()
+            )
+        elif result.outcome == TRANSITION_CONFLICT:
+            await message.answer(
+                "⚠️ Задача была изменена, пока вы вводили причину. Дедлайн не обновлён.",
+                reply_markup=get_manager_menu()
+            )
+        else:
+            await message.answer(
+                "❌ Ошибка при обновлении дедлайна!",
+                reply_markup=get_manager_menu()
+            )
         
         await state.clear()
         
@@ -206,32 +327,20 @@ async def process_new_deadline(message: Message, state: FSMContext, user=None):
         )
 
 
-@router.callback_query(F.data.startswith("tasks_page_"))
-async def tasks_pagination(callback: CallbackQuery, user=None):
+@router.callback_query(TasksPageCallback.filter())
+async def tasks_pagination(
+    callback: CallbackQuery,
+    callback_data: TasksPageCallback,
+    session: AsyncSession,
+    user=None
+):
     """Пагинация задач"""
     await callback.answer()
-    
-    page = int(callback.data.split("_")[2])
-    
-    async for session in get_session():
-        tasks = await TaskService.get_active_tasks_by_manager(session, user.id)
-        
-        if not tasks:
-            await callback.message.edit_text(
-                "✅ У вас нет активных задач!",
-                reply_markup=get_manager_menu()
-            )
-        else:
-            text = f"📋 <b>Ваши активные задачи ({len(tasks)}):</b>\n\n"
-            start = page * 10
-            for i, task in enumerate(tasks[start:start+10], start+1):
-                deadline_str = task.deadline.strftime("%d.%m.%Y")
-                text += f"{i}. {task.text[:50]}... (до {deadline_str})\n"
-            
-            await callback.message.edit_text(
-                text,
-                reply_markup=get_tasks_keyboard(tasks, page=page),
-                parse_mode="HTML"
-            )
-        break
-
+    await _show_tasks_page(
+        callback,
+        session,
+        user,
+        page=callback_data.page,
+        cursor=decode_cursor(callback_data.deadline, callback_data.task_id),
+        backward=callback_data.backward
+    )
@@ -0,0 +1,72 @@
+from aiogram import Router, F
+from aiogram.types import CallbackQuery
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.keyboards.admin_keyboards import get_report_keyboard, get_staff_menu
+from bot.keyboards.callbacks import ReportCallback
+from bot.services.report_service import ReportService, render_report, PERIOD_DAILY, PERIOD_LENGTH
+from bot.services.permission_service import permission_index, ROLE_ADMIN, ROLE_TEAM_LEAD
+from bot.services.render_service import message_renderer
+from bot.filters.role_filter import RoleFilter
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+router.callback_query.filter(RoleFilter(ROLE_ADMIN, ROLE_TEAM_LEAD))
+
+
+async def _show_report(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    period: str,
+    period_start: Optional[datetime]
+):
+    """Показать сохранённый отчёт; таблица задач при этом не читается"""
+    if period_start is None:
+        period_start = await ReportService.get_latest_period(session, period)
+    if period_start is None:
+        await message_renderer.edit(
+            callback.message,
+            "📈 Отчётов пока нет: они строятся каждую ночь за прошедшие сутки и неделю.",
+            reply_markup=get_report_keyboard(period, None, None)
+        )
+        return
+
+    reports = await ReportService.get_report(
+        session, period, period_start, manager_ids=permission_index.managed_ids(callback.from_user.id)
+    )
+    previous, following = await ReportService.get_adjacent_periods(session, period, period_start)
+    await message_renderer.edit(
+        callback.message,
+        render_report(period, period_start, reports),
+        reply_markup=get_report_keyboard(period, previous, following),
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(F.data == "admin_reports")
+async def show_reports(callback: CallbackQuery, session: AsyncSession):
+    """Последний ежедневный отчёт"""
+    await callback.answer()
+    await _show_report(callback, session, PERIOD_DAILY, None)
+
+
+@router.callback_query(ReportCallback.filter())
+async def navigate_reports(
+    callback: CallbackQuery,
+    callback_data: ReportCallback,
+    session: AsyncSession,
+    is_admin=False
+):
+    """Переход между периодами и типами отчётов"""
+    await callback.answer()
+
+    period = callback_data.period
+    if period not in PERIOD_LENGTH:
+        await message_renderer.edit(callback.message, "❌ Неизвестный отчёт.", reply_markup=get_staff_menu(is_admin))
+        return
+
+    period_start = None if callback_data.day == "latest" else datetime.strptime(callback_data.day, "%Y%m%d")
+    await _show_report(callback, session, period, period_start)
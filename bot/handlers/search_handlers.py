@@ -0,0 +1,109 @@
+from aiogram import Router
+from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from bot.keyboards.common_keyboards import get_search_pagination_keyboard
+from bot.keyboards.callbacks import SearchPageCallback
+from bot.services.search_service import SearchService, MAX_COUNTED
+from bot.services.permission_service import permission_index
+from bot.services.render_service import message_renderer
+from bot.services.time_service import time_zones, format_local
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.database.models import Task, User
+from typing import List, Optional, FrozenSet
+import html
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+PAGE_SIZE = 10
+
+STATUS_EMOJI = {
+    "active": "🟡",
+    "completed": "✅",
+    "not_completed": "❌"
+}
+
+
+def search_scope(user: User) -> Optional[FrozenSet[int]]:
+    """Менеджеры, среди задач которых ищет пользователь; None — все"""
+    if permission_index.is_staff(user.telegram_id):
+        return permission_index.managed_ids(user.telegram_id)
+    return frozenset({user.id})
+
+
+def _render_results(query: str, tasks: List[Task], total: int, page: int, show_manager: bool) -> str:
+    if not tasks:
+        return f"🔍 По запросу «{html.escape(query)}» ничего не найдено."
+
+    total_str = f"{total}+" if total >= MAX_COUNTED else str(total)
+    text = f"🔍 <b>Найдено задач: {total_str}</b> (стр. {page + 1})\n\n"
+    for task in tasks:
+        emoji = STATUS_EMOJI.get(task.status, "⚪")
+        task_text = task.text[:80] + "..." if len(task.text) > 80 else task.text
+        header = f"{emoji} <b>#{task.id}</b>"
+        if show_manager and task.manager:
+            manager_name = task.manager.first_name or task.manager.username or f"ID: {task.manager.telegram_id}"
+            header += f" | {html.escape(manager_name)}"
+        text += (
+            f"{header}\n"
+            f"   {html.escape(task_text)}\n"
+            f"   📅 {format_local(task.deadline, time_zones.zone_for(task.manager_id))}\n\n"
+        )
+    return text
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, session: AsyncSession, command: CommandObject, state: FSMContext, user=None):
+    """Поиск задач: /search <запрос>"""
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer(
+            "🔍 Использование: <code>/search текст</code>\n\n"
+            "Также можно искать прямо в любом чате: <code>@имя_бота текст</code>",
+            parse_mode="HTML"
+        )
+        return
+
+    await state.update_data(search_query=query)
+    tasks, total = await SearchService.search_tasks(
+        session, query, manager_ids=search_scope(user), limit=PAGE_SIZE
+    )
+
+    await message.answer(
+        _render_results(query, tasks, total, 0, permission_index.is_staff(user.telegram_id)),
+        reply_markup=get_search_pagination_keyboard(0, total > PAGE_SIZE),
+        parse_mode="HTML"
+    )
+
+
+@router.callback_query(SearchPageCallback.filter())
+async def search_pagination(
+    callback: CallbackQuery,
+    callback_data: SearchPageCallback,
+    session: AsyncSession,
+    state: FSMContext,
+    user=None
+):
+    """Пагинация результатов поиска"""
+    await callback.answer()
+
+    page = callback_data.page
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await message_renderer.edit(callback.message, "🔍 Поиск устарел. Повторите команду /search.")
+        return
+
+    tasks, total = await SearchService.search_tasks(
+        session, query, manager_ids=search_scope(user), limit=PAGE_SIZE, offset=page * PAGE_SIZE
+    )
+
+    await message_renderer.edit(
+        callback.message,
+        _render_results(query, tasks, total, page, permission_index.is_staff(user.telegram_id)),
+        reply_markup=get_search_pagination_keyboard(page, (page + 1) * PAGE_SIZE < total),
+        parse_mode="HTML"
+    )
+
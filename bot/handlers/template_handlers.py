@@ -0,0 +1,103 @@
+from aiogram import Router
+from aiogram.types import Message
+from aiogram.filters import Command, CommandObject
+from bot.services.template_service import TemplateService, parse_rule
+from bot.services.user_service import UserService
+from bot.services.permission_service import permission_index, ROLE_ADMIN, ROLE_TEAM_LEAD
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.filters.role_filter import RoleFilter
+import html
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+router.message.filter(RoleFilter(ROLE_ADMIN, ROLE_TEAM_LEAD))
+
+USAGE = (
+    "🔁 <b>Повторяющиеся задачи</b>\n\n"
+    "<code>/recurring_add менеджер; правило; текст задачи</code>\n"
+    "Менеджер — Telegram ID или @username.\n"
+    "Правила: <code>ежедневно</code>, <code>будни</code>, <code>пн,пт</code>, <code>monthly:1,15</code>\n\n"
+    "<code>/recurring</code> — список шаблонов\n"
+    "<code>/recurring_stop ID</code> — отключить шаблон"
+)
+
+
+@router.message(Command("recurring"))
+async def cmd_list_templates(message: Message, session: AsyncSession):
+    """Список шаблонов повторяющихся задач"""
+    templates = await TemplateService.get_templates(
+        session, manager_ids=permission_index.managed_ids(message.from_user.id)
+    )
+
+    if not templates:
+        await message.answer("🔁 Шаблонов повторяющихся задач нет.\n\n" + USAGE, parse_mode="HTML")
+        return
+
+    text = f"🔁 <b>Шаблоны повторяющихся задач ({len(templates)}):</b>\n\n"
+    for template in templates[:50]:
+        manager = template.manager
+        manager_name = (manager.first_name or manager.username or f"ID: {manager.telegram_id}") if manager else "N/A"
+        task_text = template.text[:60] + "..." if len(template.text) > 60 else template.text
+        text += (
+            f"<b>#{template.id}</b> | {html.escape(manager_name)} | {parse_rule(template.rule).describe()}\n"
+            f"   {html.escape(task_text)}\n\n"
+        )
+    if len(templates) > 50:
+        text += f"... и ещё {len(templates) - 50}"
+    await message.answer(text, parse_mode="HTML")
+
+
+@router.message(Command("recurring_add"))
+async def cmd_add_template(message: Message, session: AsyncSession, command: CommandObject):
+    """Создать шаблон: /recurring_add менеджер; правило; текст"""
+    parts = [part.strip() for part in (command.args or "").split(";", 2)]
+    if len(parts) != 3 or len(parts[2]) < 3:
+        await message.answer(USAGE, parse_mode="HTML")
+        return
+
+    manager_ref, rule, task_text = parts
+    try:
+        recurrence = parse_rule(rule)
+    except ValueError:
+        await message.answer("❌ Неверное правило повторения.\n\n" + USAGE, parse_mode="HTML")
+        return
+
+    if manager_ref.isdigit():
+        manager = await UserService.get_user_by_telegram_id(session, int(manager_ref))
+    else:
+        manager = await UserService.get_user_by_username(session, manager_ref.lstrip("@"))
+
+    if not manager or not permission_index.can_manage(message.from_user.id, manager.id):
+        await message.answer("❌ Менеджер не найден или недоступен.")
+        return
+
+    template = await TemplateService.create_template(
+        session, manager.id, rule, task_text, created_by=message.from_user.id
+    )
+    # Разворачивается только новый шаблон; остальные — плановым заданием
+    created = await TemplateService.expand_templates(session, template_id=template.id)
+    await session.commit()
+    await message.answer(
+        f"✅ Шаблон #{template.id} создан ({recurrence.describe()}).\n"
+        f"📌 Задач на ближайшие дни: {created}"
+    )
+
+
+@router.message(Command("recurring_stop"))
+async def cmd_stop_template(message: Message, session: AsyncSession, command: CommandObject):
+    """Отключить шаблон: /recurring_stop ID"""
+    arg = (command.args or "").strip().lstrip("#")
+    if not arg.isdigit():
+        await message.answer("❌ Использование: <code>/recurring_stop ID</code>", parse_mode="HTML")
+        return
+
+    template = await TemplateService.get_template_by_id(session, int(arg))
+    if not template or not template.is_active or not permission_index.can_manage(message.from_user.id, template.manager_id):
+        await message.answer("❌ Шаблон не найден.")
+        return
+
+    removed = await TemplateService.deactivate_template(session, template.id)
+    await session.commit()
+    await message.answer(f"✅ Шаблон #{template.id} отключён. Удалено будущих задач: {removed}")
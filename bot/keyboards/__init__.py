@@ -1,13 +1,18 @@
-from .admin_keyboards import get_admin_menu, get_manager_list_keyboard
+from .admin_keyboards import get_admin_menu, get_team_lead_menu, get_staff_menu, get_manager_list_keyboard
 from .manager_keyboards import get_manager_menu, get_tasks_keyboard, get_task_actions_keyboard
-from .common_keyboards import get_back_keyboard
+from .common_keyboards import get_back_keyboard, get_search_pagination_keyboard
+from .cache import KeyboardCache, keyboard_cache
 
 __all__ = [
     "get_admin_menu",
+    "get_team_lead_menu",
+    "get_staff_menu",
     "get_manager_list_keyboard",
     "get_manager_menu",
     "get_tasks_keyboard",
     "get_task_actions_keyboard",
     "get_back_keyboard",
+    "get_search_pagination_keyboard",
+    "KeyboardCache",
+    "keyboard_cache",
 ]
-
@@ -1,32 +1,167 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import List
+from datetime import datetime
+from typing import List, AbstractSet, Optional
 from bot.database.models import User
+from bot.keyboards.cache import keyboard_cache
+from bot.keyboards.callbacks import (
+    BroadcastAction, BroadcastCallback, BulkToggleCallback, ReportCallback, SelectManagerCallback
+)
 
 
-def get_admin_menu() -> InlineKeyboardMarkup:
-    """Главное меню администратора"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+def _build_admin_menu() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="1️⃣ ДОБАВИТЬ ЗАДАЧУ", callback_data="admin_add_task")],
         [InlineKeyboardButton(text="2️⃣ СПИСОК ВСЕХ ЗАДАЧ", callback_data="admin_all_tasks")],
         [InlineKeyboardButton(text="3️⃣ АНАЛИЗ TELEGRAM-ГРУПП", callback_data="admin_group_analysis")],
         [InlineKeyboardButton(text="4️⃣ РЕЙТИНГ МЕНЕДЖЕРОВ", callback_data="admin_rating")],
         [InlineKeyboardButton(text="5️⃣ ОЧИСТКА ВЫПОЛНЕННЫХ ЗАДАЧ", callback_data="admin_cleanup")],
-        [InlineKeyboardButton(text="6️⃣ ВСЕ СОТРУДНИКИ", callback_data="admin_all_employees")]
+        [InlineKeyboardButton(text="6️⃣ ВСЕ СОТРУДНИКИ", callback_data="admin_all_employees")],
+        [InlineKeyboardButton(text="7️⃣ МАССОВОЕ ДОБАВЛЕНИЕ ЗАДАЧ", callback_data="admin_bulk_tasks")],
+        [InlineKeyboardButton(text="8️⃣ ОТЧЁТЫ", callback_data="admin_reports")],
+        [InlineKeyboardButton(text="9️⃣ НАГРУЗКА МЕНЕДЖЕРОВ", callback_data="admin_workload")],
+        [InlineKeyboardButton(text="🔟 РАССЫЛКА", callback_data="admin_broadcast")]
     ])
-    return keyboard
+
+
+# Статичное меню строится один раз при импорте модуля
+_ADMIN_MENU = _build_admin_menu()
+
+
+def get_admin_menu() -> InlineKeyboardMarkup:
+    """Главное меню администратора"""
+    return _ADMIN_MENU
+
+
+_TEAM_LEAD_MENU = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="1️⃣ ДОБАВИТЬ ЗАДАЧУ", callback_data="admin_add_task")],
+    [InlineKeyboardButton(text="2️⃣ ЗАДАЧИ КОМАНДЫ", callback_data="admin_all_tasks")],
+    [InlineKeyboardButton(text="3️⃣ РЕЙТИНГ КОМАНДЫ", callback_data="admin_rating")],
+    [InlineKeyboardButton(text="4️⃣ СОТРУДНИКИ КОМАНДЫ", callback_data="admin_all_employees")],
+    [InlineKeyboardButton(text="5️⃣ МАССОВОЕ ДОБАВЛЕНИЕ ЗАДАЧ", callback_data="admin_bulk_tasks")],
+    [InlineKeyboardButton(text="6️⃣ ОТЧЁТЫ КОМАНДЫ", callback_data="admin_reports")],
+    [InlineKeyboardButton(text="7️⃣ НАГРУЗКА КОМАНДЫ", callback_data="admin_workload")]
+])
+
+
+def get_team_lead_menu() -> InlineKeyboardMarkup:
+    """Главное меню руководителя группы"""
+    return _TEAM_LEAD_MENU
+
+
+def get_staff_menu(is_admin: bool) -> InlineKeyboardMarkup:
+    """Меню администратора или руководителя группы"""
+    return _ADMIN_MENU if is_admin else _TEAM_LEAD_MENU
+
+
+def _manager_name(manager: User) -> str:
+    return manager.first_name or manager.username or f"ID: {manager.telegram_id}"
 
 
 def get_manager_list_keyboard(managers: List[User]) -> InlineKeyboardMarkup:
     """Клавиатура со списком менеджеров"""
-    buttons = []
-    for manager in managers:
-        name = manager.first_name or manager.username or f"ID: {manager.telegram_id}"
+    entries = tuple((manager.id, _manager_name(manager)) for manager in managers)
+
+    def build() -> InlineKeyboardMarkup:
+        buttons = [
+            [InlineKeyboardButton(text=name, callback_data=SelectManagerCallback(manager_id=manager_id).pack())]
+            for manager_id, name in entries
+        ]
+        buttons.append([InlineKeyboardButton(text="◀️ Отмена", callback_data="admin_cancel")])
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    return keyboard_cache.get_or_build(("manager_list", entries), build)
+
+
+_BULK_MODE_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="👥 Одна задача нескольким менеджерам", callback_data="bulk_mode_one")],
+    [InlineKeyboardButton(text="📄 Список задач (текст или CSV)", callback_data="bulk_mode_list")],
+    [InlineKeyboardButton(text="◀️ Отмена", callback_data="admin_cancel")]
+])
+
+
+def get_bulk_mode_keyboard() -> InlineKeyboardMarkup:
+    """Выбор режима массового добавления задач"""
+    return _BULK_MODE_KEYBOARD
+
+
+def get_manager_multiselect_keyboard(managers: List[User], selected: AbstractSet[int]) -> InlineKeyboardMarkup:
+    """Клавиатура множественного выбора менеджеров"""
+    entries = tuple((manager.id, _manager_name(manager), manager.id in selected) for manager in managers)
+
+    def build() -> InlineKeyboardMarkup:
+        buttons = [
+            [InlineKeyboardButton(
+                text=f"{'✅' if is_selected else '⬜'} {name}",
+                callback_data=BulkToggleCallback(manager_id=manager_id).pack()
+            )]
+            for manager_id, name, is_selected in entries
+        ]
         buttons.append([
-            InlineKeyboardButton(
-                text=name,
-                callback_data=f"select_manager_{manager.id}"
-            )
+            InlineKeyboardButton(text="☑️ Выбрать всех", callback_data="bulk_select_all"),
+            InlineKeyboardButton(text="➡️ Далее", callback_data="bulk_selection_done")
         ])
-    buttons.append([InlineKeyboardButton(text="◀️ Отмена", callback_data="admin_cancel")])
+        buttons.append([InlineKeyboardButton(text="◀️ Отмена", callback_data="admin_cancel")])
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    return keyboard_cache.get_or_build(("manager_multiselect", entries), build)
+
+
+def get_report_keyboard(
+    period: str,
+    previous: Optional[datetime],
+    following: Optional[datetime]
+) -> InlineKeyboardMarkup:
+    """Навигация по сохранённым отчётам"""
+    nav_buttons = []
+    if previous:
+        nav_buttons.append(InlineKeyboardButton(text="◀️ Раньше", callback_data=ReportCallback(period=period, day=f"{previous:%Y%m%d}").pack()))
+    if following:
+        nav_buttons.append(InlineKeyboardButton(text="Позже ▶️", callback_data=ReportCallback(period=period, day=f"{following:%Y%m%d}").pack()))
+    other_period, other_title = ("weekly", "🗓 ЗА НЕДЕЛЮ") if period == "daily" else ("daily", "📅 ЗА ДЕНЬ")
+    buttons = [nav_buttons] if nav_buttons else []
+    buttons.append([InlineKeyboardButton(text=other_title, callback_data=ReportCallback(period=other_period, day="latest").pack())])
+    buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_menu")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+
+def get_broadcast_audience_keyboard(managers: int, groups: int) -> InlineKeyboardMarkup:
+    """Выбор получателей рассылки с их количеством"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"👥 Всем менеджерам ({managers})", callback_data="broadcast_managers")],
+        [InlineKeyboardButton(text=f"💬 Во все группы ({groups})", callback_data="broadcast_groups")],
+        [InlineKeyboardButton(text="◀️ Отмена", callback_data="admin_cancel")]
+    ])
+
+
+_BROADCAST_CONFIRM_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✅ Отправить", callback_data="broadcast_confirm")],
+    [InlineKeyboardButton(text="◀️ Отмена", callback_data="admin_cancel")]
+])
+
+
+def get_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Подтверждение рассылки"""
+    return _BROADCAST_CONFIRM_KEYBOARD
+
+
+def get_broadcast_control_keyboard(broadcast_id: int, status: str) -> InlineKeyboardMarkup:
+    """Кнопки управления рассылкой; у завершённой и отменённой — только меню"""
+
+    def button(text: str, action: BroadcastAction) -> InlineKeyboardButton:
+        return InlineKeyboardButton(
+            text=text, callback_data=BroadcastCallback(action=action, broadcast_id=broadcast_id).pack()
+        )
+
+    def build() -> InlineKeyboardMarkup:
+        if status == "running":
+            buttons = [[button("⏸ Пауза", BroadcastAction.PAUSE), button("🔄 Обновить", BroadcastAction.REFRESH)]]
+        elif status == "paused":
+            buttons = [[button("▶️ Продолжить", BroadcastAction.RESUME), button("🔄 Обновить", BroadcastAction.REFRESH)]]
+        else:
+            buttons = []
+        if status in ("running", "paused"):
+            buttons.append([button("⏹ Отменить рассылку", BroadcastAction.CANCEL)])
+        buttons.append([InlineKeyboardButton(text="◀️ В меню", callback_data="back_to_menu")])
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    return keyboard_cache.get_or_build(("broadcast_control", broadcast_id, status), build)
@@ -0,0 +1,52 @@
+from aiogram.types import InlineKeyboardMarkup
+from collections import OrderedDict
+from typing import Callable, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class KeyboardCache:
+    """LRU-кэш готовых клавиатур.
+
+    Клавиатуры aiogram — pydantic-модели, их сборка заметно дороже, чем
+    поиск по ключу. Ключом служит версия содержимого (кортеж данных, из
+    которых строится клавиатура), поэтому при изменении данных ключ меняется
+    сам, а старые записи вытесняются по LRU.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, InlineKeyboardMarkup]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(
+        self,
+        key: Hashable,
+        builder: Callable[[], InlineKeyboardMarkup]
+    ) -> InlineKeyboardMarkup:
+        """Вернуть клавиатуру из кэша или построить и запомнить её"""
+        keyboard = self._items.get(key)
+        if keyboard is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return keyboard
+
+        self.misses += 1
+        keyboard = builder()
+        self._items[key] = keyboard
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return keyboard
+
+    def clear(self):
+        """Очистить кэш"""
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# Общий кэш динамических клавиатур (списки менеджеров, страницы задач)
+keyboard_cache = KeyboardCache()
@@ -0,0 +1,89 @@
+from aiogram.filters.callback_data import CallbackData
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Optional, Tuple
+
+# Схема данных кнопок.
+#
+# Каждой фабрике соответствует короткий префикс, поля упаковываются через
+# ":" (например, "t:c:1042"), так что в лимите Telegram в 64 байта остаётся
+# место для курсора страницы. Префикс служит версией формата: при
+# несовместимом изменении полей он меняется ("t" → "t2"), а кнопки из
+# старых сообщений попадают в обработчик устаревших кнопок.
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class TaskAction(str, Enum):
+    VIEW = "v"
+    COMPLETE = "c"
+    NOT_COMPLETE = "n"
+
+
+class TaskCallback(CallbackData, prefix="t"):
+    """Действие с задачей менеджера.
+
+    version — версия задачи, которую видел пользователь (карточка задачи);
+    пусто — без проверки версии (уведомления, inline-режим).
+    """
+    action: TaskAction
+    task_id: int
+    version: Optional[int] = None
+
+
+class TasksPageCallback(CallbackData, prefix="tp"):
+    """Страница активных задач менеджера с keyset-курсором.
+
+    Курсор — (дедлайн в микросекундах от эпохи, id) граничной задачи:
+    вперёд — последней на текущей странице, назад — первой.
+    """
+    page: int
+    deadline: int
+    task_id: int
+    backward: bool = False
+
+
+class SearchPageCallback(CallbackData, prefix="sp"):
+    """Страница результатов поиска"""
+    page: int
+
+
+class SelectManagerCallback(CallbackData, prefix="sm"):
+    """Выбор менеджера для новой задачи"""
+    manager_id: int
+
+
+class BulkToggleCallback(CallbackData, prefix="bt"):
+    """Отметка менеджера при массовом назначении"""
+    manager_id: int
+
+
+class ReportCallback(CallbackData, prefix="r"):
+    """Отчёт за период: day — YYYYMMDD или "latest" """
+    period: str
+    day: str
+
+
+class BroadcastAction(str, Enum):
+    PAUSE = "p"
+    RESUME = "r"
+    CANCEL = "c"
+    REFRESH = "u"
+
+
+class BroadcastCallback(CallbackData, prefix="bc"):
+    """Управление рассылкой из сообщения о её ходе"""
+    action: BroadcastAction
+    broadcast_id: int
+
+
+def encode_cursor(deadline: datetime, task_id: int) -> Tuple[int, int]:
+    """Курсор из дедлайна и id задачи (целые числа, без разделителей)"""
+    return (deadline - _EPOCH) // timedelta(microseconds=1), task_id
+
+
+def decode_cursor(deadline: int, task_id: int) -> Optional[Tuple[datetime, int]]:
+    """Обратное преобразование; нулевой курсор — первая страница"""
+    if not task_id:
+        return None
+    return _EPOCH + timedelta(microseconds=deadline), task_id
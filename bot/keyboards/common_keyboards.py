@@ -1,10 +1,24 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from bot.keyboards.callbacks import SearchPageCallback
+
+
+_BACK_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_menu")]
+])
 
 
 def get_back_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура с кнопкой 'Назад'"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_menu")]
-    ])
-    return keyboard
+    return _BACK_KEYBOARD
+
 
+def get_search_pagination_keyboard(page: int, has_next: bool) -> InlineKeyboardMarkup:
+    """Навигация по страницам результатов поиска"""
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=SearchPageCallback(page=page - 1).pack()))
+    if has_next:
+        nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=SearchPageCallback(page=page + 1).pack()))
+    buttons = [nav_buttons] if nav_buttons else []
+    buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
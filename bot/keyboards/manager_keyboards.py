@@ -1,54 +1,92 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from typing import List
+from typing import List, Optional
 from bot.database.models import Task
+from bot.keyboards.cache import keyboard_cache
+from bot.keyboards.callbacks import TaskAction, TaskCallback, TasksPageCallback, encode_cursor
+
+
+# Статичное меню строится один раз при импорте модуля
+_MANAGER_MENU = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="📋 Мои задачи", callback_data="manager_my_tasks")]
+])
 
 
 def get_manager_menu() -> InlineKeyboardMarkup:
     """Главное меню менеджера"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📋 Мои задачи", callback_data="manager_my_tasks")]
-    ])
-    return keyboard
-
-
-def get_tasks_keyboard(tasks: List[Task], page: int = 0, per_page: int = 10) -> InlineKeyboardMarkup:
-    """Клавиатура со списком задач"""
-    buttons = []
-    start = page * per_page
-    end = start + per_page
-    page_tasks = tasks[start:end]
-    
-    for task in page_tasks:
-        task_text = task.text[:30] + "..." if len(task.text) > 30 else task.text
-        deadline_str = task.deadline.strftime("%d.%m.%Y")
-        buttons.append([
-            InlineKeyboardButton(
-                text=f"📌 {task_text} (до {deadline_str})",
-                callback_data=f"task_{task.id}"
-            )
+    return _MANAGER_MENU
+
+
+def get_tasks_keyboard(
+    tasks: List[Task],
+    page: int = 0,
+    has_next: bool = False,
+    zone=None
+) -> InlineKeyboardMarkup:
+    """Клавиатура со страницей задач; навигация несёт keyset-курсор.
+
+    Даты дедлайнов показываются в часовом поясе zone (по умолчанию — команды).
+    """
+    # bot.services импортирует клавиатуры, поэтому импорт — при вызове
+    from bot.services.time_service import format_local
+
+    entries = tuple(
+        (task.id, task.text[:30] + "..." if len(task.text) > 30 else task.text, format_local(task.deadline, zone))
+        for task in tasks
+    )
+    first_cursor = encode_cursor(tasks[0].deadline, tasks[0].id) if tasks else (0, 0)
+    last_cursor = encode_cursor(tasks[-1].deadline, tasks[-1].id) if tasks else (0, 0)
+
+    def build() -> InlineKeyboardMarkup:
+        buttons = []
+        for task_id, task_text, deadline_str in entries:
+            buttons.append([
+                InlineKeyboardButton(
+                    text=f"📌 {task_text} (до {deadline_str})",
+                    callback_data=TaskCallback(action=TaskAction.VIEW, task_id=task_id).pack()
+                )
+            ])
+
+        # Пагинация
+        nav_buttons = []
+        if page > 0:
+            nav_buttons.append(InlineKeyboardButton(
+                text="◀️",
+                callback_data=TasksPageCallback(
+                    page=page - 1, deadline=first_cursor[0], task_id=first_cursor[1], backward=True
+                ).pack()
+            ))
+        if has_next:
+            nav_buttons.append(InlineKeyboardButton(
+                text="▶️",
+                callback_data=TasksPageCallback(
+                    page=page + 1, deadline=last_cursor[0], task_id=last_cursor[1]
+                ).pack()
+            ))
+        if nav_buttons:
+            buttons.append(nav_buttons)
+
+        buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_menu")])
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    return keyboard_cache.get_or_build(("tasks", page, has_next, first_cursor, entries), build)
+
+
+def get_task_actions_keyboard(task_id: int, version: Optional[int] = None) -> InlineKeyboardMarkup:
+    """Клавиатура с действиями для задачи (с версией — для карточки задачи)"""
+
+    def build() -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="✅ ВЫПОЛНЕНО",
+                    callback_data=TaskCallback(action=TaskAction.COMPLETE, task_id=task_id, version=version).pack()
+                ),
+                InlineKeyboardButton(
+                    text="❌ НЕ ВЫПОЛНЕНО",
+                    callback_data=TaskCallback(action=TaskAction.NOT_COMPLETE, task_id=task_id, version=version).pack()
+                )
+            ],
+            [InlineKeyboardButton(text="◀️ Назад к задачам", callback_data="manager_my_tasks")]
         ])
-    
-    # Пагинация
-    nav_buttons = []
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"tasks_page_{page-1}"))
-    if end < len(tasks):
-        nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"tasks_page_{page+1}"))
-    if nav_buttons:
-        buttons.append(nav_buttons)
-    
-    buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_menu")])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
-
-
-def get_task_actions_keyboard(task_id: int) -> InlineKeyboardMarkup:
-    """Клавиатура с действиями для задачи"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="✅ ВЫПОЛНЕНО", callback_data=f"task_complete_{task_id}"),
-            InlineKeyboardButton(text="❌ НЕ ВЫПОЛНЕНО", callback_data=f"task_not_complete_{task_id}")
-        ],
-        [InlineKeyboardButton(text="◀️ Назад к задачам", callback_data="manager_my_tasks")]
-    ])
-    return keyboard
 
+    return keyboard_cache.get_or_build(("task_actions", task_id, version), build)
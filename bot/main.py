@@ -4,14 +4,23 @@ import sys
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
 from aiogram.enums import ParseMode
 
 from bot.config import settings
-from bot.database.database import init_db
+from bot.database.database import init_db, get_session
 from bot.middlewares.role_middleware import RoleMiddleware
 from bot.middlewares.logging_middleware import LoggingMiddleware
-from bot.handlers import common_handlers, admin_handlers, manager_handlers, group_analysis_handlers
+from bot.middlewares.db_session_middleware import DbSessionMiddleware
+from bot.middlewares.idempotency_middleware import IdempotencyMiddleware
+from bot.handlers import common_handlers, admin_handlers, broadcast_handlers, bulk_task_handlers, template_handlers, report_handlers, search_handlers, inline_handlers, manager_handlers, group_analysis_handlers
 from bot.services.scheduler_service import SchedulerService
+from bot.services.permission_service import permission_index, PermissionService
+from bot.services.time_service import time_zones
+from bot.services.outbox_service import outbox_sender
+from bot.services.broadcast_service import broadcast_sender
+from bot.services.deadline_service import deadline_tracker
+from bot.services.telegram_session import ResilientSession
 
 # Настройка логирования
 logging.basicConfig(
@@ -37,28 +46,57 @@ async def main():
     await init_db()
     logger.info("Database initialized")
     
+    # Загрузка индексов прав доступа и часовых поясов
+    async for session in get_session():
+        await PermissionService.release_config_admins(session)
+        await permission_index.rebuild(session)
+        await time_zones.rebuild(session)
+        break
+    
     # Инициализация бота и диспетчера
     bot = Bot(
         token=settings.BOT_TOKEN,
+        session=ResilientSession(
+            api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL) if settings.TELEGRAM_API_URL else PRODUCTION,
+            limit=settings.TELEGRAM_POOL_LIMIT,
+            keepalive_timeout=settings.TELEGRAM_KEEPALIVE,
+            retry_attempts=settings.TELEGRAM_RETRY_ATTEMPTS,
+            breaker_threshold=settings.TELEGRAM_BREAKER_THRESHOLD,
+            breaker_cooldown=settings.TELEGRAM_BREAKER_COOLDOWN
+        ),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     dp = Dispatcher(storage=MemoryStorage())
     
-    # Регистрация middleware
+    # Регистрация middleware: одна сессия БД на апдейт для всех остальных
+    dp.update.outer_middleware(DbSessionMiddleware())
+    # Повторы апдейтов и двойные нажатия отсекаются до хендлеров
+    dp.update.outer_middleware(IdempotencyMiddleware())
     dp.message.middleware(LoggingMiddleware())
     dp.callback_query.middleware(LoggingMiddleware())
     dp.message.middleware(RoleMiddleware())
     dp.callback_query.middleware(RoleMiddleware())
+    dp.inline_query.middleware(RoleMiddleware())
     
     # Регистрация роутеров
     dp.include_router(common_handlers.router)
     dp.include_router(admin_handlers.router)
+    dp.include_router(broadcast_handlers.router)
+    dp.include_router(bulk_task_handlers.router)
+    dp.include_router(template_handlers.router)
+    dp.include_router(report_handlers.router)
     dp.include_router(manager_handlers.router)
+    dp.include_router(search_handlers.router)
+    dp.include_router(inline_handlers.router)
     dp.include_router(group_analysis_handlers.router)
+    dp.include_router(common_handlers.fallback_router)
     
     # Запуск планировщика
     scheduler = SchedulerService(bot)
     scheduler.start()
+    outbox_sender.start(bot)
+    broadcast_sender.start(bot)
+    deadline_tracker.start()
     
     try:
         logger.info("Bot starting...")
@@ -72,6 +110,11 @@ async def main():
         await dp.start_polling(bot, allowed_updates=allowed_updates)
     finally:
         scheduler.shutdown()
+        await deadline_tracker.stop()
+        await broadcast_sender.stop()
+        await outbox_sender.stop()
+        for line in bot.session.latency.summary():
+            logger.info(f"Telegram API latency: {line}")
         await bot.session.close()
         logger.info("Bot stopped")
 
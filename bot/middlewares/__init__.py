@@ -1,5 +1,6 @@
 from .role_middleware import RoleMiddleware
 from .logging_middleware import LoggingMiddleware
+from .db_session_middleware import DbSessionMiddleware
+from .idempotency_middleware import IdempotencyMiddleware
 
-__all__ = ["RoleMiddleware", "LoggingMiddleware"]
-
+__all__ = ["RoleMiddleware", "LoggingMiddleware", "DbSessionMiddleware", "IdempotencyMiddleware"]
@@ -0,0 +1,53 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from typing import Callable, Awaitable, Any
+from bot.database.database import async_session_maker, query_stats, QueryStats
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Апдейты с большим числом запросов выводятся как предупреждение
+QUERY_WARNING_THRESHOLD = 20
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Одна сессия БД на апдейт.
+
+    Сессия передаётся в RoleMiddleware и хендлеры через ``data["session"]``,
+    изменения фиксируются одним commit после обработки, при исключении
+    выполняется rollback. Для каждого апдейта логируется число запросов.
+    """
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        started = time.monotonic()
+        try:
+            async with async_session_maker() as session:
+                data["session"] = session
+                try:
+                    result = await handler(event, data)
+                    await session.commit()
+                    return result
+                except Exception:
+                    await session.rollback()
+                    raise
+        finally:
+            query_stats.reset(token)
+            if stats.queries:
+                update_id = event.update_id if isinstance(event, Update) else None
+                elapsed = (time.monotonic() - started) * 1000
+                message = (
+                    f"Update {update_id}: {stats.queries} queries, "
+                    f"{stats.commits} commits, {elapsed:.0f} ms"
+                )
+                if stats.queries > QUERY_WARNING_THRESHOLD:
+                    logger.warning(message)
+                else:
+                    logger.debug(message)
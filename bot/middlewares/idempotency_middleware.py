@@ -0,0 +1,100 @@
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import TelegramObject, Update
+from collections import OrderedDict
+from typing import Callable, Awaitable, Any, Hashable, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessedKeys:
+    """Ограниченный LRU уже обработанных ключей (update_id, id callback-запроса)"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._keys: "OrderedDict[Hashable, None]" = OrderedDict()
+
+    def add(self, key: Hashable) -> bool:
+        """Запомнить ключ; False — ключ уже был"""
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+        return True
+
+    def discard(self, key: Hashable):
+        self._keys.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    """Пропуск повторных апдейтов и двойных нажатий.
+
+    Повторно доставленный Telegram апдейт (тот же update_id или id
+    callback-запроса) отбрасывается до хендлеров. Пока выполняется
+    нажатие кнопки, такое же нажатие того же пользователя на том же
+    сообщении только гасит «часики» кнопки. Ошибка «message is not
+    modified» при повторном редактировании не считается сбоем.
+
+    Регистрируется внутри DbSessionMiddleware: проглоченная ошибка
+    редактирования не откатывает уже сделанные хендлером изменения.
+    Ключи хранятся в памяти процесса и после перезапуска не сохраняются.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.processed = ProcessedKeys(maxsize)
+        self._in_flight: Set[Tuple] = set()
+        self.duplicates = 0
+        self.in_flight_skipped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        keys = [("update", event.update_id)]
+        callback = event.callback_query
+        if callback is not None:
+            keys.append(("callback", callback.id))
+        if not all([self.processed.add(key) for key in keys]):
+            self.duplicates += 1
+            logger.debug(f"Skipping duplicate update {event.update_id}")
+            return None
+
+        action = None
+        if callback is not None and callback.from_user:
+            message_key = callback.inline_message_id or (callback.message.message_id if callback.message else None)
+            action = (callback.from_user.id, message_key, callback.data)
+            if action in self._in_flight:
+                self.in_flight_skipped += 1
+                logger.debug(f"Skipping repeated tap {callback.data!r} from user {callback.from_user.id}")
+                await callback.answer()
+                return None
+            self._in_flight.add(action)
+
+        try:
+            return await handler(event, data)
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                logger.debug(f"Update {event.update_id}: message is not modified")
+                return None
+            for key in keys:
+                self.processed.discard(key)
+            raise
+        except Exception:
+            # Упавший апдейт можно обработать повторно
+            for key in keys:
+                self.processed.discard(key)
+            raise
+        finally:
+            if action is not None:
+                self._in_flight.discard(action)
@@ -2,7 +2,7 @@ from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 from typing import Callable, Awaitable, Any
 from bot.services.user_service import UserService
-from bot.database.database import get_session
+from bot.services.permission_service import permission_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,20 +18,21 @@ class RoleMiddleware(BaseMiddleware):
         data: dict[str, Any]
     ) -> Any:
         user = None
-        if hasattr(event, "from_user") and event.from_user:
-            async for session in get_session():
-                user = await UserService.get_or_create_user(
-                    session,
-                    telegram_id=event.from_user.id,
-                    username=event.from_user.username,
-                    first_name=event.from_user.first_name,
-                    last_name=event.from_user.last_name
-                )
-                break
+        session = data.get("session")
+        if session is not None and getattr(event, "from_user", None):
+            user = await UserService.get_or_create_user(
+                session,
+                telegram_id=event.from_user.id,
+                username=event.from_user.username,
+                first_name=event.from_user.first_name,
+                last_name=event.from_user.last_name
+            )
         
         if user:
+            # Права берутся из in-memory индекса, а не из строки БД
             data["user"] = user
-            data["is_admin"] = user.role == "admin"
+            data["is_admin"] = permission_index.is_admin(user.telegram_id)
+            data["is_team_lead"] = permission_index.is_team_lead(user.telegram_id)
+            data["permissions"] = permission_index
         
         return await handler(event, data)
-
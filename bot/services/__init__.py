@@ -3,6 +3,7 @@ from .user_service import UserService
 from .analytics_service import AnalyticsService
 from .scheduler_service import SchedulerService
 from .file_service import FileService
+from .permission_service import PermissionService, PermissionIndex, permission_index
 
 __all__ = [
     "TaskService",
@@ -10,5 +11,7 @@ __all__ = [
     "AnalyticsService",
     "SchedulerService",
     "FileService",
+    "PermissionService",
+    "PermissionIndex",
+    "permission_index",
 ]
-
@@ -1,12 +1,101 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from bot.database.models import GroupAnalytics, GroupMember
-from typing import Optional, List
+from sqlalchemy import select, update, func
+from bot.database.models import GroupAnalytics, GroupMember, GroupRoster
+from bot.database.database import insert_ignore, upsert, read_only
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, Optional, List, Sequence, Tuple
 from datetime import datetime
+import sys
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Размер пачки ID в одном IN (...) при синхронизации состава
+ID_CHUNK_SIZE = 500
+
+
+class Roster:
+    """Неизменяемое множество Telegram ID в виде отсортированного массива int64.
+
+    8 байт на участника вместо объекта на каждого; пересечение, разность
+    и объединение — линейное слияние двух отсортированных массивов.
+    В БД хранится как BLOB little-endian (GroupRoster.member_ids).
+    """
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: "array[int]"):
+        self._ids = ids
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int]) -> "Roster":
+        return cls(array("q", sorted(set(ids))))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Roster":
+        ids = array("q")
+        ids.frombytes(data)
+        if sys.byteorder != "little":
+            ids.byteswap()
+        return cls(ids)
+
+    def to_bytes(self) -> bytes:
+        if sys.byteorder == "little":
+            return self._ids.tobytes()
+        ids = array("q", self._ids)
+        ids.byteswap()
+        return ids.tobytes()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __contains__(self, telegram_id: int) -> bool:
+        position = bisect_left(self._ids, telegram_id)
+        return position < len(self._ids) and self._ids[position] == telegram_id
+
+    def _merge(self, other: "Roster", keep_left: bool, keep_both: bool, keep_right: bool) -> "Roster":
+        left, right = self._ids, other._ids
+        result = array("q")
+        i = j = 0
+        while i < len(left) and j < len(right):
+            if left[i] < right[j]:
+                if keep_left:
+                    result.append(left[i])
+                i += 1
+            elif left[i] > right[j]:
+                if keep_right:
+                    result.append(right[j])
+                j += 1
+            else:
+                if keep_both:
+                    result.append(left[i])
+                i += 1
+                j += 1
+        if keep_left:
+            result.extend(left[i:])
+        if keep_right:
+            result.extend(right[j:])
+        return Roster(result)
+
+    def difference(self, other: "Roster") -> "Roster":
+        """ID, которые есть здесь и нет в other"""
+        return self._merge(other, keep_left=True, keep_both=False, keep_right=False)
+
+    def intersection(self, other: "Roster") -> "Roster":
+        return self._merge(other, keep_left=False, keep_both=True, keep_right=False)
+
+    def union(self, other: "Roster") -> "Roster":
+        return self._merge(other, keep_left=True, keep_both=True, keep_right=True)
+
+
+def _chunks(ids: Sequence[int], size: int = ID_CHUNK_SIZE) -> Iterator[Sequence[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
 
 class AnalyticsService:
     @staticmethod
@@ -17,66 +106,119 @@ class AnalyticsService:
     ) -> GroupAnalytics:
         """Получить или создать аналитику группы"""
         result = await session.execute(
-            select(GroupAnalytics).where(GroupAnalytics.group_id == group_id)
-        )
-        analytics = result.scalar_one_or_none()
-        
-        if not analytics:
-            analytics = GroupAnalytics(
+            insert_ignore(session, GroupAnalytics, ["group_id"]).values(
                 group_id=group_id,
                 group_title=group_title,
-                total_members=0
+                total_members=0,
+                left_members=0,
+                kicked_members=0,
+                last_updated=datetime.utcnow()
             )
-            session.add(analytics)
+        )
+        if result.rowcount:
             await session.commit()
-            await session.refresh(analytics)
             logger.info(f"Created analytics for group {group_id}")
-        
+
+        result = await session.execute(
+            select(GroupAnalytics).where(GroupAnalytics.group_id == group_id)
+        )
+        analytics = result.scalar_one()
+
         return analytics
-    
+
+    @staticmethod
+    async def get_roster(session: AsyncSession, analytics_id: int) -> Optional[Roster]:
+        """Сохранённый состав группы; None — синхронизаций ещё не было"""
+        result = await session.execute(
+            select(GroupRoster.member_ids).where(GroupRoster.group_id == analytics_id)
+        )
+        data = result.scalar_one_or_none()
+        return Roster.from_bytes(data) if data is not None else None
+
+    @staticmethod
+    async def save_roster(session: AsyncSession, analytics_id: int, roster: Roster):
+        """Сохранить состав группы одной строкой (вставка или замена)"""
+        await session.execute(
+            upsert(session, GroupRoster, ["group_id"], ["member_ids", "member_count"]).values(
+                group_id=analytics_id,
+                member_ids=roster.to_bytes(),
+                member_count=len(roster),
+                updated_at=datetime.utcnow()
+            )
+        )
+
     @staticmethod
     async def update_group_members(
         session: AsyncSession,
         group_id: int,
         current_members: List[dict]
     ):
-        """Обновить список участников группы"""
+        """Синхронизировать список участников группы.
+
+        Текущий состав сравнивается с сохранённым Roster, поэтому в БД
+        затрагиваются только ушедшие и новые участники — пачками по
+        ID_CHUNK_SIZE, без загрузки строк всей группы.
+        """
         analytics = await AnalyticsService.get_or_create_group_analytics(
             session, group_id
         )
-        
-        result = await session.execute(
-            select(GroupMember).where(GroupMember.group_id == analytics.id)
-        )
-        db_members = {m.telegram_id: m for m in result.scalars().all()}
-        
-        current_member_ids = {m.get("id") for m in current_members if m.get("id")}
-        
-        analytics.total_members = len(current_members)
-        
-        for db_member in db_members.values():
-            if db_member.telegram_id not in current_member_ids:
-                if db_member.status == "active":
-                    db_member.status = "left"
-                    db_member.left_at = datetime.utcnow()
-                    analytics.left_members += 1
-        
-        for member_data in current_members:
-            member_id = member_data.get("id")
-            if member_id and member_id not in db_members:
-                new_member = GroupMember(
-                    group_id=analytics.id,
-                    telegram_id=member_id,
-                    username=member_data.get("username"),
-                    first_name=member_data.get("first_name"),
-                    status="active"
+
+        profiles = {m["id"]: m for m in current_members if m.get("id")}
+        current = Roster.from_ids(profiles)
+        stored = await AnalyticsService.get_roster(session, analytics.id)
+        if stored is None:
+            # Первая синхронизация: активные участники из таблицы
+            result = await session.execute(
+                select(GroupMember.telegram_id).where(
+                    GroupMember.group_id == analytics.id,
+                    GroupMember.status == "active"
+                )
+            )
+            stored = Roster.from_ids(result.scalars().all())
+
+        now = datetime.utcnow()
+        departed = list(stored.difference(current))
+        for chunk in _chunks(departed):
+            result = await session.execute(
+                update(GroupMember)
+                .where(
+                    GroupMember.group_id == analytics.id,
+                    GroupMember.telegram_id.in_(chunk),
+                    GroupMember.status == "active"
+                )
+                .values(status="left", left_at=now)
+            )
+            analytics.left_members += result.rowcount
+
+        joined = list(current.difference(stored))
+        for chunk in _chunks(joined):
+            # Участник, уже известный по прошлым выходам, повторно не создаётся
+            result = await session.execute(
+                select(GroupMember.telegram_id).where(
+                    GroupMember.group_id == analytics.id,
+                    GroupMember.telegram_id.in_(chunk)
                 )
-                session.add(new_member)
-        
-        analytics.last_updated = datetime.utcnow()
+            )
+            known = set(result.scalars().all())
+            rows = [
+                {
+                    "group_id": analytics.id,
+                    "telegram_id": telegram_id,
+                    "username": profiles[telegram_id].get("username"),
+                    "first_name": profiles[telegram_id].get("first_name"),
+                    "status": "active",
+                }
+                for telegram_id in chunk if telegram_id not in known
+            ]
+            if rows:
+                await session.execute(GroupMember.__table__.insert(), rows)
+
+        await AnalyticsService.save_roster(session, analytics.id, current)
+        analytics.total_members = len(current)
+        analytics.last_updated = now
         await session.commit()
-        logger.info(f"Updated members for group {group_id}")
-    
+        logger.info(f"Updated members for group {group_id}: {len(departed)} left, {len(joined)} joined")
+
     @staticmethod
     async def get_group_analytics(session: AsyncSession, group_id: int) -> Optional[GroupAnalytics]:
         """Получить аналитику группы"""
@@ -84,15 +226,47 @@ class AnalyticsService:
             select(GroupAnalytics).where(GroupAnalytics.group_id == group_id)
         )
         return result.scalar_one_or_none()
-    
+
+    @staticmethod
+    @read_only
+    async def count_members_by_status(
+        session: AsyncSession,
+        analytics_ids: Sequence[int]
+    ) -> Dict[Tuple[int, str], int]:
+        """Число участников по (группа, статус) одним GROUP BY"""
+        if not analytics_ids:
+            return {}
+        result = await session.execute(
+            select(GroupMember.group_id, GroupMember.status, func.count())
+            .where(GroupMember.group_id.in_(analytics_ids))
+            .group_by(GroupMember.group_id, GroupMember.status)
+        )
+        return {(group_id, status): count for group_id, status, count in result.all()}
+
     @staticmethod
-    async def get_left_members(session: AsyncSession, analytics_id: int) -> List[GroupMember]:
-        """Получить список вышедших участников"""
+    @read_only
+    async def get_left_members(
+        session: AsyncSession,
+        analytics_id: int,
+        status: str,
+        limit: int = 10
+    ) -> List:
+        """Последние вышедшие (status="left") или исключённые ("kicked") участники.
+
+        Сначала недавние; LIMIT уходит в запрос, читаются только колонки
+        для отображения. У старых строк без updated_at порядок — по left_at.
+        """
+        changed_at = func.coalesce(GroupMember.updated_at, GroupMember.left_at)
         result = await session.execute(
-            select(GroupMember).where(
-                GroupMember.group_id == analytics_id,
-                GroupMember.status.in_(["left", "kicked"])
+            select(
+                GroupMember.id,
+                GroupMember.telegram_id,
+                GroupMember.username,
+                GroupMember.first_name,
+                GroupMember.status
             )
+            .where(GroupMember.group_id == analytics_id, GroupMember.status == status)
+            .order_by(changed_at.desc(), GroupMember.id.desc())
+            .limit(limit)
         )
-        return list(result.scalars().all())
-
+        return list(result.all())
@@ -0,0 +1,430 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, insert, func, and_, literal
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest, TelegramNetworkError, TelegramServerError
+)
+from bot.database.database import get_session, after_commit
+from bot.database.models import Broadcast, BroadcastRecipient, GroupAnalytics, User
+from bot.database.types import UTCDateTime
+from bot.keyboards.admin_keyboards import get_broadcast_control_keyboard
+from bot.services.outbox_service import outbox_sender, RateLimiter
+from bot.services.permission_service import managers_filter
+from bot.services.render_service import message_renderer
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Collection, Dict, Optional, Set
+import asyncio
+import html
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+AUDIENCE_MANAGERS = "managers"
+AUDIENCE_GROUPS = "groups"
+AUDIENCE_TITLES = {
+    AUDIENCE_MANAGERS: "всем менеджерам",
+    AUDIENCE_GROUPS: "во все группы",
+}
+
+STATUS_RUNNING = "running"
+STATUS_PAUSED = "paused"
+STATUS_CANCELLED = "cancelled"
+STATUS_COMPLETED = "completed"
+STATUS_TITLES = {
+    STATUS_RUNNING: "▶️ идёт",
+    STATUS_PAUSED: "⏸ на паузе",
+    STATUS_CANCELLED: "⏹ отменена",
+    STATUS_COMPLETED: "✅ завершена",
+}
+
+# Пачка небольшая: пауза и отмена вступают в силу со следующей пачки
+BATCH_SIZE = 50
+MAX_CONCURRENT_SENDS = 8
+MAX_ATTEMPTS = 5
+POLL_INTERVAL = 2
+# Сообщение о ходе рассылки обновляется не чаще раза в PROGRESS_INTERVAL секунд
+PROGRESS_INTERVAL = 5
+STALE_SENDING_AFTER = timedelta(minutes=5)
+
+
+@dataclass
+class BroadcastProgress:
+    """Получатели рассылки по статусам доставки"""
+    pending: int = 0
+    sent: int = 0
+    failed: int = 0
+    cancelled: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.pending + self.sent + self.failed + self.cancelled
+
+
+def _audience_query(audience: str):
+    """SELECT chat_id получателей: менеджеры (как UserService.get_all_managers) или группы"""
+    if audience == AUDIENCE_MANAGERS:
+        return select(User.telegram_id).where(managers_filter())
+    if audience == AUDIENCE_GROUPS:
+        return select(GroupAnalytics.group_id)
+    raise ValueError(f"Unknown broadcast audience: {audience}")
+
+
+def render_broadcast_status(broadcast: Broadcast, progress: BroadcastProgress) -> str:
+    """Текст сообщения о ходе рассылки"""
+    done = progress.sent + progress.failed
+    percent = done * 100 // progress.total if progress.total else 100
+    # Превью без разметки: обрезанный HTML мог бы оказаться незакрытым
+    preview = html.unescape(re.sub(r"<[^>]+>", "", broadcast.text))
+    if len(preview) > 200:
+        preview = preview[:200] + "…"
+    text = (
+        f"📣 <b>Рассылка #{broadcast.id}</b> {AUDIENCE_TITLES.get(broadcast.audience, broadcast.audience)}\n"
+        f"Статус: {STATUS_TITLES.get(broadcast.status, broadcast.status)}\n\n"
+        f"📊 {done} из {progress.total} ({percent}%)\n"
+        f"✅ Доставлено: {progress.sent}\n"
+        f"❌ Не доставлено: {progress.failed}\n"
+        f"⏳ В очереди: {progress.pending}\n"
+    )
+    if progress.cancelled:
+        text += f"⏹ Отменено: {progress.cancelled}\n"
+    return text + f"\n<blockquote>{html.escape(preview)}</blockquote>"
+
+
+class BroadcastService:
+    @staticmethod
+    async def count_audience(session: AsyncSession, audience: str) -> int:
+        """Число получателей рассылки"""
+        result = await session.execute(
+            select(func.count()).select_from(_audience_query(audience).subquery())
+        )
+        return result.scalar() or 0
+
+    @staticmethod
+    async def create(session: AsyncSession, author_id: int, audience: str, text: str) -> Broadcast:
+        """Создать рассылку и строки получателей (без commit).
+
+        Получатели копируются одним INSERT ... SELECT, поэтому список не
+        проходит через память бота и не меняется, если менеджеры или группы
+        добавятся во время рассылки. Отправитель будится после commit.
+        """
+        broadcast = Broadcast(author_id=author_id, audience=audience, text=text, status=STATUS_RUNNING)
+        session.add(broadcast)
+        await session.flush()
+
+        now = datetime.utcnow()
+        chat_id = _audience_query(audience).subquery().c[0]
+        result = await session.execute(
+            insert(BroadcastRecipient).from_select(
+                ["broadcast_id", "chat_id", "status", "attempts", "next_attempt_at"],
+                select(
+                    literal(broadcast.id),
+                    chat_id,
+                    literal("pending"),
+                    literal(0),
+                    literal(now, UTCDateTime())
+                ).distinct()
+            )
+        )
+        broadcast.total = result.rowcount
+        after_commit(session, broadcast_sender.wake)
+        logger.info(f"Broadcast {broadcast.id} to {audience} created by {author_id}: {broadcast.total} recipients")
+        return broadcast
+
+    @staticmethod
+    async def get(session: AsyncSession, broadcast_id: int) -> Optional[Broadcast]:
+        """Рассылка со свежим статусом (его меняют и обработчики кнопок, и отправитель)"""
+        result = await session.execute(
+            select(Broadcast)
+            .where(Broadcast.id == broadcast_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def set_status(
+        session: AsyncSession,
+        broadcast_id: int,
+        status: str,
+        from_statuses: Collection[str]
+    ) -> bool:
+        """Сменить статус рассылки, если текущий — один из from_statuses (без commit)"""
+        values = {"status": status}
+        if status in (STATUS_CANCELLED, STATUS_COMPLETED):
+            values["finished_at"] = datetime.utcnow()
+        result = await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.status.in_(from_statuses))
+            .values(**values)
+            .execution_options(synchronize_session="fetch")
+        )
+        if result.rowcount and status == STATUS_RUNNING:
+            after_commit(session, broadcast_sender.wake)
+        if result.rowcount and status == STATUS_CANCELLED:
+            await BroadcastService.cancel_pending(session, [broadcast_id])
+        return bool(result.rowcount)
+
+    @staticmethod
+    async def cancel_pending(session: AsyncSession, broadcast_ids: Collection[int]) -> int:
+        """Пометить очередь отменённых рассылок как cancelled одним UPDATE (без commit).
+
+        Получатели в статусе sending не трогаются: их отправка уже идёт. Если
+        она закончится повтором, отправитель вызовет этот метод ещё раз.
+        """
+        cancelled = (
+            select(Broadcast.id)
+            .where(Broadcast.id.in_(broadcast_ids), Broadcast.status == STATUS_CANCELLED)
+        )
+        result = await session.execute(
+            update(BroadcastRecipient)
+            .where(BroadcastRecipient.broadcast_id.in_(cancelled), BroadcastRecipient.status == "pending")
+            .values(status="cancelled")
+        )
+        return result.rowcount
+
+    @staticmethod
+    async def set_status_message(session: AsyncSession, broadcast_id: int, chat_id: int, message_id: int):
+        """Запомнить сообщение, в котором показывается ход рассылки"""
+        await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id)
+            .values(status_chat_id=chat_id, status_message_id=message_id)
+        )
+
+    @staticmethod
+    async def get_progress(session: AsyncSession, broadcast_id: int) -> BroadcastProgress:
+        """Прогресс рассылки одним GROUP BY по статусам получателей"""
+        result = await session.execute(
+            select(BroadcastRecipient.status, func.count())
+            .where(BroadcastRecipient.broadcast_id == broadcast_id)
+            .group_by(BroadcastRecipient.status)
+        )
+        counts = dict(result.all())
+        return BroadcastProgress(
+            pending=counts.get("pending", 0) + counts.get("sending", 0),
+            sent=counts.get("sent", 0),
+            failed=counts.get("failed", 0),
+            cancelled=counts.get("cancelled", 0)
+        )
+
+
+class BroadcastSender:
+    """Фоновая отправка рассылок.
+
+    Получатели забираются пачками из идущих рассылок тем же условным
+    UPDATE (pending → sending), что и в outbox, поэтому рассылку можно
+    продолжить после перезапуска бота. Ограничитель частоты общий с
+    outbox: уведомления о задачах и рассылки вместе не превышают
+    глобальный лимит Telegram.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter, concurrency: int = MAX_CONCURRENT_SENDS):
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self._bot: Optional[Bot] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        # Время последнего обновления сообщения о ходе по id рассылки
+        self._progress_shown: Dict[int, float] = {}
+
+    def start(self, bot: Bot):
+        """Запустить фоновую отправку"""
+        self._bot = bot
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            logger.info("Broadcast sender started")
+
+    async def stop(self):
+        """Остановить отправку; незавершённые рассылки продолжатся после запуска"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            logger.info("Broadcast sender stopped")
+
+    def wake(self):
+        """Разбудить отправителя после создания или возобновления рассылки"""
+        self._wakeup.set()
+
+    async def _run(self):
+        recovered_at = 0.0
+        while True:
+            try:
+                # Пачки, забранные упавшим или остановленным процессом, возвращаются в очередь
+                if time.monotonic() - recovered_at > STALE_SENDING_AFTER.total_seconds():
+                    await self._recover_stale()
+                    recovered_at = time.monotonic()
+                processed = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Error sending broadcasts: {e}", exc_info=True)
+                processed = 0
+            if processed < BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _recover_stale(self):
+        async for session in get_session():
+            result = await session.execute(
+                update(BroadcastRecipient)
+                .where(
+                    BroadcastRecipient.status == "sending",
+                    BroadcastRecipient.next_attempt_at < datetime.utcnow() - STALE_SENDING_AFTER
+                )
+                .values(status="pending")
+            )
+            await session.commit()
+            if result.rowcount:
+                logger.warning(f"Recovered {result.rowcount} stale broadcast recipients")
+            break
+
+    async def drain_once(self) -> int:
+        """Отправить одну пачку получателям идущих рассылок; вернуть её размер"""
+        async for session in get_session():
+            now = datetime.utcnow()
+            result = await session.execute(
+                select(BroadcastRecipient.id)
+                .join(Broadcast, Broadcast.id == BroadcastRecipient.broadcast_id)
+                .where(and_(
+                    Broadcast.status == STATUS_RUNNING,
+                    BroadcastRecipient.status == "pending",
+                    BroadcastRecipient.next_attempt_at <= now
+                ))
+                .order_by(BroadcastRecipient.id)
+                .limit(BATCH_SIZE)
+            )
+            candidate_ids = list(result.scalars().all())
+            if not candidate_ids:
+                await self._finish_completed(session)
+                return 0
+
+            await session.execute(
+                update(BroadcastRecipient)
+                .where(BroadcastRecipient.id.in_(candidate_ids), BroadcastRecipient.status == "pending")
+                .values(status="sending", next_attempt_at=now)
+            )
+            await session.commit()
+
+            result = await session.execute(
+                select(BroadcastRecipient).where(
+                    BroadcastRecipient.id.in_(candidate_ids),
+                    BroadcastRecipient.status == "sending",
+                    BroadcastRecipient.next_attempt_at == now
+                )
+            )
+            recipients = list(result.scalars().all())
+            broadcast_ids = {recipient.broadcast_id for recipient in recipients}
+            result = await session.execute(
+                select(Broadcast.id, Broadcast.text).where(Broadcast.id.in_(broadcast_ids))
+            )
+            texts = dict(result.all())
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def send(recipient: BroadcastRecipient):
+                async with semaphore:
+                    await self._deliver(recipient, texts[recipient.broadcast_id])
+
+            await asyncio.gather(*(send(recipient) for recipient in recipients))
+            # Рассылку могли отменить, пока шла пачка: повторы не остаются в очереди
+            await BroadcastService.cancel_pending(session, broadcast_ids)
+            await session.commit()
+
+            finished_ids = await self._finish_completed(session)
+            for broadcast_id in broadcast_ids - finished_ids:
+                await self._show_progress(session, broadcast_id)
+            return len(recipients)
+        return 0
+
+    async def _deliver(self, recipient: BroadcastRecipient, text: str):
+        """Отправить сообщение одному получателю и обновить его статус (без commit)"""
+        await self.rate_limiter.acquire()
+        recipient.attempts += 1
+        try:
+            await self._bot.send_message(chat_id=recipient.chat_id, text=text, parse_mode="HTML")
+            recipient.status = "sent"
+            recipient.sent_at = datetime.utcnow()
+            recipient.last_error = None
+        except TelegramRetryAfter as e:
+            # Флуд-контроль — не ошибка получателя, попытку не засчитываем
+            recipient.attempts -= 1
+            self._retry(recipient, timedelta(seconds=e.retry_after), str(e))
+        except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError) as e:
+            self._retry(recipient, timedelta(seconds=min(2 ** recipient.attempts, 600)), str(e))
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Бот заблокирован, удалён из группы или чат не найден — повтор не поможет
+            recipient.status = "failed"
+            recipient.last_error = str(e)
+        except Exception as e:
+            self._retry(recipient, timedelta(seconds=min(2 ** recipient.attempts, 600)), str(e))
+            logger.error(f"Error sending broadcast {recipient.broadcast_id} to {recipient.chat_id}: {e}", exc_info=True)
+
+    @staticmethod
+    def _retry(recipient: BroadcastRecipient, delay: timedelta, error: str):
+        recipient.last_error = error
+        if recipient.attempts >= MAX_ATTEMPTS:
+            recipient.status = "failed"
+        else:
+            recipient.status = "pending"
+            recipient.next_attempt_at = datetime.utcnow() + delay
+
+    async def _finish_completed(self, session: AsyncSession) -> Set[int]:
+        """Завершить идущие рассылки, у которых не осталось получателей в очереди"""
+        unfinished = (
+            select(BroadcastRecipient.id)
+            .where(
+                BroadcastRecipient.broadcast_id == Broadcast.id,
+                BroadcastRecipient.status.in_(("pending", "sending"))
+            )
+            .exists()
+        )
+        result = await session.execute(
+            select(Broadcast.id).where(Broadcast.status == STATUS_RUNNING, ~unfinished)
+        )
+        finished_ids = set(result.scalars().all())
+        for broadcast_id in finished_ids:
+            if await BroadcastService.set_status(session, broadcast_id, STATUS_COMPLETED, [STATUS_RUNNING]):
+                await session.commit()
+                logger.info(f"Broadcast {broadcast_id} completed")
+                await self._show_progress(session, broadcast_id, force=True)
+        return finished_ids
+
+    async def _show_progress(self, session: AsyncSession, broadcast_id: int, force: bool = False):
+        """Обновить сообщение о ходе рассылки (не чаще PROGRESS_INTERVAL)"""
+        now = time.monotonic()
+        if not force and now - self._progress_shown.get(broadcast_id, 0) < PROGRESS_INTERVAL:
+            return
+        self._progress_shown[broadcast_id] = now
+
+        broadcast = await BroadcastService.get(session, broadcast_id)
+        if broadcast is None or broadcast.status_message_id is None:
+            return
+        if broadcast.status != STATUS_RUNNING:
+            self._progress_shown.pop(broadcast_id, None)
+        progress = await BroadcastService.get_progress(session, broadcast_id)
+        await self.rate_limiter.acquire()
+        try:
+            await self._bot.edit_message_text(
+                text=render_broadcast_status(broadcast, progress),
+                chat_id=broadcast.status_chat_id,
+                message_id=broadcast.status_message_id,
+                reply_markup=get_broadcast_control_keyboard(broadcast.id, broadcast.status),
+                parse_mode="HTML"
+            )
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.warning(f"Cannot update broadcast {broadcast_id} status message: {e}")
+        except Exception as e:
+            logger.warning(f"Cannot update broadcast {broadcast_id} status message: {e}")
+        # Сообщение изменено в обход рендерера
+        message_renderer.forget(broadcast.status_chat_id, broadcast.status_message_id)
+
+
+broadcast_sender = BroadcastSender(outbox_sender.rate_limiter)
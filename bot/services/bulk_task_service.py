@@ -0,0 +1,129 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, func
+from bot.database.models import User
+from bot.services.permission_service import managers_filter
+from bot.services.time_service import time_zones, local_today, end_of_day, parse_local_date
+from dataclasses import dataclass, field
+from datetime import date
+from typing import List, Dict, Optional, Collection, Tuple
+import csv
+import io
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+DATE_PATTERN = re.compile(r"^\d{2}\.\d{2}\.\d{4}$")
+MAX_BULK_ROWS = 1000
+
+
+@dataclass
+class BulkParseResult:
+    tasks: List[Dict] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+
+def parse_deadline(date_str: str, zone=None) -> Optional[date]:
+    """Разобрать дату дедлайна ДД.ММ.ГГГГ; None — если формат неверный или дата не в будущем.
+
+    «Сегодня» определяется по часовому поясу zone (по умолчанию — команды),
+    время дедлайна на эту дату даёт time_service.end_of_day.
+    """
+    date_str = date_str.strip()
+    if not DATE_PATTERN.match(date_str):
+        return None
+    day = parse_local_date(date_str)
+    if day is None or day <= local_today(zone):
+        return None
+    return day
+
+
+def _split_rows(content: str) -> Tuple[List[List[str]], str]:
+    """Разбить вставленный текст или CSV на строки колонок"""
+    lines = [line for line in content.splitlines() if line.strip()]
+    if not lines:
+        return [], ";"
+    delimiter = ";" if lines[0].count(";") >= lines[0].count(",") else ","
+    return [[cell.strip() for cell in row] for row in csv.reader(lines, delimiter=delimiter)], delimiter
+
+
+class BulkTaskService:
+    @staticmethod
+    async def parse(
+        session: AsyncSession,
+        content: str,
+        manager_ids: Optional[Collection[int]] = None
+    ) -> BulkParseResult:
+        """Разобрать список задач формата «менеджер; текст; ДД.ММ.ГГГГ».
+
+        Менеджер задаётся Telegram ID или @username. Все менеджеры
+        разрешаются одним запросом. ``manager_ids`` ограничивает набор
+        допустимых менеджеров (для руководителей групп).
+        """
+        result = BulkParseResult()
+        rows, delimiter = _split_rows(content)
+        if len(rows) > MAX_BULK_ROWS:
+            result.errors.append(f"Слишком много строк: {len(rows)} (максимум {MAX_BULK_ROWS})")
+            return result
+        
+        parsed: List[Tuple[int, str, str, date]] = []
+        telegram_ids = set()
+        usernames = set()
+        for line_no, row in enumerate(rows, 1):
+            if len(row) < 3:
+                result.errors.append(f"Строка {line_no}: нужно 3 колонки")
+                continue
+            # Запятые или точки с запятой внутри текста задачи без кавычек
+            manager_ref, text, date_str = row[0], f"{delimiter} ".join(row[1:-1]).strip(), row[-1]
+            deadline = parse_deadline(date_str)
+            if deadline is None:
+                # Первая строка без даты — заголовок CSV
+                if line_no == 1 and not DATE_PATTERN.match(date_str):
+                    continue
+                result.errors.append(f"Строка {line_no}: неверный или прошедший дедлайн «{date_str}»")
+                continue
+            if len(text) < 3:
+                result.errors.append(f"Строка {line_no}: текст задачи короче 3 символов")
+                continue
+            if manager_ref.isdigit():
+                telegram_ids.add(int(manager_ref))
+            else:
+                usernames.add(manager_ref.lstrip("@").lower())
+            parsed.append((line_no, manager_ref, text, deadline))
+        
+        if not parsed:
+            return result
+        
+        query = select(User.id, User.telegram_id, User.username).where(
+            managers_filter(),
+            or_(User.telegram_id.in_(telegram_ids), func.lower(User.username).in_(usernames))
+        )
+        managers_by_ref: Dict[str, int] = {}
+        for row in (await session.execute(query)).all():
+            if manager_ids is not None and row.id not in manager_ids:
+                continue
+            managers_by_ref[str(row.telegram_id)] = row.id
+            if row.username:
+                managers_by_ref[row.username.lower()] = row.id
+        
+        for line_no, manager_ref, text, deadline in parsed:
+            manager_id = managers_by_ref.get(manager_ref.lstrip("@").lower())
+            if manager_id is None:
+                result.errors.append(f"Строка {line_no}: менеджер «{manager_ref}» не найден или недоступен")
+                continue
+            result.tasks.append({
+                "manager_id": manager_id,
+                "text": text,
+                "deadline": end_of_day(deadline, time_zones.zone_for(manager_id)),
+            })
+        return result
+    
+    @staticmethod
+    def read_document(data: bytes) -> str:
+        """Декодировать загруженный CSV-файл"""
+        for encoding in ("utf-8-sig", "cp1251"):
+            try:
+                return data.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        raise ValueError("Unsupported file encoding")
@@ -0,0 +1,283 @@
+from sqlalchemy import select, update, and_
+from bot.database.database import get_session
+from bot.database.models import Task, User
+from bot.services.outbox_service import OutboxService, outbox_sender
+from bot.services.permission_service import permission_index
+from bot.services.time_service import time_zones, format_local, DATETIME_FORMAT
+from bot.keyboards.manager_keyboards import get_task_actions_keyboard
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import html
+import logging
+
+logger = logging.getLogger(__name__)
+
+STAGE_DAY_BEFORE = 1
+STAGE_HOUR_BEFORE = 2
+STAGE_OVERDUE = 3
+
+# Этап напоминания и его смещение относительно дедлайна
+STAGES: Tuple[Tuple[int, timedelta], ...] = (
+    (STAGE_DAY_BEFORE, timedelta(hours=24)),
+    (STAGE_HOUR_BEFORE, timedelta(hours=1)),
+    (STAGE_OVERDUE, timedelta(0)),
+)
+MAX_OFFSET = timedelta(hours=24)
+
+# В памяти держим только события ближайшего окна; окно перечитывается
+# чаще, чем истекает, поэтому ни одно событие не выпадает
+WINDOW = timedelta(hours=2)
+RELOAD_EVERY = timedelta(hours=1)
+# Просрочки старше этого срока при загрузке не эскалируются повторно
+OVERDUE_LOOKBACK = timedelta(days=2)
+# Напоминание до дедлайна, опоздавшее больше чем на этот срок (перезапуск,
+# задача создана уже внутри окна), не отправляется
+STAGE_GRACE = timedelta(minutes=15)
+
+
+class DeadlineTracker:
+    """Min-heap событий по дедлайнам: напоминания за 24 ч, за 1 ч и эскалация просрочки.
+
+    В куче лежат кортежи (время, task_id, этап, дедлайн). Изменения задач
+    не ищут старые записи в куче: актуальное состояние хранится в словаре
+    ``_tracked``, а устаревшие записи отбрасываются при извлечении
+    (ленивое удаление). Добавление и извлечение — O(log n).
+
+    Факт отправки фиксируется условным UPDATE поля ``Task.reminder_stage``
+    в одной транзакции с записью в outbox, поэтому после перезапуска или
+    при нескольких экземплярах бота напоминание не дублируется.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, int, datetime]] = []
+        self._tracked: Dict[int, Tuple[datetime, int]] = {}
+        self._loaded_until = datetime.min
+        self._wakeup = asyncio.Event()
+        self._reload_requested = False
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запустить обработку событий"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            logger.info("Deadline tracker started")
+
+    async def stop(self):
+        """Остановить обработку событий"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            logger.info("Deadline tracker stopped")
+
+    def track(self, task_id: int, deadline: datetime, stage_sent: int = 0):
+        """Начать или обновить отслеживание задачи"""
+        self._tracked[task_id] = (deadline, stage_sent)
+        self._push_events(task_id, deadline, stage_sent, datetime.utcnow())
+        self._wakeup.set()
+
+    def forget(self, task_id: int):
+        """Прекратить отслеживание задачи (выполнена или удалена)"""
+        self._tracked.pop(task_id, None)
+        # Записи в куче станут устаревшими; чистим, если их накопилось много
+        if len(self._heap) > 2 * len(self._tracked) + 1000:
+            self._compact()
+
+    def request_reload(self):
+        """Перечитать окно из БД (после массовых вставок задач)"""
+        self._reload_requested = True
+        self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._tracked)
+
+    def _push_events(self, task_id: int, deadline: datetime, stage_sent: int, now: datetime):
+        due_stage = None
+        for stage, offset in STAGES:
+            if stage <= stage_sent:
+                continue
+            fire_at = deadline - offset
+            if fire_at <= now:
+                # Из пропущенных этапов отправляем только самый поздний и только
+                # если он опоздал ненадолго: «за 24 часа» за 14 часов не шлём
+                if stage == STAGE_OVERDUE or now - fire_at <= STAGE_GRACE:
+                    due_stage = stage
+            elif fire_at <= self._loaded_until:
+                heapq.heappush(self._heap, (fire_at, task_id, stage, deadline))
+        if due_stage is not None:
+            heapq.heappush(self._heap, (now, task_id, due_stage, deadline))
+
+    def _compact(self):
+        self._heap = [
+            entry for entry in self._heap
+            if self._tracked.get(entry[1], (None, 0))[0] == entry[3]
+        ]
+        heapq.heapify(self._heap)
+
+    async def reload(self):
+        """Загрузить задачи, события которых попадают в ближайшее окно"""
+        now = datetime.utcnow()
+        loaded_until = now + WINDOW
+        async for session in get_session():
+            result = await session.execute(
+                select(Task.id, Task.deadline, Task.reminder_stage).where(
+                    and_(
+                        Task.status == "active",
+                        Task.reminder_stage < STAGE_OVERDUE,
+                        Task.deadline >= now - OVERDUE_LOOKBACK,
+                        Task.deadline <= loaded_until + MAX_OFFSET
+                    )
+                )
+            )
+            rows = result.all()
+            break
+
+        self._heap = []
+        self._tracked = {}
+        self._loaded_until = loaded_until
+        for row in rows:
+            self._tracked[row.id] = (row.deadline, row.reminder_stage)
+            self._push_events(row.id, row.deadline, row.reminder_stage, now)
+        heapq.heapify(self._heap)
+        self._reload_requested = False
+        logger.info(f"Deadline tracker loaded {len(rows)} tasks, {len(self._heap)} events until {loaded_until}")
+
+    async def _run(self):
+        next_reload = datetime.min
+        while True:
+            try:
+                now = datetime.utcnow()
+                if self._reload_requested or now >= next_reload:
+                    await self.reload()
+                    next_reload = now + RELOAD_EVERY
+
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    fire_at, task_id, stage, deadline = heapq.heappop(self._heap)
+                    tracked = self._tracked.get(task_id)
+                    if tracked and tracked[0] == deadline and stage > tracked[1]:
+                        due.append((task_id, stage, deadline))
+                if due:
+                    await self._fire(due)
+
+                wait_until = next_reload
+                if self._heap:
+                    wait_until = min(wait_until, self._heap[0][0])
+                timeout = max((wait_until - datetime.utcnow()).total_seconds(), 0)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in deadline tracker: {e}", exc_info=True)
+                await asyncio.sleep(10)
+
+    async def _fire(self, due: List[Tuple[int, int, datetime]]):
+        """Отправить напоминания пачкой событий в одной транзакции"""
+        async for session in get_session():
+            claimed = []
+            for task_id, stage, deadline in due:
+                result = await session.execute(
+                    update(Task)
+                    .where(
+                        Task.id == task_id,
+                        Task.status == "active",
+                        Task.deadline == deadline,
+                        Task.reminder_stage < stage
+                    )
+                    .values(reminder_stage=stage)
+                )
+                if result.rowcount:
+                    claimed.append((task_id, stage))
+
+            if claimed:
+                stage_by_task = dict(claimed)
+                result = await session.execute(
+                    select(Task.id, Task.text, Task.deadline, Task.manager_id, User.telegram_id, User.first_name, User.username)
+                    .join(User, User.id == Task.manager_id)
+                    .where(Task.id.in_(stage_by_task))
+                )
+                messages = []
+                for row in result.all():
+                    messages.extend(_stage_messages(row, stage_by_task[row.id]))
+                await OutboxService.enqueue(session, messages)
+
+            await session.commit()
+            break
+
+        for task_id, stage, deadline in due:
+            tracked = self._tracked.get(task_id)
+            if tracked and tracked[0] == deadline:
+                if stage >= STAGE_OVERDUE:
+                    self._tracked.pop(task_id, None)
+                else:
+                    self._tracked[task_id] = (deadline, stage)
+        if claimed:
+            outbox_sender.wake()
+            logger.info(f"Fired {len(claimed)} deadline events")
+
+
+def _stage_messages(row, stage: int) -> List[Dict]:
+    task_text = html.escape(row.text)
+    deadline_str = format_local(row.deadline, time_zones.zone_for(row.manager_id), DATETIME_FORMAT)
+    dedup_prefix = f"deadline:{row.id}:{row.deadline.isoformat()}:{stage}"
+
+    if stage == STAGE_OVERDUE:
+        messages = [{
+            "chat_id": row.telegram_id,
+            "text": (
+                f"🔴 <b>Задача просрочена!</b>\n\n"
+                f"📌 <b>Задача:</b> {task_text}\n"
+                f"📅 <b>Дедлайн был:</b> {deadline_str}\n\n"
+                f"Отметьте выполнение или перенесите срок."
+            ),
+            "reply_markup": get_task_actions_keyboard(row.id),
+            "dedup_key": dedup_prefix,
+        }]
+        manager_name = html.escape(row.first_name or row.username or f"ID: {row.telegram_id}")
+        supervisors = permission_index.admin_ids() | permission_index.lead_ids_for(row.manager_id)
+        for chat_id in supervisors:
+            messages.append({
+                "chat_id": chat_id,
+                "text": (
+                    f"🚨 <b>Просрочена задача #{row.id}</b>\n\n"
+                    f"👤 <b>Менеджер:</b> {manager_name}\n"
+                    f"📌 <b>Задача:</b> {task_text}\n"
+                    f"📅 <b>Дедлайн:</b> {deadline_str}"
+                ),
+                "dedup_key": f"{dedup_prefix}:{chat_id}",
+            })
+        return messages
+
+    return [{
+        "chat_id": row.telegram_id,
+        "text": (
+            f"⏰ <b>Дедлайн через {_format_remaining(row.deadline - datetime.utcnow())}!</b>\n\n"
+            f"📌 <b>Задача:</b> {task_text}\n"
+            f"📅 <b>Дедлайн:</b> {deadline_str}"
+        ),
+        "reply_markup": get_task_actions_keyboard(row.id),
+        "dedup_key": dedup_prefix,
+    }]
+
+
+def _format_remaining(remaining: timedelta) -> str:
+    """Оставшееся время до дедлайна: «23 ч 50 мин», «45 мин»"""
+    minutes = max(int(remaining.total_seconds() // 60), 1)
+    hours, minutes = divmod(minutes, 60)
+    if not hours:
+        return f"{minutes} мин"
+    if not minutes:
+        return f"{hours} ч"
+    return f"{hours} ч {minutes} мин"
+
+
+deadline_tracker = DeadlineTracker()
@@ -0,0 +1,165 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from bot.database.models import Task, User, GroupAnalytics, GroupMember, ExportWatermark
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+BI_EXPORTS_DIR = os.path.join("exports", "bi")
+# Аренда, под которой идёт любая выгрузка: плановая и по команде /export
+BI_EXPORT_JOB = "bi_export"
+CHUNK_SIZE = 5000
+# Инкремент перечитывает строки и чуть раньше водяного знака: транзакция,
+# начатая до выгрузки, может зафиксироваться после неё со старым updated_at
+EXPORT_OVERLAP = timedelta(minutes=10)
+
+# Таблица и колонка, по которой определяются изменённые строки
+EXPORT_TABLES = (
+    (Task, Task.updated_at),
+    (User, User.updated_at),
+    (GroupAnalytics, GroupAnalytics.last_updated),
+    (GroupMember, GroupMember.updated_at),
+)
+
+
+@dataclass
+class ExportResult:
+    table: str
+    rows: int
+    path: Optional[str]
+
+
+def _format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _row_key(row: tuple, key_positions: List[int], changed_position: int) -> Tuple:
+    """Ключ строки для дедупликации: первичный ключ и время изменения"""
+    return tuple(row[position] for position in key_positions) + (_format_value(row[changed_position]),)
+
+
+def _load_keys(data: Optional[str]) -> Set[Tuple]:
+    return {tuple(key) for key in json.loads(data)} if data else set()
+
+
+def _encode_chunk(rows: List[tuple]) -> bytes:
+    """Сериализовать пачку строк в CSV (выполняется в пуле потоков)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows([_format_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+class ExportService:
+    @staticmethod
+    async def export_table(
+        session: AsyncSession,
+        model,
+        changed_column,
+        until: datetime,
+        full: bool = False
+    ) -> ExportResult:
+        """Выгрузить строки таблицы, изменённые после водяного знака, в CSV.gz.
+
+        Строки читаются потоком пачками по CHUNK_SIZE, сериализация и
+        сжатие выполняются в пуле потоков, поэтому цикл событий не
+        блокируется. Водяной знак сдвигается до ``until`` только после
+        успешной записи файла.
+
+        Инкремент начинается на EXPORT_OVERLAP раньше водяного знака, чтобы
+        не потерять строки из поздно зафиксированных транзакций. Строки,
+        уже выгруженные в окне перекрытия, отсеиваются по первичному ключу
+        и времени изменения (ExportWatermark.overlap_keys).
+        """
+        table = model.__table__
+        watermark = None if full else await session.get(ExportWatermark, table.name)
+
+        columns = list(table.columns)
+        key_positions = [columns.index(column) for column in table.primary_key.columns]
+        changed_position = columns.index(changed_column.expression)
+        overlap_start = until - EXPORT_OVERLAP
+        exported_keys: Set[Tuple] = set()
+        overlap_keys: Set[Tuple] = set()
+
+        query = select(*columns).order_by(*table.primary_key.columns)
+        if watermark is not None:
+            exported_keys = _load_keys(watermark.overlap_keys)
+            query = query.where(
+                changed_column > watermark.watermark - EXPORT_OVERLAP,
+                changed_column <= until
+            )
+
+        os.makedirs(BI_EXPORTS_DIR, exist_ok=True)
+        mode = "full" if watermark is None else "incremental"
+        path = os.path.abspath(
+            os.path.join(BI_EXPORTS_DIR, f"{table.name}_{until:%Y%m%d_%H%M%S}_{mode}.csv.gz")
+        )
+        header = _encode_chunk([[column.name for column in table.columns]])
+
+        rows = 0
+        output = await asyncio.to_thread(gzip.open, path + ".part", "wb")
+        try:
+            await asyncio.to_thread(output.write, header)
+            result = await session.stream(query.execution_options(yield_per=CHUNK_SIZE))
+            async for partition in result.partitions(CHUNK_SIZE):
+                chunk = []
+                for row in partition:
+                    row = tuple(row)
+                    key = _row_key(row, key_positions, changed_position)
+                    changed = row[changed_position]
+                    if changed is not None and changed > overlap_start:
+                        overlap_keys.add(key)
+                    if key not in exported_keys:
+                        chunk.append(row)
+                if not chunk:
+                    continue
+                data = await asyncio.to_thread(_encode_chunk, chunk)
+                await asyncio.to_thread(output.write, data)
+                rows += len(chunk)
+        finally:
+            await asyncio.to_thread(output.close)
+
+        if rows:
+            await asyncio.to_thread(os.replace, path + ".part", path)
+        else:
+            await asyncio.to_thread(os.remove, path + ".part")
+            path = None
+
+        if watermark is None:
+            watermark = await session.get(ExportWatermark, table.name)
+        if watermark is None:
+            watermark = ExportWatermark(table_name=table.name, watermark=until)
+            session.add(watermark)
+        watermark.watermark = until
+        watermark.overlap_keys = json.dumps(sorted(overlap_keys, key=repr))
+        watermark.rows_exported = rows
+        watermark.exported_at = datetime.utcnow()
+        await session.commit()
+
+        logger.info(f"Exported {rows} rows of {table.name} ({mode}) to {path}")
+        return ExportResult(table=table.name, rows=rows, path=path)
+
+    @staticmethod
+    async def export_all(session: AsyncSession, full: bool = False) -> List[ExportResult]:
+        """Выгрузить все таблицы для BI: изменения с прошлого запуска или полностью"""
+        # Общая верхняя граница: выгрузки разных таблиц согласованы между собой
+        until = datetime.utcnow()
+        return [
+            await ExportService.export_table(session, model, changed_column, until, full=full)
+            for model, changed_column in EXPORT_TABLES
+        ]
@@ -1,6 +1,7 @@
 from bot.database.models import Task
 from typing import List
 from datetime import datetime
+from bot.services.time_service import default_zone, format_local
 import os
 import logging
 
@@ -16,7 +17,8 @@ class FileService:
         if not os.path.exists(EXPORTS_DIR):
             os.makedirs(EXPORTS_DIR)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.now(default_zone())
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         # Используем os.path.join для правильного формирования пути в Windows
         filename = os.path.join(EXPORTS_DIR, f"completed_tasks_{timestamp}.txt")
         # Получаем абсолютный путь
@@ -25,7 +27,7 @@ class FileService:
         try:
             with open(abs_path, "w", encoding="utf-8") as f:
                 f.write("=" * 60 + "\n")
-                f.write(f"ВЫПОЛНЕННЫЕ ЗАДАЧИ (Экспорт: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')})\n")
+                f.write(f"ВЫПОЛНЕННЫЕ ЗАДАЧИ (Экспорт: {now.strftime('%d.%m.%Y %H:%M:%S')})\n")
                 f.write("=" * 60 + "\n\n")
                 
                 if not tasks:
@@ -33,7 +35,7 @@ class FileService:
                 else:
                     for task in tasks:
                         manager_name = task.manager.first_name or task.manager.username or f"ID: {task.manager.telegram_id}" if task.manager else "N/A"
-                        completed_at = task.completed_at.strftime("%d.%m.%Y %H:%M:%S") if task.completed_at else "N/A"
+                        completed_at = format_local(task.completed_at, fmt="%d.%m.%Y %H:%M:%S")
                         
                         f.write(f"Менеджер: {manager_name}\n")
                         f.write(f"Задача: {task.text}\n")
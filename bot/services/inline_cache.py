@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+from bot.services.search_service import query_terms, matches_terms
+from bot.services.task_hooks import on_tasks_changed
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TaskSnapshot:
+    """Неизменяемый снимок задачи для выдачи inline-результатов"""
+    id: int
+    manager_id: int
+    text: str
+    deadline: datetime
+    status: str
+    not_completed_reason: Optional[str] = None
+
+    @property
+    def search_text(self) -> str:
+        # Те же поля, что и в SQL-поиске (tasks_fts): текст и причина невыполнения
+        if self.not_completed_reason:
+            return f"{self.text}\n{self.not_completed_reason}"
+        return self.text
+
+
+@dataclass(frozen=True)
+class ManagerSnapshot:
+    """Снимок статистики менеджера для inline-выдачи руководителю"""
+    id: int
+    telegram_id: int
+    name: str
+    username: Optional[str]
+    total: int
+    completed: int
+    not_completed: int
+    active: int
+    percentage: float
+
+    @property
+    def search_text(self) -> str:
+        return f"{self.name} {self.username or ''}"
+
+
+@dataclass
+class _Entry:
+    items: Tuple
+    # Полный набор: запрос-продолжение можно отфильтровать из него в памяти
+    complete: bool
+
+
+class InlineResultCache:
+    """Кэш результатов inline-запросов по пользователю и запросу.
+
+    Пока пользователь набирает ``@бот отч``, ``@бот отчё``, ``@бот отчёт``,
+    каждый следующий запрос — продолжение предыдущего. Если для префикса
+    сохранён полный набор результатов, новый запрос фильтруется из него
+    без обращения к БД. Записи пространства ``tasks`` (ключ — users.id
+    менеджера) сбрасываются при изменении его задач, записи остальных
+    пространств (выдача руководителей) — при любом изменении задач.
+    Общий размер ограничен LRU.
+    """
+
+    def __init__(self, max_users: int = 1000, max_queries_per_user: int = 32):
+        self.max_users = max_users
+        self.max_queries_per_user = max_queries_per_user
+        self._users: "OrderedDict[Tuple[str, int], OrderedDict[str, _Entry]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope: str, user_key: int, query: str) -> Optional[Tuple]:
+        """Результаты из кэша: точное совпадение или фильтрация полного префикса"""
+        entries = self._users.get((scope, user_key))
+        if entries is None:
+            self.misses += 1
+            return None
+        self._users.move_to_end((scope, user_key))
+
+        query = _normalize(query)
+        entry = entries.get(query)
+        if entry is not None:
+            entries.move_to_end(query)
+            self.hits += 1
+            return entry.items
+
+        terms = query_terms(query)
+        for prefix, entry in reversed(entries.items()):
+            if entry.complete and query.startswith(prefix):
+                items = entry.items if not terms else tuple(
+                    item for item in entry.items if matches_terms(item.search_text, terms)
+                )
+                self.put(scope, user_key, query, items, complete=True)
+                self.hits += 1
+                return items
+
+        self.misses += 1
+        return None
+
+    def put(self, scope: str, user_key: int, query: str, items: Iterable, complete: bool):
+        """Сохранить результаты запроса"""
+        key = (scope, user_key)
+        entries = self._users.get(key)
+        if entries is None:
+            entries = self._users[key] = OrderedDict()
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        query = _normalize(query)
+        entries[query] = _Entry(tuple(items), complete)
+        entries.move_to_end(query)
+        if len(entries) > self.max_queries_per_user:
+            entries.popitem(last=False)
+
+    def invalidate(self, manager_ids: Optional[Iterable[int]] = None):
+        """Сбросить кэш задач указанных менеджеров и всю выдачу руководителей"""
+        if manager_ids is None:
+            self._users.clear()
+            return
+        manager_ids = set(manager_ids)
+        for key in list(self._users):
+            scope, user_key = key
+            if scope != "tasks" or user_key in manager_ids:
+                del self._users[key]
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+inline_cache = InlineResultCache()
+on_tasks_changed(inline_cache.invalidate)
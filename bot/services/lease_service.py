@@ -0,0 +1,160 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, and_, or_
+from bot.database.database import get_session, insert_ignore
+from bot.database.models import JobLease
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Уникальный идентификатор процесса бота
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+DEFAULT_LEASE_TTL = timedelta(minutes=10)
+
+
+class LeaseService:
+    """Аренда периодических заданий через строку в БД.
+
+    Захват — условный UPDATE: строка достаётся экземпляру, только если она
+    свободна или просрочена; продлить её может только владелец. Пока задание выполняется,
+    аренда продлевается heartbeat'ом; если процесс упал, аренда истекает
+    сама через TTL.
+
+    Запуск по расписанию дополнительно привязан к времени срабатывания:
+    last_run_at хранит последнее занятое срабатывание, и то же самое
+    срабатывание не выполнится второй раз на другом экземпляре после
+    освобождения аренды.
+    """
+
+    @staticmethod
+    async def acquire(
+        session: AsyncSession,
+        name: str,
+        ttl: timedelta = DEFAULT_LEASE_TTL,
+        fire_time: Optional[datetime] = None,
+        renew: bool = False
+    ) -> bool:
+        """Захватить (renew=True — продлить свою) аренду.
+
+        Свободной аренда считается и для того же экземпляра: задание,
+        запущенное по расписанию, и то же задание по команде не идут
+        одновременно. С fire_time (naive UTC) захват удаётся, только если
+        это срабатывание ещё никем не занято: last_run_at < fire_time.
+        """
+        await session.execute(insert_ignore(session, JobLease, ["name"]), [{"name": name}])
+        now = datetime.utcnow()
+        if renew:
+            available = and_(JobLease.owner == INSTANCE_ID, JobLease.expires_at >= now)
+        else:
+            available = or_(
+                JobLease.owner.is_(None),
+                JobLease.expires_at.is_(None),
+                JobLease.expires_at < now
+            )
+        conditions = [JobLease.name == name, available]
+        values = {"owner": INSTANCE_ID, "expires_at": now + ttl}
+        if fire_time is not None:
+            conditions.append(or_(JobLease.last_run_at.is_(None), JobLease.last_run_at < fire_time))
+            values["last_run_at"] = fire_time
+        result = await session.execute(update(JobLease).where(*conditions).values(**values))
+        await session.commit()
+        return bool(result.rowcount)
+
+    @staticmethod
+    async def release(
+        session: AsyncSession,
+        name: str,
+        completed: bool = True,
+        fire_time: Optional[datetime] = None,
+        previous_run: Optional[datetime] = None
+    ):
+        """Освободить аренду.
+
+        Если задание завершилось с ошибкой, занятое срабатывание fire_time
+        возвращается: last_run_at откатывается к previous_run, и
+        пропущенный запуск повторится при догоняющей проверке.
+        """
+        await session.execute(
+            update(JobLease)
+            .where(JobLease.name == name, JobLease.owner == INSTANCE_ID)
+            .values(owner=None, expires_at=None)
+        )
+        if not completed and fire_time is not None:
+            await session.execute(
+                update(JobLease)
+                .where(JobLease.name == name, JobLease.last_run_at == fire_time)
+                .values(last_run_at=previous_run)
+            )
+        await session.commit()
+
+    @staticmethod
+    async def get_last_run(session: AsyncSession, name: str) -> Optional[datetime]:
+        """Последнее занятое срабатывание задания (UTC)"""
+        result = await session.execute(select(JobLease.last_run_at).where(JobLease.name == name))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def run_exclusive(
+        name: str,
+        func: Callable[[], Awaitable[None]],
+        fire_time: Optional[datetime] = None,
+        ttl: timedelta = DEFAULT_LEASE_TTL
+    ) -> bool:
+        """Выполнить задание, только если аренда досталась этому экземпляру.
+
+        fire_time — срабатывание расписания (naive UTC), которое выполняется;
+        уже занятое срабатывание пропускается. True — задание выполнено до конца.
+        """
+        async for session in get_session():
+            previous_run = await LeaseService.get_last_run(session, name)
+            acquired = await LeaseService.acquire(session, name, ttl, fire_time)
+            break
+        if not acquired:
+            logger.info(f"Job {name} ({fire_time}) is running or already done on another instance, skipping")
+            return False
+
+        # Задание выполняется отдельной задачей: потеряв аренду, heartbeat
+        # отменяет его, чтобы оно не шло одновременно с другим экземпляром
+        job = asyncio.create_task(func())
+        heartbeat = asyncio.create_task(LeaseService._heartbeat(name, ttl, job))
+        completed = False
+        try:
+            await job
+            completed = True
+        except asyncio.CancelledError:
+            if not (heartbeat.done() and not heartbeat.cancelled()):
+                raise
+            logger.error(f"Job {name} ({fire_time}) was cancelled after losing its lease")
+        finally:
+            heartbeat.cancel()
+            async for session in get_session():
+                await LeaseService.release(session, name, completed, fire_time, previous_run)
+                break
+        return completed
+
+    @staticmethod
+    async def _heartbeat(name: str, ttl: timedelta, job: asyncio.Task):
+        """Продлевать аренду, пока идёт задание; при потере аренды отменить его"""
+        interval = ttl.total_seconds() / 3
+        renewed_at = datetime.utcnow()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async for session in get_session():
+                    lost = not await LeaseService.acquire(session, name, ttl, renew=True)
+                    break
+                if not lost:
+                    renewed_at = datetime.utcnow()
+            except Exception as e:
+                logger.error(f"Error renewing lease for job {name}: {e}")
+                # Аренда истечёт раньше следующей попытки продления
+                lost = datetime.utcnow() + timedelta(seconds=interval) >= renewed_at + ttl
+            if lost:
+                logger.error(f"Lost lease for job {name}, cancelling it")
+                job.cancel()
+                return
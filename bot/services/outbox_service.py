@@ -0,0 +1,271 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, insert, and_, literal
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest, TelegramNetworkError, TelegramServerError
+)
+from aiogram.types import InlineKeyboardMarkup
+from bot.database.database import get_session, insert_ignore
+from bot.database.models import OutboxMessage, User
+from bot.database.types import UTCDateTime
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Глобальный лимит Telegram — около 30 сообщений в секунду, оставляем запас
+MESSAGES_PER_SECOND = 25
+MAX_CONCURRENT_SENDS = 8
+MAX_ATTEMPTS = 8
+BATCH_SIZE = 100
+POLL_INTERVAL = 2
+# Сообщения, зависшие в статусе "sending" (падение процесса во время отправки)
+STALE_SENDING_AFTER = timedelta(minutes=5)
+KEEP_SENT_FOR = timedelta(days=7)
+
+
+def _serialize_markup(reply_markup: Optional[InlineKeyboardMarkup]) -> Optional[str]:
+    if reply_markup is None:
+        return None
+    return reply_markup.model_dump_json(exclude_none=True)
+
+
+class OutboxService:
+    """Запись уведомлений в outbox в транзакции вызывающего кода.
+
+    Методы только добавляют строки в текущую сессию и не делают commit:
+    уведомление сохраняется тогда и только тогда, когда фиксируется
+    изменение задачи, ради которого оно создано.
+    """
+
+    @staticmethod
+    async def enqueue(session: AsyncSession, messages: List[Dict]):
+        """Добавить сообщения (chat_id, text, reply_markup, dedup_key) в outbox.
+
+        Сообщения с уже существующим dedup_key пропускаются.
+        """
+        if not messages:
+            return
+        now = datetime.utcnow()
+        rows = [
+            {
+                "chat_id": message["chat_id"],
+                "text": message["text"],
+                "reply_markup": _serialize_markup(message.get("reply_markup")),
+                "dedup_key": message.get("dedup_key"),
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now,
+            }
+            for message in messages
+        ]
+        await session.execute(insert_ignore(session, OutboxMessage, ["dedup_key"]), rows)
+
+    @staticmethod
+    async def enqueue_for_user(
+        session: AsyncSession,
+        user_id: int,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        dedup_key: Optional[str] = None
+    ):
+        """Добавить сообщение пользователю по users.id (chat_id подставляется в том же INSERT)"""
+        now = datetime.utcnow()
+        await session.execute(
+            insert(OutboxMessage).from_select(
+                ["chat_id", "text", "reply_markup", "dedup_key", "status", "attempts", "next_attempt_at", "created_at"],
+                select(
+                    User.telegram_id,
+                    literal(text),
+                    literal(_serialize_markup(reply_markup)),
+                    literal(dedup_key),
+                    literal("pending"),
+                    literal(0),
+                    literal(now, UTCDateTime()),
+                    literal(now, UTCDateTime()),
+                ).where(User.id == user_id)
+            )
+        )
+
+
+class RateLimiter:
+    """Равномерное ограничение частоты: не более ``rate`` операций в секунду"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class OutboxSender:
+    """Фоновая отправка сообщений из outbox.
+
+    Строки забираются пачками через условный UPDATE (pending → sending),
+    поэтому одно сообщение не отправится дважды даже при нескольких
+    отправителях. Ошибки 429 и сетевые сбои откладывают повтор с
+    экспоненциальной задержкой; после MAX_ATTEMPTS сообщение помечается
+    как failed.
+    """
+
+    def __init__(self, rate: float = MESSAGES_PER_SECOND, concurrency: int = MAX_CONCURRENT_SENDS):
+        self.rate_limiter = RateLimiter(rate)
+        self.concurrency = concurrency
+        self._bot: Optional[Bot] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def start(self, bot: Bot):
+        """Запустить фоновую отправку"""
+        self._bot = bot
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            logger.info("Outbox sender started")
+
+    async def stop(self):
+        """Остановить фоновую отправку; неотправленное останется в БД"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            logger.info("Outbox sender stopped")
+
+    def wake(self):
+        """Разбудить отправителя после фиксации новых сообщений"""
+        self._wakeup.set()
+
+    async def _run(self):
+        await self._recover_stale()
+        while True:
+            try:
+                processed = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Error draining outbox: {e}", exc_info=True)
+                processed = 0
+            if processed < BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _recover_stale(self):
+        async for session in get_session():
+            result = await session.execute(
+                update(OutboxMessage)
+                .where(
+                    OutboxMessage.status == "sending",
+                    OutboxMessage.next_attempt_at < datetime.utcnow() - STALE_SENDING_AFTER
+                )
+                .values(status="pending")
+            )
+            await session.execute(
+                delete(OutboxMessage).where(
+                    OutboxMessage.status == "sent",
+                    OutboxMessage.sent_at < datetime.utcnow() - KEEP_SENT_FOR
+                )
+            )
+            await session.commit()
+            if result.rowcount:
+                logger.warning(f"Recovered {result.rowcount} stale outbox messages")
+            break
+
+    async def drain_once(self) -> int:
+        """Отправить одну пачку готовых сообщений; вернуть их количество"""
+        async for session in get_session():
+            now = datetime.utcnow()
+            result = await session.execute(
+                select(OutboxMessage.id)
+                .where(and_(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now))
+                .order_by(OutboxMessage.id)
+                .limit(BATCH_SIZE)
+            )
+            candidate_ids = list(result.scalars().all())
+            if not candidate_ids:
+                return 0
+
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(candidate_ids), OutboxMessage.status == "pending")
+                .values(status="sending", next_attempt_at=now)
+            )
+            await session.commit()
+
+            # Метка времени захвата отличает строки, забранные этим проходом
+            result = await session.execute(
+                select(OutboxMessage).where(
+                    OutboxMessage.id.in_(candidate_ids),
+                    OutboxMessage.status == "sending",
+                    OutboxMessage.next_attempt_at == now
+                )
+            )
+            messages = list(result.scalars().all())
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def send(message: OutboxMessage):
+                async with semaphore:
+                    await self._deliver(message)
+
+            await asyncio.gather(*(send(message) for message in messages))
+            await session.commit()
+            return len(messages)
+        return 0
+
+    async def _deliver(self, message: OutboxMessage):
+        """Отправить одно сообщение и обновить его статус (без commit)"""
+        await self.rate_limiter.acquire()
+        message.attempts += 1
+        try:
+            reply_markup = None
+            if message.reply_markup:
+                reply_markup = InlineKeyboardMarkup.model_validate_json(message.reply_markup)
+            await self._bot.send_message(
+                chat_id=message.chat_id,
+                text=message.text,
+                reply_markup=reply_markup,
+                parse_mode="HTML"
+            )
+            message.status = "sent"
+            message.sent_at = datetime.utcnow()
+            message.last_error = None
+        except TelegramRetryAfter as e:
+            # Флуд-контроль — не ошибка сообщения, попытку не засчитываем
+            message.attempts -= 1
+            self._retry(message, timedelta(seconds=e.retry_after), str(e))
+        except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError) as e:
+            self._retry(message, timedelta(seconds=min(2 ** message.attempts, 600)), str(e))
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            message.status = "failed"
+            message.last_error = str(e)
+            logger.warning(f"Outbox message {message.id} to {message.chat_id} rejected: {e}")
+        except Exception as e:
+            self._retry(message, timedelta(seconds=min(2 ** message.attempts, 600)), str(e))
+            logger.error(f"Error sending outbox message {message.id}: {e}", exc_info=True)
+
+    @staticmethod
+    def _retry(message: OutboxMessage, delay: timedelta, error: str):
+        message.last_error = error
+        if message.attempts >= MAX_ATTEMPTS:
+            message.status = "failed"
+            logger.error(f"Outbox message {message.id} failed after {message.attempts} attempts: {error}")
+        else:
+            message.status = "pending"
+            message.next_attempt_at = datetime.utcnow() + delay
+
+
+outbox_sender = OutboxSender()
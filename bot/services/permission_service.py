@@ -0,0 +1,195 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, and_
+from bot.database.models import User, TeamMembership
+from bot.config import settings
+from bot.services.inline_cache import inline_cache
+from bot.services.time_service import time_zones
+from typing import Dict, FrozenSet, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLE_ADMIN = "admin"
+ROLE_TEAM_LEAD = "team_lead"
+ROLE_MANAGER = "manager"
+ROLES = (ROLE_ADMIN, ROLE_TEAM_LEAD, ROLE_MANAGER)
+
+
+def managers_filter():
+    """Условие для запросов «пользователь — менеджер».
+
+    Администраторы из конфигурации хранятся в БД с ролью manager (роль
+    накладывается индексом), поэтому исключаются по Telegram ID.
+    """
+    return and_(User.role == ROLE_MANAGER, User.telegram_id.notin_(settings.admin_ids))
+
+
+class PermissionIndex:
+    """In-memory индекс ролей и команд.
+
+    Все проверки — поиск в dict/frozenset без запросов к БД. Индекс
+    пересобирается целиком при любом изменении ролей и подменяется
+    одной операцией присваивания, поэтому читатели никогда не видят
+    частично обновлённое состояние.
+    """
+
+    def __init__(self):
+        self._roles: Dict[int, str] = {tg_id: ROLE_ADMIN for tg_id in settings.admin_ids}
+        self._teams: Dict[int, FrozenSet[int]] = {}
+        self._leads_by_manager: Dict[int, FrozenSet[int]] = {}
+
+    async def rebuild(self, session: AsyncSession):
+        """Пересобрать индекс из БД"""
+        result = await session.execute(
+            select(User.id, User.telegram_id, User.role).where(User.role != ROLE_MANAGER)
+        )
+        roles: Dict[int, str] = {}
+        lead_tg_by_user_id: Dict[int, int] = {}
+        for row in result.all():
+            roles[row.telegram_id] = row.role
+            if row.role == ROLE_TEAM_LEAD:
+                lead_tg_by_user_id[row.id] = row.telegram_id
+        
+        # Администраторы из конфигурации всегда имеют полный доступ
+        for tg_id in settings.admin_ids:
+            roles[tg_id] = ROLE_ADMIN
+        
+        result = await session.execute(select(TeamMembership.lead_id, TeamMembership.manager_id))
+        teams: Dict[int, set] = {}
+        for row in result.all():
+            lead_tg = lead_tg_by_user_id.get(row.lead_id)
+            if lead_tg is not None:
+                teams.setdefault(lead_tg, set()).add(row.manager_id)
+        
+        leads_by_manager: Dict[int, set] = {}
+        for lead_tg, manager_ids in teams.items():
+            for manager_id in manager_ids:
+                leads_by_manager.setdefault(manager_id, set()).add(lead_tg)
+        
+        self._roles = roles
+        self._teams = {lead_tg: frozenset(ids) for lead_tg, ids in teams.items()}
+        self._leads_by_manager = {manager_id: frozenset(ids) for manager_id, ids in leads_by_manager.items()}
+        logger.debug(f"Permission index rebuilt: {len(roles)} privileged users, {len(self._teams)} teams")
+
+    def role_of(self, telegram_id: int) -> str:
+        """Роль пользователя по Telegram ID"""
+        return self._roles.get(telegram_id, ROLE_MANAGER)
+
+    def is_admin(self, telegram_id: int) -> bool:
+        return self._roles.get(telegram_id) == ROLE_ADMIN
+
+    def is_team_lead(self, telegram_id: int) -> bool:
+        return self._roles.get(telegram_id) == ROLE_TEAM_LEAD
+
+    def is_staff(self, telegram_id: int) -> bool:
+        """Администратор или руководитель группы"""
+        return telegram_id in self._roles
+
+    def admin_ids(self) -> FrozenSet[int]:
+        """Telegram ID всех администраторов"""
+        return frozenset(tg_id for tg_id, role in self._roles.items() if role == ROLE_ADMIN)
+
+    def lead_ids_for(self, manager_id: int) -> FrozenSet[int]:
+        """Telegram ID руководителей, в команде которых состоит менеджер (users.id)"""
+        return self._leads_by_manager.get(manager_id, frozenset())
+
+    def managed_ids(self, telegram_id: int) -> Optional[FrozenSet[int]]:
+        """ID менеджеров (users.id), доступных пользователю; None — доступны все"""
+        if self.is_admin(telegram_id):
+            return None
+        return self._teams.get(telegram_id, frozenset())
+
+    def can_manage(self, telegram_id: int, manager_id: int) -> bool:
+        """Может ли пользователь управлять задачами менеджера"""
+        if self.is_admin(telegram_id):
+            return True
+        return manager_id in self._teams.get(telegram_id, frozenset())
+
+
+permission_index = PermissionIndex()
+
+
+class PermissionService:
+    @staticmethod
+    async def release_config_admins(session: AsyncSession) -> int:
+        """Снять сохранённую в БД роль admin с администраторов из конфигурации.
+
+        Раньше она записывалась при регистрации, и удаление ID из
+        конфигурации не лишало прав. Теперь права таких администраторов
+        держатся только на конфигурации (наложение в PermissionIndex).
+        """
+        result = await session.execute(
+            update(User)
+            .where(User.role == ROLE_ADMIN, User.telegram_id.in_(settings.admin_ids))
+            .values(role=ROLE_MANAGER)
+        )
+        await session.commit()
+        if result.rowcount:
+            logger.info(f"Released stored admin role of {result.rowcount} configured admins")
+        return result.rowcount
+
+    @staticmethod
+    async def set_role(session: AsyncSession, telegram_id: int, role: str) -> Optional[User]:
+        """Назначить роль пользователю"""
+        if role not in ROLES:
+            raise ValueError(f"Unknown role: {role}")
+        
+        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+        user = result.scalar_one_or_none()
+        if not user:
+            return None
+        
+        user.role = role
+        if role != ROLE_TEAM_LEAD:
+            await session.execute(delete(TeamMembership).where(TeamMembership.lead_id == user.id))
+        await session.commit()
+        await permission_index.rebuild(session)
+        inline_cache.invalidate()
+        logger.info(f"User {telegram_id} role set to {role}")
+        return user
+    
+    @staticmethod
+    async def add_team_member(session: AsyncSession, lead_telegram_id: int, manager_telegram_id: int) -> bool:
+        """Добавить менеджера в команду руководителя"""
+        result = await session.execute(
+            select(User).where(User.telegram_id.in_([lead_telegram_id, manager_telegram_id]))
+        )
+        users = {user.telegram_id: user for user in result.scalars().all()}
+        lead = users.get(lead_telegram_id)
+        manager = users.get(manager_telegram_id)
+        if not lead or not manager or lead.role != ROLE_TEAM_LEAD:
+            return False
+        
+        existing = await session.execute(
+            select(TeamMembership.id).where(
+                TeamMembership.lead_id == lead.id,
+                TeamMembership.manager_id == manager.id
+            )
+        )
+        if existing.scalar_one_or_none() is None:
+            session.add(TeamMembership(lead_id=lead.id, manager_id=manager.id))
+            await session.commit()
+            await permission_index.rebuild(session)
+            await time_zones.rebuild(session)
+            inline_cache.invalidate()
+            logger.info(f"Manager {manager_telegram_id} added to team of {lead_telegram_id}")
+        return True
+    
+    @staticmethod
+    async def remove_team_member(session: AsyncSession, lead_telegram_id: int, manager_telegram_id: int) -> bool:
+        """Убрать менеджера из команды руководителя"""
+        lead_id = select(User.id).where(User.telegram_id == lead_telegram_id).scalar_subquery()
+        manager_id = select(User.id).where(User.telegram_id == manager_telegram_id).scalar_subquery()
+        result = await session.execute(
+            delete(TeamMembership).where(
+                TeamMembership.lead_id == lead_id,
+                TeamMembership.manager_id == manager_id
+            )
+        )
+        await session.commit()
+        if result.rowcount:
+            await permission_index.rebuild(session)
+            await time_zones.rebuild(session)
+            inline_cache.invalidate()
+            logger.info(f"Manager {manager_telegram_id} removed from team of {lead_telegram_id}")
+        return bool(result.rowcount)
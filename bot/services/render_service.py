@@ -0,0 +1,173 @@
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Отпечаток показанного сообщения: (текст и режим разметки, клавиатура)
+Rendered = Tuple[Optional[int], Optional[int]]
+# Содержимое сообщения из апдейта: (текст в режиме разметки, клавиатура)
+Snapshot = Tuple[str, Optional[int]]
+
+
+class _Entry(NamedTuple):
+    rendered: Rendered
+    # Отпечаток содержимого сообщения из апдейта, поверх которого показан rendered
+    base: Optional[int]
+
+
+def _markup_digest(reply_markup: Optional[InlineKeyboardMarkup]) -> Optional[int]:
+    if reply_markup is None:
+        return None
+    return hash(reply_markup.model_dump_json(exclude_none=True))
+
+
+def _text_digest(text: str, parse_mode: Optional[str]) -> int:
+    # Telegram обрезает пробелы по краям, такие тексты показываются одинаково
+    return hash((text.strip(), parse_mode))
+
+
+def _parse_mode(message: Message, kwargs: dict) -> Optional[str]:
+    if "parse_mode" in kwargs:
+        return kwargs["parse_mode"]
+    bot = message.bot
+    return bot.default["parse_mode"] if bot is not None else None
+
+
+def _base(snapshot: Optional[Snapshot], entry: Optional[_Entry]) -> Optional[int]:
+    """Отпечаток содержимого, поверх которого показывается новое"""
+    if snapshot is not None:
+        return hash(snapshot)
+    return entry.base if entry is not None else None
+
+
+class MessageRenderer:
+    """Редактирование сообщений без лишних запросов к Telegram.
+
+    Для каждого (чат, id сообщения) запоминается отпечаток последнего
+    показанного текста и клавиатуры (LRU на maxsize сообщений). Если
+    новое содержимое совпадает с показанным, запрос не отправляется;
+    если изменилась только клавиатура — отправляется editMessageReplyMarkup.
+
+    Источник правды — содержимое сообщения, пришедшее с callback-запросом.
+    Кэш используется, только если сообщение из апдейта то же, поверх
+    которого было последнее редактирование (повторное редактирование в
+    одном обработчике), или если содержимое недоступно (слишком старое
+    сообщение).
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._rendered: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.edits = 0
+        self.markup_edits = 0
+        self.skipped = 0
+
+    async def edit(
+        self,
+        message: Message,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        **kwargs
+    ) -> bool:
+        """Показать text и reply_markup в сообщении; False — уже показано"""
+        key = (message.chat.id, message.message_id)
+        parse_mode = _parse_mode(message, kwargs)
+        rendered = (_text_digest(text, parse_mode), _markup_digest(reply_markup))
+        snapshot = self._snapshot(message, parse_mode)
+        entry = self._cached(key, snapshot)
+        if entry is not None:
+            shown = entry.rendered
+        elif snapshot is not None:
+            shown_text, shown_markup = snapshot
+            text_digest = rendered[0] if shown_text.strip() == text.strip() else None
+            shown = (text_digest, shown_markup)
+        else:
+            shown = (None, None)
+        base = _base(snapshot, entry)
+
+        if shown == rendered:
+            self.skipped += 1
+            self._remember(key, rendered, base)
+            return False
+
+        if shown[0] == rendered[0]:
+            await self._send(key, message.edit_reply_markup(reply_markup=reply_markup))
+            self.markup_edits += 1
+        else:
+            await self._send(key, message.edit_text(text, reply_markup=reply_markup, **kwargs))
+            self.edits += 1
+        self._remember(key, rendered, base)
+        return True
+
+    async def edit_reply_markup(
+        self,
+        message: Message,
+        reply_markup: Optional[InlineKeyboardMarkup] = None
+    ) -> bool:
+        """Заменить только клавиатуру; False — она уже показана"""
+        key = (message.chat.id, message.message_id)
+        snapshot = self._snapshot(message, _parse_mode(message, {}))
+        entry = self._cached(key, snapshot)
+        if entry is not None:
+            shown = entry.rendered
+        else:
+            shown = (None, _markup_digest(getattr(message, "reply_markup", None)))
+        rendered = (shown[0], _markup_digest(reply_markup))
+
+        if shown[1] == rendered[1]:
+            self.skipped += 1
+            return False
+
+        await self._send(key, message.edit_reply_markup(reply_markup=reply_markup))
+        self.markup_edits += 1
+        self._remember(key, rendered, _base(snapshot, entry))
+        return True
+
+    def forget(self, chat_id: int, message_id: int):
+        """Забыть отпечаток (сообщение изменено или удалено в обход рендерера)"""
+        self._rendered.pop((chat_id, message_id), None)
+
+    async def _send(self, key: Hashable, request):
+        try:
+            await request
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                # Показанное уже совпадает с новым, отпечаток можно запомнить
+                logger.debug(f"Message {key} is not modified")
+                return
+            self._rendered.pop(key, None)
+            raise
+
+    def _cached(self, key: Hashable, snapshot: Optional[Snapshot]) -> Optional[_Entry]:
+        """Запись кэша, если она новее содержимого сообщения из апдейта"""
+        entry = self._rendered.get(key)
+        if entry is None:
+            return None
+        if snapshot is None or hash(snapshot) == entry.base:
+            return entry
+        return None
+
+    def _remember(self, key: Hashable, rendered: Rendered, base: Optional[int]):
+        self._rendered[key] = _Entry(rendered, base)
+        self._rendered.move_to_end(key)
+        if len(self._rendered) > self.maxsize:
+            self._rendered.popitem(last=False)
+
+    @staticmethod
+    def _snapshot(message: Message, parse_mode: Optional[str]) -> Optional[Snapshot]:
+        """Содержимое, пришедшее вместе с callback-запросом; None — недоступно"""
+        # У недоступного (слишком старого) сообщения содержимого нет
+        if getattr(message, "text", None) is None:
+            return None
+        shown_text = message.html_text if parse_mode == "HTML" else message.text
+        return shown_text, _markup_digest(getattr(message, "reply_markup", None))
+
+    def __len__(self) -> int:
+        return len(self._rendered)
+
+
+# Общий рендерер сообщений с кнопками
+message_renderer = MessageRenderer()
@@ -0,0 +1,274 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert, func, and_, or_
+from sqlalchemy.orm import selectinload
+from bot.database.models import ManagerReport, Task, User
+from bot.services.outbox_service import OutboxService, outbox_sender
+from bot.services.permission_service import permission_index
+from bot.services.task_event_service import TaskEventService, EVENT_RESCHEDULED
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Collection, Dict, List, Optional, Tuple
+import html
+import logging
+
+logger = logging.getLogger(__name__)
+
+PERIOD_DAILY = "daily"
+PERIOD_WEEKLY = "weekly"
+PERIOD_LENGTH = {
+    PERIOD_DAILY: timedelta(days=1),
+    PERIOD_WEEKLY: timedelta(days=7),
+}
+PERIOD_TITLES = {
+    PERIOD_DAILY: "за день",
+    PERIOD_WEEKLY: "за неделю",
+}
+# Ограничение длины сообщения Telegram: остальные менеджеры — одной строкой
+MAX_RENDERED_ROWS = 20
+
+
+def period_bounds(period: str, day: date) -> Tuple[datetime, datetime]:
+    """Начало и конец периода, содержащего день (неделя начинается с понедельника)"""
+    if period == PERIOD_WEEKLY:
+        day = day - timedelta(days=day.weekday())
+    start = datetime.combine(day, time.min)
+    return start, start + PERIOD_LENGTH[period]
+
+
+@dataclass
+class _Accumulator:
+    due: int = 0
+    completed: int = 0
+    completed_on_time: int = 0
+    lateness_hours: float = 0.0
+    reschedules: int = 0
+    overdue_backlog: int = 0
+
+    def as_row(self) -> Dict:
+        late = self.completed - self.completed_on_time
+        return {
+            "due": self.due,
+            "completed": self.completed,
+            "completed_on_time": self.completed_on_time,
+            "on_time_rate": round(self.completed_on_time / self.completed * 100, 2) if self.completed else None,
+            "avg_lateness_hours": round(self.lateness_hours / late, 2) if late else None,
+            "reschedules": self.reschedules,
+            "overdue_backlog": self.overdue_backlog,
+        }
+
+
+class ReportService:
+    @staticmethod
+    async def build_report(session: AsyncSession, period: str, period_start: datetime) -> int:
+        """Посчитать KPI менеджеров за период и сохранить их в manager_reports.
+
+        Все показатели собираются за один проход по задачам, затронутым
+        периодом: дедлайн в периоде, выполнение в периоде или висящая на
+        конец периода просрочка. Переносы берутся из журнала событий.
+        Повторный расчёт того же периода заменяет прежние строки.
+        Возвращает число строк.
+        """
+        period_end = period_start + PERIOD_LENGTH[period]
+
+        def in_period(column):
+            return and_(column >= period_start, column < period_end)
+
+        result = await session.execute(
+            select(
+                Task.manager_id,
+                Task.deadline,
+                Task.status,
+                Task.completed_at
+            ).where(
+                or_(
+                    in_period(Task.deadline),
+                    in_period(Task.completed_at),
+                    and_(Task.status == "active", Task.deadline < period_end),
+                    and_(Task.deadline < period_end, Task.completed_at >= period_end)
+                )
+            )
+        )
+
+        stats: Dict[int, _Accumulator] = {}
+        for row in result.all():
+            acc = stats.setdefault(row.manager_id, _Accumulator())
+            if period_start <= row.deadline < period_end:
+                acc.due += 1
+            if row.completed_at is not None and period_start <= row.completed_at < period_end:
+                acc.completed += 1
+                if row.completed_at <= row.deadline:
+                    acc.completed_on_time += 1
+                else:
+                    acc.lateness_hours += (row.completed_at - row.deadline).total_seconds() / 3600
+            if row.deadline < period_end and (
+                row.status == "active"
+                or (row.status == "completed" and row.completed_at is not None and row.completed_at >= period_end)
+            ):
+                acc.overdue_backlog += 1
+
+        reschedules = await TaskEventService.count_by_manager(
+            session, EVENT_RESCHEDULED, since=period_start, until=period_end
+        )
+        for manager_id, count in reschedules.items():
+            stats.setdefault(manager_id, _Accumulator()).reschedules = count
+
+        await session.execute(
+            delete(ManagerReport).where(
+                ManagerReport.period == period,
+                ManagerReport.period_start == period_start
+            )
+        )
+        now = datetime.utcnow()
+        rows = [
+            {
+                "period": period,
+                "period_start": period_start,
+                "manager_id": manager_id,
+                "created_at": now,
+                **acc.as_row(),
+            }
+            for manager_id, acc in stats.items()
+        ]
+        if rows:
+            await session.execute(insert(ManagerReport), rows)
+        await session.commit()
+        logger.info(f"Built {period} report for {period_start:%Y-%m-%d}: {len(rows)} managers")
+        return len(rows)
+
+    @staticmethod
+    async def get_report(
+        session: AsyncSession,
+        period: str,
+        period_start: datetime,
+        manager_ids: Optional[Collection[int]] = None
+    ) -> List[ManagerReport]:
+        """Сохранённые строки отчёта за период (лучшие по доле выполнения в срок первыми)"""
+        query = (
+            select(ManagerReport)
+            .options(selectinload(ManagerReport.manager))
+            .where(ManagerReport.period == period, ManagerReport.period_start == period_start)
+        )
+        if manager_ids is not None:
+            query = query.where(ManagerReport.manager_id.in_(manager_ids))
+        result = await session.execute(query)
+        reports = list(result.scalars().all())
+        reports.sort(key=lambda r: (r.on_time_rate or 0, r.completed, -r.overdue_backlog), reverse=True)
+        return reports
+
+    @staticmethod
+    async def get_adjacent_periods(
+        session: AsyncSession,
+        period: str,
+        period_start: datetime
+    ) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Ближайшие более ранний и более поздний периоды, по которым есть отчёты"""
+        previous = (await session.execute(
+            select(func.max(ManagerReport.period_start)).where(
+                ManagerReport.period == period, ManagerReport.period_start < period_start
+            )
+        )).scalar()
+        following = (await session.execute(
+            select(func.min(ManagerReport.period_start)).where(
+                ManagerReport.period == period, ManagerReport.period_start > period_start
+            )
+        )).scalar()
+        return previous, following
+
+    @staticmethod
+    async def get_latest_period(session: AsyncSession, period: str) -> Optional[datetime]:
+        """Последний период, по которому построен отчёт"""
+        result = await session.execute(
+            select(func.max(ManagerReport.period_start)).where(ManagerReport.period == period)
+        )
+        return result.scalar()
+
+    @staticmethod
+    async def send_digest(session: AsyncSession, period: str, period_start: datetime) -> int:
+        """Поставить в outbox дайджест отчёта: администраторам — полный,
+        руководителям групп — по своей команде. Возвращает число сообщений.
+        """
+        reports = await ReportService.get_report(session, period, period_start)
+        if not reports:
+            return 0
+
+        recipients: Dict[int, List[ManagerReport]] = {chat_id: reports for chat_id in permission_index.admin_ids()}
+        for report in reports:
+            for lead_tg in permission_index.lead_ids_for(report.manager_id):
+                if lead_tg not in permission_index.admin_ids():
+                    recipients.setdefault(lead_tg, []).append(report)
+
+        dedup_prefix = f"report:{period}:{period_start:%Y-%m-%d}"
+        messages = [
+            {
+                "chat_id": chat_id,
+                "text": render_report(period, period_start, chat_reports),
+                "dedup_key": f"{dedup_prefix}:{chat_id}",
+            }
+            for chat_id, chat_reports in recipients.items()
+        ]
+        await OutboxService.enqueue(session, messages)
+        await session.commit()
+        outbox_sender.wake()
+        return len(messages)
+
+    @staticmethod
+    async def build_due_reports(session: AsyncSession, today: Optional[date] = None):
+        """Построить и разослать отчёт за вчера и, если пора, за прошлую неделю.
+
+        Периоды — сутки по UTC, поэтому и «сегодня» берётся по UTC;
+        задание manager_reports запускается по UTC-расписанию.
+        """
+        today = today or datetime.utcnow().date()
+        yesterday = today - timedelta(days=1)
+
+        daily_start, _ = period_bounds(PERIOD_DAILY, yesterday)
+        await ReportService.build_report(session, PERIOD_DAILY, daily_start)
+        await ReportService.send_digest(session, PERIOD_DAILY, daily_start)
+
+        # Неделя считается в понедельник; если бот был остановлен, —
+        # при первом запуске, пока за прошлую неделю нет строк
+        weekly_start, _ = period_bounds(PERIOD_WEEKLY, today - timedelta(days=7))
+        has_weekly = (await session.execute(
+            select(ManagerReport.id).where(
+                ManagerReport.period == PERIOD_WEEKLY,
+                ManagerReport.period_start == weekly_start
+            ).limit(1)
+        )).scalar() is not None
+        if today.weekday() == 0 or not has_weekly:
+            await ReportService.build_report(session, PERIOD_WEEKLY, weekly_start)
+            await ReportService.send_digest(session, PERIOD_WEEKLY, weekly_start)
+
+
+def _manager_name(manager: Optional[User]) -> str:
+    if manager is None:
+        return "—"
+    return manager.first_name or manager.username or f"ID: {manager.telegram_id}"
+
+
+def render_report(period: str, period_start: datetime, reports: List[ManagerReport]) -> str:
+    """Текст отчёта по сохранённым строкам"""
+    if period == PERIOD_WEEKLY:
+        period_end = period_start + PERIOD_LENGTH[period] - timedelta(days=1)
+        title = f"{period_start:%d.%m}–{period_end:%d.%m.%Y}"
+    else:
+        title = f"{period_start:%d.%m.%Y}"
+
+    text = f"📈 <b>ОТЧЁТ {PERIOD_TITLES[period].upper()}: {title}</b>\n\n"
+    if not reports:
+        return text + "Нет данных за этот период."
+
+    for report in reports[:MAX_RENDERED_ROWS]:
+        on_time = f"{report.on_time_rate}%" if report.on_time_rate is not None else "—"
+        text += (
+            f"👤 <b>{html.escape(_manager_name(report.manager))}</b>\n"
+            f"   📅 Срок в периоде: {report.due} | ✅ Выполнено: {report.completed}\n"
+            f"   ⏱ В срок: {on_time}"
+        )
+        if report.avg_lateness_hours is not None:
+            text += f" | опоздание в среднем {report.avg_lateness_hours} ч"
+        text += (
+            f"\n   🔄 Переносов: {report.reschedules} | 🔴 Просрочено: {report.overdue_backlog}\n\n"
+        )
+    if len(reports) > MAX_RENDERED_ROWS:
+        text += f"…и ещё {len(reports) - MAX_RENDERED_ROWS} менеджеров"
+    return text
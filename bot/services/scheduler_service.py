@@ -1,46 +1,44 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
+from apscheduler.triggers.interval import IntervalTrigger
+from datetime import datetime, timedelta, timezone
+from bot.config import settings
 from bot.database.database import get_session
 from bot.services.task_service import TaskService
 from bot.services.file_service import FileService
+from bot.services.template_service import TemplateService
+from bot.services.lease_service import LeaseService
+from bot.services.report_service import ReportService
+from bot.services.export_service import ExportService, BI_EXPORT_JOB
+from bot.services.permission_service import permission_index
+from bot.services.time_service import time_zones, default_zone
 from aiogram import Bot
+from typing import Awaitable, Callable, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Насколько назад искать последнее срабатывание: все задания — не реже раза в сутки
+FIRE_LOOKBACK = timedelta(days=2)
+
+
+def _last_fire_time(trigger: CronTrigger, now: datetime) -> Optional[datetime]:
+    """Последнее срабатывание расписания не позже now, naive UTC"""
+    last = None
+    fire = trigger.get_next_fire_time(None, now - FIRE_LOOKBACK)
+    while fire is not None and fire <= now:
+        last = fire
+        fire = trigger.get_next_fire_time(fire, fire + timedelta(microseconds=1))
+    if last is None:
+        return None
+    return last.astimezone(timezone.utc).replace(tzinfo=None)
+
 
 class SchedulerService:
     def __init__(self, bot: Bot):
         self.bot = bot
-        self.scheduler = AsyncIOScheduler()
-    
-    async def send_deadline_reminders(self):
-        """Отправка напоминаний о дедлайнах"""
-        async for session in get_session():
-            tasks = await TaskService.get_tasks_due_today(session)
-            
-            for task in tasks:
-                try:
-                    manager = task.manager
-                    if manager:
-                        message = (
-                            f"⏰ <b>Напоминание о дедлайне!</b>\n\n"
-                            f"📌 <b>Задача:</b> {task.text}\n"
-                            f"📅 <b>Дедлайн:</b> {task.deadline.strftime('%d.%m.%Y %H:%M')}\n\n"
-                            f"Пожалуйста, отметьте выполнение задачи."
-                        )
-                        
-                        from bot.keyboards.manager_keyboards import get_task_actions_keyboard
-                        await self.bot.send_message(
-                            chat_id=manager.telegram_id,
-                            text=message,
-                            reply_markup=get_task_actions_keyboard(task.id),
-                            parse_mode="HTML"
-                        )
-                        logger.info(f"Sent deadline reminder for task {task.id} to {manager.telegram_id}")
-                except Exception as e:
-                    logger.error(f"Error sending reminder for task {task.id}: {e}")
+        # Расписание — по часовому поясу команды, а не сервера
+        self.scheduler = AsyncIOScheduler(timezone=default_zone())
     
     async def auto_cleanup_completed_tasks(self):
         """Автоматическая очистка выполненных задач (если прошло 7 дней с последней очистки)"""
@@ -48,7 +46,6 @@ class SchedulerService:
             try:
                 from bot.database.models import CleanupLog
                 from sqlalchemy import select
-                from datetime import timedelta
                 
                 # Проверяем последнюю очистку
                 result = await session.execute(select(CleanupLog).order_by(CleanupLog.id.desc()).limit(1))
@@ -98,22 +95,123 @@ class SchedulerService:
                     logger.info(f"Skipping auto-cleanup, last cleanup was recent")
             except Exception as e:
                 logger.error(f"Error in auto-cleanup: {e}", exc_info=True)
+                # Ошибка пробрасывается: run_exclusive вернёт срабатывание, и его повторит
+                # догоняющая проверка
+                raise
+    
+    async def expand_task_templates(self):
+        """Создание задач по шаблонам повторяющихся задач на горизонт вперёд"""
+        async for session in get_session():
+            try:
+                await TemplateService.expand_templates(session)
+            except Exception as e:
+                logger.error(f"Error expanding task templates: {e}", exc_info=True)
+                raise
+            break
+    
+    async def build_reports(self):
+        """Ежедневный и еженедельный отчёты по менеджерам с рассылкой дайджеста"""
+        async for session in get_session():
+            try:
+                await ReportService.build_due_reports(session)
+            except Exception as e:
+                logger.error(f"Error building reports: {e}", exc_info=True)
+                raise
+            break
+    
+    async def export_for_bi(self):
+        """Инкрементальная выгрузка изменённых строк для BI"""
+        async for session in get_session():
+            try:
+                await ExportService.export_all(session)
+            except Exception as e:
+                logger.error(f"Error exporting data for BI: {e}", exc_info=True)
+                raise
+            break
+    
+    def _periodic_jobs(self) -> List[Tuple[str, Callable[[], Awaitable[None]], CronTrigger]]:
+        """Периодические задания: (id, функция, расписание)"""
+        zone = default_zone()
+        return [
+            # Проверяем каждые 24 часа, нужно ли делать автоматическую очистку
+            ("auto_cleanup", self.auto_cleanup_completed_tasks, CronTrigger(hour=3, minute=0, timezone=zone)),
+            # Одна задача на все шаблоны вместо отдельного job на каждое повторение
+            ("expand_task_templates", self.expand_task_templates, CronTrigger(minute=5, timezone=zone)),
+            # Периоды отчётов — сутки и недели по UTC (period_bounds), поэтому
+            # и запуск — после полуночи UTC, когда вчерашние сутки закрыты
+            ("manager_reports", self.build_reports, CronTrigger(hour=0, minute=15, timezone=timezone.utc)),
+            (BI_EXPORT_JOB, self.export_for_bi, CronTrigger(hour=2, minute=0, timezone=zone)),
+        ]
+    
+    async def refresh_indexes(self):
+        """Перечитать индексы ролей и часовых поясов.
+
+        Индексы живут в памяти процесса; периодическая пересборка доносит
+        до экземпляра изменения, сделанные на других экземплярах.
+        """
+        async for session in get_session():
+            await permission_index.rebuild(session)
+            await time_zones.rebuild(session)
+            break
+    
+    async def run_scheduled(self, job_id: str, func: Callable[[], Awaitable[None]], trigger: CronTrigger):
+        """Выполнить последнее наступившее срабатывание задания под арендой"""
+        fire_time = _last_fire_time(trigger, datetime.now(timezone.utc))
+        await LeaseService.run_exclusive(job_id, func, fire_time)
+    
+    async def catch_up_missed_runs(self):
+        """Один раз выполнить задания, пропущенные, пока бот был остановлен"""
+        now = datetime.now(timezone.utc)
+        for job_id, func, trigger in self._periodic_jobs():
+            fire_time = _last_fire_time(trigger, now)
+            if fire_time is None:
+                continue
+            async for session in get_session():
+                last_run = await LeaseService.get_last_run(session, job_id)
+                break
+            if last_run is None:
+                # Первый запуск на этой БД — догонять нечего
+                missed = job_id == "expand_task_templates"
+            else:
+                missed = last_run < fire_time
+            if missed:
+                # Срабатывание занимается условным UPDATE: если другой экземпляр
+                # уже выполнил его, run_exclusive пропустит запуск
+                logger.info(f"Catching up missed run of job {job_id} at {fire_time} (last run: {last_run})")
+                try:
+                    await LeaseService.run_exclusive(job_id, func, fire_time)
+                except Exception:
+                    # Ошибка уже в логе; остальные задания догоняются независимо
+                    continue
     
     def start(self):
         """Запуск планировщика"""
+        # Каждое задание выполняется под арендой в БД: при нескольких
+        # экземплярах бота его запускает только один из них
+        for job_id, func, trigger in self._periodic_jobs():
+            self.scheduler.add_job(
+                self.run_scheduled,
+                trigger,
+                args=[job_id, func, trigger],
+                id=job_id,
+                replace_existing=True,
+                coalesce=True,
+                misfire_grace_time=3600
+            )
+        
+        # Индексы нужны каждому экземпляру, поэтому без аренды
         self.scheduler.add_job(
-            self.send_deadline_reminders,
-            CronTrigger(hour=9, minute=0),
-            id="deadline_reminders",
-            replace_existing=True
+            self.refresh_indexes,
+            IntervalTrigger(seconds=settings.INDEX_REFRESH_SECONDS),
+            id="refresh_indexes",
+            replace_existing=True,
+            coalesce=True
         )
         
-        # Проверяем каждые 24 часа, нужно ли делать автоматическую очистку
         self.scheduler.add_job(
-            self.auto_cleanup_completed_tasks,
-            CronTrigger(hour=3, minute=0),  # Каждый день в 3:00
-            id="auto_cleanup",
-            replace_existing=True
+            self.catch_up_missed_runs,
+            id="catch_up_missed_runs",
+            next_run_time=datetime.now(timezone.utc)
         )
         
         self.scheduler.start()
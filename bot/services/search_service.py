@@ -0,0 +1,92 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, or_, table, column, literal_column
+from sqlalchemy.orm import selectinload
+from bot.database.database import fulltext_enabled, read_only
+from bot.database.models import Task
+from typing import Collection, List, Optional, Tuple
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_TERMS = 8
+# Дальше точное число совпадений не считается: «найдено 1000+»
+MAX_COUNTED = 1000
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+tasks_fts = table("tasks_fts", column("rowid"), column("tasks_fts"))
+
+
+def query_terms(query: str) -> List[str]:
+    return _TERM_PATTERN.findall(query.lower())[:MAX_QUERY_TERMS]
+
+
+def matches_terms(text: str, terms: List[str]) -> bool:
+    """Та же семантика, что у FTS-запроса, но в памяти: для фильтрации кэша"""
+    words = _TERM_PATTERN.findall(text.lower())
+    *exact, last = terms
+    return all(term in words for term in exact) and any(word.startswith(last) for word in words)
+
+
+def _fts_query(terms: List[str]) -> str:
+    """Все слова запроса обязательны, последнее — по префиксу (поиск по мере ввода)"""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class SearchService:
+    @staticmethod
+    @read_only
+    async def search_tasks(
+        session: AsyncSession,
+        query: str,
+        manager_ids: Optional[Collection[int]] = None,
+        status: Optional[str] = None,
+        limit: int = 10,
+        offset: int = 0
+    ) -> Tuple[List[Task], int]:
+        """Поиск задач по тексту и причине переноса.
+
+        На SQLite используется FTS5 с ранжированием bm25, на остальных
+        бэкендах — регистронезависимый LIKE с сортировкой по дедлайну.
+        ``manager_ids`` и ``status`` ограничивают выдачу.
+        Возвращает страницу задач и число совпадений (не больше MAX_COUNTED).
+        """
+        terms = query_terms(query)
+        if not terms:
+            return [], 0
+
+        if fulltext_enabled() and session.bind.dialect.name == "sqlite":
+            match = tasks_fts.c.tasks_fts.op("MATCH")(_fts_query(terms))
+            base = select(Task).join(tasks_fts, tasks_fts.c.rowid == Task.id).where(match)
+            ordering = (func.bm25(literal_column("tasks_fts")), Task.id.desc())
+        else:
+            conditions = [
+                or_(
+                    func.lower(Task.text).contains(term, autoescape=True),
+                    func.lower(func.coalesce(Task.not_completed_reason, "")).contains(term, autoescape=True)
+                )
+                for term in terms
+            ]
+            base = select(Task).where(*conditions)
+            ordering = (Task.deadline.desc(), Task.id.desc())
+
+        if manager_ids is not None:
+            base = base.where(Task.manager_id.in_(manager_ids))
+        if status is not None:
+            base = base.where(Task.status == status)
+
+        total = (await session.execute(
+            select(func.count()).select_from(base.with_only_columns(Task.id).limit(MAX_COUNTED).subquery())
+        )).scalar_one()
+        if not total or offset >= total:
+            return [], total
+
+        result = await session.execute(
+            base.options(selectinload(Task.manager))
+            .order_by(*ordering)
+            .limit(limit)
+            .offset(offset)
+        )
+        return list(result.scalars().all()), total
@@ -0,0 +1,70 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, func
+from bot.database.models import TaskEvent
+from datetime import datetime
+from typing import Collection, Dict, Iterable, List, Optional
+
+EVENT_CREATED = "created"
+EVENT_RESCHEDULED = "rescheduled"
+EVENT_COMPLETED = "completed"
+EVENT_ARCHIVED = "archived"
+
+
+class TaskEventService:
+    """Журнал событий задач только на добавление.
+
+    Как и outbox, методы записи не делают commit: событие фиксируется
+    в одной транзакции с изменением задачи.
+    """
+
+    @staticmethod
+    async def record(session: AsyncSession, events: Iterable[Dict]):
+        """Добавить события (task_id, manager_id, event_type, old_deadline, new_deadline, reason)"""
+        now = datetime.utcnow()
+        rows = [
+            {
+                "task_id": event["task_id"],
+                "manager_id": event["manager_id"],
+                "event_type": event["event_type"],
+                "old_deadline": event.get("old_deadline"),
+                "new_deadline": event.get("new_deadline"),
+                "reason": event.get("reason"),
+                "created_at": now,
+            }
+            for event in events
+        ]
+        if rows:
+            await session.execute(insert(TaskEvent), rows)
+
+    @staticmethod
+    async def get_task_history(session: AsyncSession, task_id: int) -> List[TaskEvent]:
+        """История задачи в хронологическом порядке"""
+        result = await session.execute(
+            select(TaskEvent)
+            .where(TaskEvent.task_id == task_id)
+            .order_by(TaskEvent.created_at, TaskEvent.id)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def count_by_manager(
+        session: AsyncSession,
+        event_type: str,
+        manager_ids: Optional[Collection[int]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Dict[int, int]:
+        """Число событий типа по менеджерам (по индексу manager_id, event_type, created_at)"""
+        query = (
+            select(TaskEvent.manager_id, func.count(TaskEvent.id))
+            .where(TaskEvent.event_type == event_type)
+            .group_by(TaskEvent.manager_id)
+        )
+        if manager_ids is not None:
+            query = query.where(TaskEvent.manager_id.in_(manager_ids))
+        if since is not None:
+            query = query.where(TaskEvent.created_at >= since)
+        if until is not None:
+            query = query.where(TaskEvent.created_at < until)
+        result = await session.execute(query)
+        return dict(result.all())
@@ -0,0 +1,26 @@
+from typing import Callable, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Слушатель получает users.id затронутых менеджеров; None — затронуты все
+TaskChangeListener = Callable[[Optional[Iterable[int]]], None]
+
+_listeners: List[TaskChangeListener] = []
+
+
+def on_tasks_changed(listener: TaskChangeListener) -> TaskChangeListener:
+    """Подписать in-memory кэш на изменения задач (можно как декоратор)"""
+    _listeners.append(listener)
+    return listener
+
+
+def tasks_changed(manager_ids: Optional[Iterable[int]] = None):
+    """Сообщить кэшам, что задачи менеджеров изменились"""
+    if manager_ids is not None:
+        manager_ids = frozenset(manager_ids)
+    for listener in _listeners:
+        try:
+            listener(manager_ids)
+        except Exception as e:
+            logger.error(f"Error in task change listener {listener!r}: {e}", exc_info=True)
@@ -1,14 +1,68 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, case
+from sqlalchemy import select, update, func, and_, or_, case, insert, literal, Text
 from sqlalchemy.orm import selectinload
-from bot.database.models import Task, User
+from bot.database.database import after_commit, read_only
+from bot.database.models import Task, TaskEvent, User
+from bot.database.types import UTCDateTime
+from bot.services.outbox_service import OutboxService, outbox_sender
+from bot.services.deadline_service import deadline_tracker
+from bot.services.permission_service import managers_filter
+from bot.services.task_hooks import tasks_changed
+from bot.services.time_service import time_zones, format_local, days_ago_start
+from bot.services.task_event_service import (
+    TaskEventService, EVENT_CREATED, EVENT_RESCHEDULED, EVENT_COMPLETED, EVENT_ARCHIVED
+)
+from bot.keyboards.manager_keyboards import get_manager_menu, get_task_actions_keyboard
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Collection, Tuple
+import html
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _new_task_message(text: str, deadline: datetime, zone) -> str:
+    return (
+        f"🆕 <b>Новая задача!</b>\n\n"
+        f"📌 <b>Задача:</b> {html.escape(text)}\n"
+        f"📅 <b>Дедлайн:</b> {format_local(deadline, zone)}"
+    )
+
+
+def _new_tasks_digest(tasks: List[Dict], zone) -> str:
+    lines = [
+        f"📌 {html.escape(task['text'])} (до {format_local(task['deadline'], zone)})"
+        for task in tasks[:20]
+    ]
+    if len(tasks) > 20:
+        lines.append(f"... и ещё {len(tasks) - 20}")
+    return f"🆕 <b>Новые задачи ({len(tasks)}):</b>\n\n" + "\n".join(lines)
+
+
+TRANSITION_APPLIED = "applied"
+# Задача есть, но её статус или версия уже другие (повторное нажатие, другое устройство)
+TRANSITION_CONFLICT = "conflict"
+# Задачи нет или она принадлежит другому менеджеру
+TRANSITION_NOT_FOUND = "not_found"
+
+
+@dataclass
+class TransitionResult:
+    """Итог условного перехода и состояние задачи после него (при конфликте — текущее)"""
+    outcome: str
+    id: int
+    manager_id: Optional[int] = None
+    text: Optional[str] = None
+    deadline: Optional[datetime] = None
+    status: Optional[str] = None
+    version: Optional[int] = None
+
+    @property
+    def applied(self) -> bool:
+        return self.outcome == TRANSITION_APPLIED
+
+
 class TaskService:
     @staticmethod
     async def create_task(
@@ -17,7 +71,7 @@ class TaskService:
         text: str,
         deadline: datetime
     ) -> Task:
-        """Создать новую задачу"""
+        """Создать новую задачу (фиксирует вызывающий код)"""
         task = Task(
             manager_id=manager_id,
             text=text,
@@ -25,11 +79,82 @@ class TaskService:
             status="active"
         )
         session.add(task)
-        await session.commit()
-        await session.refresh(task)
+        await session.flush()
+        await TaskEventService.record(session, [{
+            "task_id": task.id,
+            "manager_id": manager_id,
+            "event_type": EVENT_CREATED,
+            "new_deadline": deadline,
+        }])
+        # Уведомление фиксируется в той же транзакции, что и задача
+        await OutboxService.enqueue_for_user(
+            session,
+            manager_id,
+            _new_task_message(text, deadline, time_zones.zone_for(manager_id)),
+            reply_markup=get_task_actions_keyboard(task.id),
+            dedup_key=f"task_created:{task.id}"
+        )
+        after_commit(session, outbox_sender.wake)
+        after_commit(session, lambda: deadline_tracker.track(task.id, task.deadline))
+        after_commit(session, lambda: tasks_changed([manager_id]))
         logger.info(f"Created task {task.id} for manager {manager_id}")
         return task
     
+    @staticmethod
+    async def create_tasks_bulk(session: AsyncSession, tasks: List[Dict]) -> int:
+        """Создать много задач одной транзакцией.
+
+        ``tasks`` — список словарей с ключами manager_id, text, deadline.
+        Вставка выполняется одним executemany без загрузки объектов обратно,
+        в той же транзакции каждому менеджеру ставится одно сводное уведомление.
+        Commit выполняет вызывающий код.
+        """
+        if not tasks:
+            return 0
+        manager_ids = {task["manager_id"] for task in tasks}
+        result = await session.execute(
+            select(User.id, User.telegram_id).where(User.id.in_(manager_ids))
+        )
+        chat_ids = dict(result.all())
+        now = datetime.utcnow()
+        rows = [
+            {
+                "manager_id": task["manager_id"],
+                "text": task["text"],
+                "deadline": task["deadline"],
+                "status": "active",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for task in tasks
+        ]
+        result = await session.execute(
+            insert(Task).returning(Task.id, Task.manager_id, Task.deadline), rows
+        )
+        await TaskEventService.record(session, [
+            {"task_id": row.id, "manager_id": row.manager_id, "event_type": EVENT_CREATED, "new_deadline": row.deadline}
+            for row in result.all()
+        ])
+        
+        by_manager: Dict[int, List[Dict]] = {}
+        for task in tasks:
+            by_manager.setdefault(task["manager_id"], []).append(task)
+        await OutboxService.enqueue(session, [
+            {
+                "chat_id": chat_ids[manager_id],
+                "text": _new_tasks_digest(manager_tasks, time_zones.zone_for(manager_id)),
+                "reply_markup": get_manager_menu(),
+            }
+            for manager_id, manager_tasks in by_manager.items()
+            if manager_id in chat_ids
+        ])
+        await session.flush()
+        after_commit(session, outbox_sender.wake)
+        after_commit(session, deadline_tracker.request_reload)
+        after_commit(session, lambda: tasks_changed(manager_ids))
+        logger.info(f"Created {len(rows)} tasks in bulk for {len(by_manager)} managers")
+        return len(rows)
+    
     @staticmethod
     async def get_active_tasks_by_manager(session: AsyncSession, manager_id: int) -> List[Task]:
         """Получить активные задачи менеджера"""
@@ -40,6 +165,55 @@ class TaskService:
         )
         return list(result.scalars().all())
     
+    @staticmethod
+    async def get_active_tasks_page(
+        session: AsyncSession,
+        manager_id: int,
+        limit: int,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        backward: bool = False
+    ) -> Tuple[List[Task], bool]:
+        """Страница активных задач менеджера по keyset-курсору (deadline, id).
+
+        Вперёд — задачи после курсора, назад — перед ним. Вместо OFFSET
+        используется индекс по дедлайну, поэтому дальние страницы не
+        дороже первой. Возвращает задачи по возрастанию дедлайна и признак
+        того, что в направлении движения есть ещё задачи.
+        """
+        query = select(Task).where(and_(Task.manager_id == manager_id, Task.status == "active"))
+        if cursor is not None:
+            deadline, task_id = cursor
+            if backward:
+                query = query.where(or_(
+                    Task.deadline < deadline,
+                    and_(Task.deadline == deadline, Task.id < task_id)
+                ))
+            else:
+                query = query.where(or_(
+                    Task.deadline > deadline,
+                    and_(Task.deadline == deadline, Task.id > task_id)
+                ))
+        if backward:
+            query = query.order_by(Task.deadline.desc(), Task.id.desc())
+        else:
+            query = query.order_by(Task.deadline.asc(), Task.id.asc())
+
+        result = await session.execute(query.limit(limit + 1))
+        tasks = list(result.scalars().all())
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+        if backward:
+            tasks.reverse()
+        return tasks, has_more
+    
+    @staticmethod
+    async def count_active_tasks(session: AsyncSession, manager_id: int) -> int:
+        """Число активных задач менеджера"""
+        result = await session.execute(
+            select(func.count(Task.id)).where(and_(Task.manager_id == manager_id, Task.status == "active"))
+        )
+        return result.scalar() or 0
+    
     @staticmethod
     async def get_task_by_id(session: AsyncSession, task_id: int) -> Optional[Task]:
         """Получить задачу по ID"""
@@ -47,50 +221,145 @@ class TaskService:
         return result.scalar_one_or_none()
     
     @staticmethod
-    async def complete_task(session: AsyncSession, task_id: int) -> Optional[Task]:
-        """Отметить задачу как выполненную"""
-        task = await TaskService.get_task_by_id(session, task_id)
-        if task:
-            task.status = "completed"
-            task.completed_at = datetime.utcnow()
-            await session.commit()
-            await session.refresh(task)
+    async def _transition(
+        session: AsyncSession,
+        task_id: int,
+        from_status: str,
+        values: Dict,
+        manager_id: Optional[int] = None,
+        expected_version: Optional[int] = None
+    ) -> TransitionResult:
+        """Условный переход: UPDATE ... WHERE id, status[, manager_id][, version].
+
+        Проверка и запись выполняются одним запросом, поэтому из двух
+        одновременных нажатий применяется только одно. Второй запрос
+        (чтение текущего состояния) выполняется лишь при неудаче.
+        """
+        conditions = [Task.id == task_id, Task.status == from_status]
+        if manager_id is not None:
+            conditions.append(Task.manager_id == manager_id)
+        if expected_version is not None:
+            conditions.append(Task.version == expected_version)
+        result = await session.execute(
+            update(Task)
+            .where(*conditions)
+            .values(**values, version=Task.version + 1, updated_at=datetime.utcnow())
+            .returning(Task.id, Task.manager_id, Task.text, Task.deadline, Task.status, Task.version)
+        )
+        row = result.first()
+        if row is not None:
+            return TransitionResult(TRANSITION_APPLIED, **row._mapping)
+
+        current = (await session.execute(
+            select(Task.id, Task.manager_id, Task.text, Task.deadline, Task.status, Task.version)
+            .where(Task.id == task_id)
+        )).first()
+        if current is None or (manager_id is not None and current.manager_id != manager_id):
+            return TransitionResult(TRANSITION_NOT_FOUND, task_id)
+        return TransitionResult(TRANSITION_CONFLICT, **current._mapping)
+    
+    @staticmethod
+    async def complete_task(
+        session: AsyncSession,
+        task_id: int,
+        manager_id: Optional[int] = None,
+        expected_version: Optional[int] = None
+    ) -> TransitionResult:
+        """Отметить активную задачу как выполненную.
+
+        ``manager_id`` ограничивает переход задачами менеджера,
+        ``expected_version`` — версией, которую видел пользователь.
+        """
+        result = await TaskService._transition(
+            session,
+            task_id,
+            "active",
+            {"status": "completed", "completed_at": datetime.utcnow()},
+            manager_id=manager_id,
+            expected_version=expected_version
+        )
+        if result.applied:
+            await TaskEventService.record(session, [{
+                "task_id": task_id,
+                "manager_id": result.manager_id,
+                "event_type": EVENT_COMPLETED,
+                "old_deadline": result.deadline,
+            }])
+            after_commit(session, lambda: deadline_tracker.forget(task_id))
+            after_commit(session, lambda: tasks_changed([result.manager_id]))
             logger.info(f"Task {task_id} marked as completed")
-        return task
+        return result
     
     @staticmethod
     async def update_task_deadline(
         session: AsyncSession,
         task_id: int,
         new_deadline: datetime,
-        reason: str
-    ) -> Optional[Task]:
-        """Обновить дедлайн задачи"""
-        task = await TaskService.get_task_by_id(session, task_id)
-        if task:
-            task.deadline = new_deadline
-            task.not_completed_reason = reason
-            task.status = "active"
-            task.updated_at = datetime.utcnow()
-            await session.commit()
-            await session.refresh(task)
+        reason: str,
+        manager_id: Optional[int] = None,
+        expected_version: Optional[int] = None
+    ) -> TransitionResult:
+        """Перенести дедлайн активной задачи; перенос с причиной сохраняется в журнал событий.
+
+        Событие со старым дедлайном вставляется INSERT ... SELECT с теми же
+        условиями до UPDATE: строка задачи при этом блокируется (FOR UPDATE
+        в PostgreSQL, единственный писатель в SQLite), так что событие и
+        переход либо применяются оба, либо не применяется ничего.
+        """
+        conditions = [Task.id == task_id, Task.status == "active"]
+        if manager_id is not None:
+            conditions.append(Task.manager_id == manager_id)
+        if expected_version is not None:
+            conditions.append(Task.version == expected_version)
+        await session.execute(
+            insert(TaskEvent).from_select(
+                ["task_id", "manager_id", "event_type", "old_deadline", "new_deadline", "reason", "created_at"],
+                select(
+                    Task.id,
+                    Task.manager_id,
+                    literal(EVENT_RESCHEDULED),
+                    Task.deadline,
+                    literal(new_deadline, UTCDateTime()),
+                    literal(reason, Text()),
+                    literal(datetime.utcnow(), UTCDateTime())
+                ).where(*conditions).with_for_update()
+            )
+        )
+        result = await TaskService._transition(
+            session,
+            task_id,
+            "active",
+            {"deadline": new_deadline, "not_completed_reason": reason, "reminder_stage": 0},
+            manager_id=manager_id,
+            expected_version=expected_version
+        )
+        if result.applied:
+            after_commit(session, lambda: deadline_tracker.track(task_id, new_deadline))
+            after_commit(session, lambda: tasks_changed([result.manager_id]))
             logger.info(f"Task {task_id} deadline updated to {new_deadline}")
-        return task
+        return result
     
     @staticmethod
-    async def get_all_tasks(session: AsyncSession) -> List[Task]:
-        """Получить все задачи"""
-        result = await session.execute(
+    @read_only
+    async def get_all_tasks(
+        session: AsyncSession,
+        manager_ids: Optional[Collection[int]] = None
+    ) -> List[Task]:
+        """Получить все задачи (или задачи указанных менеджеров)"""
+        query = (
             select(Task)
             .options(selectinload(Task.manager))
             .order_by(Task.created_at.desc())
         )
+        if manager_ids is not None:
+            query = query.where(Task.manager_id.in_(manager_ids))
+        result = await session.execute(query)
         return list(result.scalars().all())
     
     @staticmethod
     async def get_completed_tasks_older_than_with_manager(session: AsyncSession, days: int = 7) -> List[Task]:
         """Получить выполненные задачи старше N дней с загруженным менеджером"""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        cutoff_date = days_ago_start(days)
         result = await session.execute(
             select(Task)
             .options(selectinload(Task.manager))
@@ -106,27 +375,13 @@ class TaskService:
         logger.info(f"Found {len(tasks)} completed tasks older than {days} days with manager loaded (cutoff: {cutoff_date})")
         return tasks
     
-    @staticmethod
-    async def get_tasks_due_today(session: AsyncSession) -> List[Task]:
-        """Получить задачи с дедлайном сегодня"""
-        today = datetime.utcnow().date()
-        result = await session.execute(
-            select(Task).where(
-                and_(
-                    func.date(Task.deadline) == today,
-                    Task.status == "active"
-                )
-            )
-        )
-        return list(result.scalars().all())
-    
     @staticmethod
     async def get_completed_tasks_older_than(
         session: AsyncSession,
         days: int = 7
     ) -> List[Task]:
         """Получить выполненные задачи старше N дней"""
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        cutoff_date = days_ago_start(days)
         result = await session.execute(
             select(Task).where(
                 and_(
@@ -147,34 +402,55 @@ class TaskService:
             select(Task).where(Task.id.in_(task_ids))
         )
         tasks = result.scalars().all()
+        await TaskEventService.record(session, [
+            {"task_id": task.id, "manager_id": task.manager_id, "event_type": EVENT_ARCHIVED}
+            for task in tasks
+        ])
         for task in tasks:
             await session.delete(task)
-        await session.commit()
+        await session.flush()
+        task_ids = [task.id for task in tasks]
+        manager_ids = {task.manager_id for task in tasks}
+        
+        def forget_deleted():
+            for task_id in task_ids:
+                deadline_tracker.forget(task_id)
+            tasks_changed(manager_ids)
+        
+        after_commit(session, forget_deleted)
         logger.info(f"Deleted {len(tasks)} tasks")
         return len(tasks)
     
     @staticmethod
-    async def get_manager_statistics(session: AsyncSession) -> List[Dict]:
+    @read_only
+    async def get_manager_statistics(
+        session: AsyncSession,
+        manager_ids: Optional[Collection[int]] = None
+    ) -> List[Dict]:
         """Получить статистику по менеджерам"""
-        result = await session.execute(
+        query = (
             select(
                 User.id,
                 User.first_name,
                 User.username,
                 func.count(Task.id).label("total_tasks"),
-                func.sum(case((Task.status == "completed", 1), else_=0)).label("completed"),
-                func.sum(case((Task.status == "not_completed", 1), else_=0)).label("not_completed")
+                func.sum(case((Task.status == "completed", 1), else_=0)).label("completed")
             )
             .outerjoin(Task, User.id == Task.manager_id)
-            .where(User.role == "manager")
+            .where(managers_filter())
             .group_by(User.id, User.first_name, User.username)
         )
+        if manager_ids is not None:
+            query = query.where(User.id.in_(manager_ids))
+        result = await session.execute(query)
+        # Невыполнение в срок фиксируется переносом дедлайна в журнале событий
+        missed = await TaskEventService.count_by_manager(session, EVENT_RESCHEDULED, manager_ids)
         
         stats = []
         for row in result.all():
             total = row.total_tasks or 0
             completed = int(row.completed or 0)
-            not_completed = int(row.not_completed or 0)
+            not_completed = missed.get(row.id, 0)
             percentage = (completed / total * 100) if total > 0 else 0
             
             stats.append({
@@ -191,9 +467,13 @@ class TaskService:
         return stats
     
     @staticmethod
-    async def get_detailed_manager_statistics(session: AsyncSession) -> List[Dict]:
+    @read_only
+    async def get_detailed_manager_statistics(
+        session: AsyncSession,
+        manager_ids: Optional[Collection[int]] = None
+    ) -> List[Dict]:
         """Получить детальную статистику по менеджерам с активными задачами"""
-        result = await session.execute(
+        query = (
             select(
                 User.id,
                 User.first_name,
@@ -201,19 +481,22 @@ class TaskService:
                 User.telegram_id,
                 func.count(Task.id).label("total_tasks"),
                 func.sum(case((Task.status == "completed", 1), else_=0)).label("completed"),
-                func.sum(case((Task.status == "not_completed", 1), else_=0)).label("not_completed"),
                 func.sum(case((Task.status == "active", 1), else_=0)).label("active")
             )
             .outerjoin(Task, User.id == Task.manager_id)
-            .where(User.role == "manager")
+            .where(managers_filter())
             .group_by(User.id, User.first_name, User.username, User.telegram_id)
         )
+        if manager_ids is not None:
+            query = query.where(User.id.in_(manager_ids))
+        result = await session.execute(query)
+        missed = await TaskEventService.count_by_manager(session, EVENT_RESCHEDULED, manager_ids)
         
         stats = []
         for row in result.all():
             total = row.total_tasks or 0
             completed = int(row.completed or 0)
-            not_completed = int(row.not_completed or 0)
+            not_completed = missed.get(row.id, 0)
             active = int(row.active or 0)
             percentage = (completed / total * 100) if total > 0 else 0
             
@@ -221,6 +504,7 @@ class TaskService:
                 "user_id": row.id,
                 "telegram_id": row.telegram_id,
                 "name": row.first_name or row.username or f"ID: {row.telegram_id}",
+                "username": row.username,
                 "total": total,
                 "completed": completed,
                 "not_completed": not_completed,
@@ -0,0 +1,168 @@
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import TelegramMethod
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Повтор после сетевой ошибки может продублировать сообщение: запрос
+# мог дойти до Telegram. Такие методы повторяются только после RetryAfter.
+_NON_IDEMPOTENT_PREFIXES = ("send", "forward", "copy")
+
+
+class TelegramCircuitOpenError(TelegramNetworkError):
+    """Запрос не отправлен: Telegram API недоступен, предохранитель разомкнут"""
+
+
+class LatencyHistogram:
+    """Гистограмма задержек запросов по методам API"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counts: Dict[str, List[int]] = {}
+        self._totals: Dict[str, float] = {}
+
+    def observe(self, method: str, seconds: float):
+        counts = self._counts.setdefault(method, [0] * len(self.buckets))
+        counts[bisect_left(self.buckets, seconds)] += 1
+        self._totals[method] = self._totals.get(method, 0.0) + seconds
+
+    def quantile(self, method: str, q: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает квантиль q"""
+        counts = self._counts.get(method)
+        if not counts:
+            return None
+        rank = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def summary(self) -> List[str]:
+        """Строки «метод: число, среднее, p50, p95» по убыванию числа вызовов"""
+        lines = []
+        for method, counts in sorted(self._counts.items(), key=lambda item: -sum(item[1])):
+            total = sum(counts)
+            lines.append(
+                f"{method}: n={total}, avg={self._totals[method] / total * 1000:.0f} ms, "
+                f"p50≤{self.quantile(method, 0.5)} s, p95≤{self.quantile(method, 0.95)} s"
+            )
+        return lines
+
+
+class CircuitBreaker:
+    """Предохранитель: после серии сетевых и серверных ошибок подряд
+    запросы на время cooldown отклоняются сразу. По истечении паузы
+    пропускается один пробный запрос: успех замыкает цепь, ошибка
+    размыкает её ещё на cooldown.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_call(self, method: TelegramMethod):
+        if self.opened_at is None:
+            return
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown:
+            raise TelegramCircuitOpenError(method=method, message="Telegram API unavailable, circuit open")
+        # Пробный запрос; остальные ждут его результата ещё cooldown
+        self.opened_at = now
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Telegram API reachable again, circuit closed")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is None and self.failures >= self.threshold:
+            logger.error(f"Telegram API failed {self.failures} times in a row, circuit open for {self.cooldown} s")
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class ResilientSession(AiohttpSession):
+    """Сессия Bot API с настроенным пулом соединений, повторами и предохранителем.
+
+    RetryAfter ждётся и повторяется, если пауза не длиннее max_retry_after
+    (иначе решение о повторе остаётся за вызывающим кодом, как в outbox).
+    Сетевые ошибки и 5xx повторяются с экспоненциальной задержкой, кроме
+    методов отправки. Задержка каждой попытки попадает в гистограмму.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        keepalive_timeout: float = 60,
+        retry_attempts: int = 3,
+        max_retry_after: float = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30,
+        **kwargs
+    ):
+        super().__init__(limit=limit, **kwargs)
+        self._connector_init["keepalive_timeout"] = keepalive_timeout
+        self.retry_attempts = retry_attempts
+        self.max_retry_after = max_retry_after
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.latency = LatencyHistogram()
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None):
+        name = method.__api_method__
+        retry_safe = not name.startswith(_NON_IDEMPOTENT_PREFIXES)
+        attempt = 0
+        while True:
+            self.breaker.before_call(method)
+            attempt += 1
+            started = time.monotonic()
+            try:
+                result = await super().make_request(bot, method, timeout)
+            except TelegramRetryAfter as e:
+                self.latency.observe(name, time.monotonic() - started)
+                self.breaker.record_success()
+                if e.retry_after > self.max_retry_after or attempt > self.retry_attempts:
+                    raise
+                logger.warning(f"{name}: flood control, retrying in {e.retry_after} s")
+                await asyncio.sleep(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                self.latency.observe(name, time.monotonic() - started)
+                self.breaker.record_failure()
+                if not retry_safe or attempt > self.retry_attempts or self.breaker.is_open:
+                    raise
+                delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"{name}: {e}, retry {attempt}/{self.retry_attempts} in {delay:.1f} s")
+                await asyncio.sleep(delay)
+            except TelegramAPIError:
+                # Ответ 4xx: API доступен, ошибка в самом запросе
+                self.latency.observe(name, time.monotonic() - started)
+                self.breaker.record_success()
+                raise
+            else:
+                self.latency.observe(name, time.monotonic() - started)
+                self.breaker.record_success()
+                return result
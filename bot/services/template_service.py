@@ -0,0 +1,261 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, and_, or_
+from sqlalchemy.orm import selectinload
+from bot.database.database import insert_ignore, after_commit
+from bot.database.models import Task, TaskTemplate
+from bot.services.deadline_service import deadline_tracker
+from bot.services.task_hooks import tasks_changed
+from bot.services.task_event_service import TaskEventService, EVENT_CREATED, EVENT_ARCHIVED
+from bot.services.time_service import time_zones, local_today, end_of_day
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Collection, FrozenSet, Iterator, List, Optional
+import calendar
+import logging
+
+logger = logging.getLogger(__name__)
+
+# На сколько дней вперёд создаются задачи по шаблонам
+HORIZON_DAYS = 7
+EXPAND_BATCH_SIZE = 500
+
+WEEKDAY_NAMES = {
+    "mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
+    "пн": 0, "вт": 1, "ср": 2, "чт": 3, "пт": 4, "сб": 5, "вс": 6,
+}
+WEEKDAY_LABELS = ("пн", "вт", "ср", "чт", "пт", "сб", "вс")
+
+
+@dataclass(frozen=True)
+class Recurrence:
+    kind: str  # "daily", "weekly" или "monthly"
+    days: FrozenSet[int] = frozenset()
+
+    def occurrences(self, start: date, end: date) -> Iterator[date]:
+        """Даты повторения в диапазоне [start, end]"""
+        current = start
+        while current <= end:
+            if self.kind == "daily":
+                yield current
+            elif self.kind == "weekly":
+                if current.weekday() in self.days:
+                    yield current
+            elif self.kind == "monthly":
+                last_day = calendar.monthrange(current.year, current.month)[1]
+                # 31-е число в коротком месяце переносится на последний день
+                if current.day in self.days or (current.day == last_day and any(d > last_day for d in self.days)):
+                    yield current
+            current += timedelta(days=1)
+
+    def describe(self) -> str:
+        """Человекочитаемое описание правила"""
+        if self.kind == "daily":
+            return "ежедневно"
+        if self.kind == "weekly":
+            if self.days == frozenset(range(5)):
+                return "по будням"
+            return ", ".join(WEEKDAY_LABELS[d] for d in sorted(self.days))
+        return "по числам: " + ", ".join(str(d) for d in sorted(self.days))
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(rule: str) -> Recurrence:
+    """Разобрать правило повторения.
+
+    Поддерживаются: ``daily`` / ``ежедневно``, ``weekdays`` / ``будни``,
+    ``weekly:mon,fri`` или просто ``пн,пт``, ``monthly:1,15``.
+    """
+    rule = rule.strip().lower()
+    if rule in ("daily", "ежедневно"):
+        return Recurrence("daily")
+    if rule in ("weekdays", "будни"):
+        return Recurrence("weekly", frozenset(range(5)))
+
+    kind, _, value = rule.partition(":")
+    if not value:
+        kind, value = "weekly", rule
+
+    if kind == "weekly":
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        if not names or any(name not in WEEKDAY_NAMES for name in names):
+            raise ValueError(f"Invalid weekly rule: {rule}")
+        return Recurrence("weekly", frozenset(WEEKDAY_NAMES[name] for name in names))
+
+    if kind == "monthly":
+        try:
+            days = frozenset(int(day) for day in value.split(",") if day.strip())
+        except ValueError:
+            raise ValueError(f"Invalid monthly rule: {rule}")
+        if not days or any(day < 1 or day > 31 for day in days):
+            raise ValueError(f"Invalid monthly rule: {rule}")
+        return Recurrence("monthly", days)
+
+    raise ValueError(f"Unknown rule: {rule}")
+
+
+class TemplateService:
+    @staticmethod
+    async def create_template(
+        session: AsyncSession,
+        manager_id: int,
+        rule: str,
+        text: str,
+        created_by: Optional[int] = None
+    ) -> TaskTemplate:
+        """Создать шаблон повторяющейся задачи (ValueError — неверное правило); commit — за вызывающим"""
+        parse_rule(rule)
+        template = TaskTemplate(
+            manager_id=manager_id,
+            rule=rule.strip().lower(),
+            text=text,
+            created_by=created_by,
+            is_active=True
+        )
+        session.add(template)
+        await session.flush()
+        logger.info(f"Created task template {template.id} ({template.rule}) for manager {manager_id}")
+        return template
+
+    @staticmethod
+    async def get_templates(
+        session: AsyncSession,
+        manager_ids: Optional[Collection[int]] = None
+    ) -> List[TaskTemplate]:
+        """Получить активные шаблоны (или шаблоны указанных менеджеров)"""
+        query = (
+            select(TaskTemplate)
+            .options(selectinload(TaskTemplate.manager))
+            .where(TaskTemplate.is_active.is_(True))
+            .order_by(TaskTemplate.id)
+        )
+        if manager_ids is not None:
+            query = query.where(TaskTemplate.manager_id.in_(manager_ids))
+        result = await session.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_template_by_id(session: AsyncSession, template_id: int) -> Optional[TaskTemplate]:
+        """Получить шаблон по ID"""
+        result = await session.execute(select(TaskTemplate).where(TaskTemplate.id == template_id))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def deactivate_template(session: AsyncSession, template_id: int) -> int:
+        """Отключить шаблон и удалить его ещё не наступившие активные задачи; commit — за вызывающим.
+
+        Удаление фиксируется в журнале событий (archived), как и в TaskService.delete_tasks.
+        """
+        await session.execute(
+            update(TaskTemplate).where(TaskTemplate.id == template_id).values(is_active=False)
+        )
+        result = await session.execute(
+            delete(Task).where(
+                Task.template_id == template_id,
+                Task.status == "active",
+                Task.deadline > datetime.utcnow()
+            ).returning(Task.id, Task.manager_id)
+        )
+        removed = result.all()
+        await TaskEventService.record(session, [
+            {"task_id": row.id, "manager_id": row.manager_id, "event_type": EVENT_ARCHIVED}
+            for row in removed
+        ])
+        manager_ids = {row.manager_id for row in removed}
+        after_commit(session, deadline_tracker.request_reload)
+        after_commit(session, lambda: tasks_changed(manager_ids))
+        logger.info(f"Deactivated task template {template_id}, removed {len(removed)} future tasks")
+        return len(removed)
+
+    @staticmethod
+    async def expand_templates(
+        session: AsyncSession,
+        horizon_days: int = HORIZON_DAYS,
+        template_id: Optional[int] = None
+    ) -> int:
+        """Создать задачи по шаблонам (всем или одному template_id) на скользящий горизонт вперёд.
+
+        Шаблоны читаются пачками по индексу (is_active, generated_until),
+        задачи вставляются одним executemany на пачку. Уникальный индекс
+        (template_id, deadline) делает повторный запуск безопасным: уже
+        созданные даты пропускаются. Возвращает число действительно созданных задач.
+        """
+        # Горизонт считается по дате команды, дедлайны — по поясу менеджера
+        today = local_today()
+        horizon_end = today + timedelta(days=horizon_days)
+        horizon_mark = datetime.combine(horizon_end, time.min)
+        now = datetime.utcnow()
+        created = 0
+        last_id = 0
+
+        while True:
+            query = (
+                select(
+                    TaskTemplate.id,
+                    TaskTemplate.manager_id,
+                    TaskTemplate.text,
+                    TaskTemplate.rule,
+                    TaskTemplate.generated_until
+                )
+                .where(
+                    and_(
+                        TaskTemplate.is_active.is_(True),
+                        or_(TaskTemplate.generated_until.is_(None), TaskTemplate.generated_until < horizon_mark),
+                        TaskTemplate.id > last_id
+                    )
+                )
+                .order_by(TaskTemplate.id)
+                .limit(EXPAND_BATCH_SIZE)
+            )
+            if template_id is not None:
+                query = query.where(TaskTemplate.id == template_id)
+            templates = (await session.execute(query)).all()
+            if not templates:
+                break
+            last_id = templates[-1].id
+
+            rows = []
+            for template in templates:
+                try:
+                    recurrence = parse_rule(template.rule)
+                except ValueError:
+                    logger.error(f"Skipping template {template.id} with invalid rule {template.rule!r}")
+                    continue
+                start = today
+                if template.generated_until is not None:
+                    start = max(today, template.generated_until.date() + timedelta(days=1))
+                for day in recurrence.occurrences(start, horizon_end):
+                    rows.append({
+                        "manager_id": template.manager_id,
+                        "text": template.text,
+                        "deadline": end_of_day(day, time_zones.zone_for(template.manager_id)),
+                        "status": "active",
+                        "template_id": template.id,
+                        "created_at": now,
+                        "updated_at": now,
+                    })
+
+            if rows:
+                # RETURNING отдаёт только действительно вставленные строки
+                result = await session.execute(
+                    insert_ignore(session, Task, ["template_id", "deadline"])
+                    .returning(Task.id, Task.manager_id, Task.deadline),
+                    rows
+                )
+                inserted = result.all()
+                await TaskEventService.record(session, [
+                    {"task_id": row.id, "manager_id": row.manager_id, "event_type": EVENT_CREATED, "new_deadline": row.deadline}
+                    for row in inserted
+                ])
+                created += len(inserted)
+            await session.execute(
+                update(TaskTemplate),
+                [{"id": template.id, "generated_until": horizon_mark} for template in templates]
+            )
+            await session.commit()
+
+        if created:
+            deadline_tracker.request_reload()
+            tasks_changed()
+            logger.info(f"Expanded task templates up to {horizon_end}: {created} occurrences")
+        return created
@@ -0,0 +1,144 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from bot.database.models import User, TeamMembership
+from bot.config import settings
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Время в БД — naive UTC; здесь оно переводится в часовой пояс пользователя
+# и обратно. Дедлайн «ДД.ММ.ГГГГ» — конец этого дня по времени менеджера.
+
+DATE_FORMAT = "%d.%m.%Y"
+DATETIME_FORMAT = "%d.%m.%Y %H:%M"
+
+
+@lru_cache(maxsize=None)
+def _load_zone(name: str) -> Optional[ZoneInfo]:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def is_valid_zone(name: str) -> bool:
+    """Есть ли такой часовой пояс в базе IANA (Europe/Minsk, Asia/Almaty, ...)"""
+    return bool(name) and _load_zone(name) is not None
+
+
+def default_zone() -> ZoneInfo:
+    """Часовой пояс команды по умолчанию (TIMEZONE из конфигурации)"""
+    return _load_zone(settings.TIMEZONE) or ZoneInfo("UTC")
+
+
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    """Часовой пояс по имени; пустое или неизвестное имя — пояс по умолчанию"""
+    return (_load_zone(name) if name else None) or default_zone()
+
+
+def to_local(value: datetime, zone: Optional[ZoneInfo] = None) -> datetime:
+    """naive UTC из БД → время в часовом поясе zone"""
+    return value.replace(tzinfo=timezone.utc).astimezone(zone or default_zone())
+
+
+def format_local(value: Optional[datetime], zone: Optional[ZoneInfo] = None, fmt: str = DATE_FORMAT) -> str:
+    """Отформатировать время из БД по часовому поясу zone"""
+    if value is None:
+        return "N/A"
+    return to_local(value, zone).strftime(fmt)
+
+
+def local_today(zone: Optional[ZoneInfo] = None) -> date:
+    """Текущая дата в часовом поясе zone"""
+    return datetime.now(zone or default_zone()).date()
+
+
+@lru_cache(maxsize=4096)
+def _day_bounds(day: date, zone: ZoneInfo) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, datetime.min.time(), zone)
+    end = datetime.combine(day + timedelta(days=1), datetime.min.time(), zone)
+    return (
+        start.astimezone(timezone.utc).replace(tzinfo=None),
+        end.astimezone(timezone.utc).replace(tzinfo=None)
+    )
+
+
+def day_bounds(day: date, zone: Optional[ZoneInfo] = None) -> Tuple[datetime, datetime]:
+    """Границы местных суток [начало, конец) в naive UTC — для запросов к БД"""
+    return _day_bounds(day, zone or default_zone())
+
+
+def end_of_day(day: date, zone: Optional[ZoneInfo] = None) -> datetime:
+    """Дедлайн на дату day: 23:59:59 по местному времени, в naive UTC"""
+    return day_bounds(day, zone)[1] - timedelta(seconds=1)
+
+
+def days_ago_start(days: int, zone: Optional[ZoneInfo] = None) -> datetime:
+    """Начало местных суток days дней назад, в naive UTC (порог очистки)"""
+    return day_bounds(local_today(zone) - timedelta(days=days), zone)[0]
+
+
+def parse_local_date(date_str: str) -> Optional[date]:
+    """Разобрать дату ДД.ММ.ГГГГ; None — неверный формат"""
+    try:
+        return datetime.strptime(date_str.strip(), DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+class TimeZoneIndex:
+    """In-memory индекс часовых поясов пользователей.
+
+    Пояс пользователя — его собственный (users.timezone), иначе пояс
+    руководителя его команды, иначе TIMEZONE из конфигурации. Индекс
+    пересобирается целиком при смене поясов или состава команд, как
+    индекс прав, и подменяется одним присваиванием.
+    """
+
+    def __init__(self):
+        self._by_user_id: Dict[int, ZoneInfo] = {}
+        self._by_telegram_id: Dict[int, ZoneInfo] = {}
+
+    async def rebuild(self, session: AsyncSession):
+        """Пересобрать индекс из БД"""
+        result = await session.execute(
+            select(User.id, User.telegram_id, User.timezone).where(User.timezone.isnot(None))
+        )
+        own = {row.id: (row.telegram_id, get_zone(row.timezone)) for row in result.all()}
+
+        by_user_id = {user_id: zone for user_id, (_, zone) in own.items()}
+        result = await session.execute(
+            select(TeamMembership.lead_id, TeamMembership.manager_id).order_by(TeamMembership.id)
+        )
+        inherited = {}
+        for row in result.all():
+            if row.manager_id not in own and row.lead_id in own:
+                inherited.setdefault(row.manager_id, own[row.lead_id][1])
+        by_user_id.update(inherited)
+
+        by_telegram_id = {telegram_id: zone for telegram_id, zone in own.values()}
+        if inherited:
+            result = await session.execute(
+                select(User.id, User.telegram_id).where(User.id.in_(inherited))
+            )
+            for row in result.all():
+                by_telegram_id[row.telegram_id] = inherited[row.id]
+
+        self._by_user_id = by_user_id
+        self._by_telegram_id = by_telegram_id
+        logger.debug(f"Time zone index rebuilt: {len(by_user_id)} users with non-default time zone")
+
+    def zone_for(self, user_id: Optional[int]) -> ZoneInfo:
+        """Часовой пояс пользователя по users.id"""
+        return self._by_user_id.get(user_id) or default_zone()
+
+    def zone_for_telegram(self, telegram_id: Optional[int]) -> ZoneInfo:
+        """Часовой пояс пользователя по Telegram ID"""
+        return self._by_telegram_id.get(telegram_id) or default_zone()
+
+
+time_zones = TimeZoneIndex()
@@ -1,7 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 from bot.database.models import User
-from bot.config import settings
+from bot.database.database import upsert
+from bot.services.permission_service import permission_index, managers_filter, ROLE_MANAGER
+from bot.services.time_service import time_zones
 from typing import Optional, List
 import logging
 
@@ -17,34 +19,52 @@ class UserService:
         first_name: Optional[str] = None,
         last_name: Optional[str] = None
     ) -> User:
-        """Получить или создать пользователя"""
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
+        """Получить или создать пользователя.
+
+        Вызывается на каждый апдейт, поэтому сначала выполняется только
+        SELECT: запись (INSERT ... ON CONFLICT, без гонки при параллельных
+        апдейтах) нужна лишь новому пользователю или при смене профиля.
+        Запись сразу фиксируется отдельным commit, чтобы блокировка записи
+        SQLite не удерживалась, пока хендлер обращается к Telegram.
+
+        Новый пользователь всегда создаётся с ролью manager: права
+        администраторов из конфигурации накладывает PermissionIndex, и
+        удаление ID из конфигурации сразу их отзывает.
+        """
+        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
         user = result.scalar_one_or_none()
+        if user is not None and (user.username, user.first_name, user.last_name) == (username, first_name, last_name):
+            return user
         
-        if not user:
-            role = "admin" if telegram_id == settings.ADMIN_TELEGRAM_ID else "manager"
-            user = User(
+        await session.execute(
+            upsert(session, User, ["telegram_id"], ["username", "first_name", "last_name"]).values(
                 telegram_id=telegram_id,
                 username=username,
                 first_name=first_name,
                 last_name=last_name,
-                role=role
+                role=ROLE_MANAGER
             )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-            logger.info(f"Created new user: {telegram_id} with role: {role}")
-        else:
-            # Обновляем данные пользователя
-            user.username = username
-            user.first_name = first_name
-            user.last_name = last_name
-            await session.commit()
+        )
+        result = await session.execute(
+            select(User).where(User.telegram_id == telegram_id).execution_options(populate_existing=True)
+        )
+        user = result.scalar_one()
+        await session.commit()
         
         return user
     
+    @staticmethod
+    async def set_timezone(session: AsyncSession, telegram_id: int, zone_name: Optional[str]) -> Optional[User]:
+        """Задать часовой пояс пользователя (None — пояс команды) и пересобрать индекс поясов"""
+        user = await UserService.get_user_by_telegram_id(session, telegram_id)
+        if not user:
+            return None
+        user.timezone = zone_name
+        await session.commit()
+        await time_zones.rebuild(session)
+        logger.info(f"User {telegram_id} time zone set to {zone_name or 'default'}")
+        return user
+    
     @staticmethod
     async def get_user_by_telegram_id(session: AsyncSession, telegram_id: int) -> Optional[User]:
         """Получить пользователя по Telegram ID"""
@@ -53,16 +73,24 @@ class UserService:
         )
         return result.scalar_one_or_none()
     
+    @staticmethod
+    async def get_user_by_username(session: AsyncSession, username: str) -> Optional[User]:
+        """Получить пользователя по username (без @, без учёта регистра)"""
+        result = await session.execute(
+            select(User).where(func.lower(User.username) == username.lower())
+        )
+        return result.scalars().first()
+    
     @staticmethod
     async def get_all_managers(session: AsyncSession) -> List[User]:
         """Получить всех менеджеров"""
         result = await session.execute(
-            select(User).where(User.role == "manager")
+            select(User).where(managers_filter())
         )
         return list(result.scalars().all())
     
     @staticmethod
     async def is_admin(telegram_id: int) -> bool:
         """Проверить, является ли пользователь администратором"""
-        return telegram_id == settings.ADMIN_TELEGRAM_ID
+        return permission_index.is_admin(telegram_id)
 
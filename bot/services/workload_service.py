@@ -0,0 +1,163 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, case, and_
+from bot.database.models import Task
+from bot.services.task_hooks import on_tasks_changed
+from bot.services.time_service import time_zones, to_local, day_bounds
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Collection, Dict, Iterable, List, NamedTuple, Optional
+from zoneinfo import ZoneInfo
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Workload:
+    """Активные задачи менеджера по срочности"""
+    overdue: int = 0
+    due_today: int = 0
+    due_week: int = 0
+    later: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.overdue + self.due_today + self.due_week + self.later
+
+
+class _Entry(NamedTuple):
+    workload: Workload
+    zone_key: str
+    # Раньше этого момента (naive UTC) ни одна задача не сменит корзину
+    valid_until: datetime
+
+
+class WorkloadCache:
+    """Кэш нагрузки менеджеров по users.id.
+
+    Запись сбрасывается при изменении задач менеджера (task_hooks), при
+    смене его часового пояса и сама устаревает, когда одна из задач
+    переходит в другую корзину: в полночь по местному времени или в момент
+    ближайшего сегодняшнего дедлайна.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, _Entry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, manager_id: int, zone: ZoneInfo, now: datetime) -> Optional[Workload]:
+        entry = self._entries.get(manager_id)
+        if entry is None or entry.zone_key != zone.key or now >= entry.valid_until:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.workload
+
+    def put(self, manager_id: int, zone: ZoneInfo, workload: Workload, valid_until: datetime):
+        self._entries[manager_id] = _Entry(workload, zone.key, valid_until)
+
+    def invalidate(self, manager_ids: Optional[Iterable[int]] = None):
+        """Сбросить нагрузку указанных менеджеров; None — всех"""
+        if manager_ids is None:
+            self._entries.clear()
+            return
+        for manager_id in manager_ids:
+            self._entries.pop(manager_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+workload_cache = WorkloadCache()
+on_tasks_changed(workload_cache.invalidate)
+
+
+class WorkloadService:
+    @staticmethod
+    async def get_workloads(session: AsyncSession, manager_ids: Collection[int]) -> Dict[int, Workload]:
+        """Нагрузка менеджеров: просрочено, сегодня, на этой неделе, позже.
+
+        Корзины считаются по часовому поясу менеджера. Менеджеры без
+        записи в кэше досчитываются одним GROUP BY на часовой пояс.
+        Читается основная сессия, а не реплика: отстающий результат
+        остался бы в кэше до следующего изменения задач.
+        """
+        now = datetime.utcnow()
+        workloads = {}
+        missing: Dict[ZoneInfo, List[int]] = {}
+        for manager_id in manager_ids:
+            zone = time_zones.zone_for(manager_id)
+            workload = workload_cache.get(manager_id, zone, now)
+            if workload is None:
+                missing.setdefault(zone, []).append(manager_id)
+            else:
+                workloads[manager_id] = workload
+
+        for zone, zone_manager_ids in missing.items():
+            workloads.update(await WorkloadService._count(session, zone_manager_ids, zone, now))
+        return workloads
+
+    @staticmethod
+    async def get_workload(session: AsyncSession, manager_id: int) -> Workload:
+        """Нагрузка одного менеджера"""
+        workloads = await WorkloadService.get_workloads(session, [manager_id])
+        return workloads[manager_id]
+
+    @staticmethod
+    async def _count(
+        session: AsyncSession,
+        manager_ids: List[int],
+        zone: ZoneInfo,
+        now: datetime
+    ) -> Dict[int, Workload]:
+        """Посчитать корзины менеджеров одного часового пояса одним запросом"""
+        today = to_local(now, zone).date()
+        today_end = day_bounds(today, zone)[1]
+        # Неделя — до конца воскресенья, как и недельные отчёты
+        week_end = day_bounds(today + timedelta(days=6 - today.weekday()), zone)[1]
+
+        result = await session.execute(
+            select(
+                Task.manager_id,
+                func.sum(case((Task.deadline < now, 1), else_=0)).label("overdue"),
+                func.sum(case((and_(Task.deadline >= now, Task.deadline < today_end), 1), else_=0)).label("due_today"),
+                func.sum(case((and_(Task.deadline >= today_end, Task.deadline < week_end), 1), else_=0)).label("due_week"),
+                func.sum(case((Task.deadline >= week_end, 1), else_=0)).label("later"),
+                func.min(case((Task.deadline >= now, Task.deadline))).label("next_deadline")
+            )
+            .where(and_(Task.manager_id.in_(manager_ids), Task.status == "active"))
+            .group_by(Task.manager_id)
+        )
+        rows = {row.manager_id: row for row in result.all()}
+
+        workloads = {}
+        for manager_id in manager_ids:
+            row = rows.get(manager_id)
+            valid_until = today_end
+            if row is None:
+                workload = Workload()
+            else:
+                workload = Workload(
+                    overdue=int(row.overdue or 0),
+                    due_today=int(row.due_today or 0),
+                    due_week=int(row.due_week or 0),
+                    later=int(row.later or 0)
+                )
+                if row.next_deadline is not None:
+                    valid_until = min(valid_until, row.next_deadline)
+            workload_cache.put(manager_id, zone, workload, valid_until)
+            workloads[manager_id] = workload
+        logger.debug(f"Workload counted for {len(manager_ids)} managers in {zone.key}")
+        return workloads
+
+
+def format_workload(workload: Workload) -> str:
+    """Строка нагрузки: 🔴 просрочено · 🟠 сегодня · 🟡 неделя · ⚪ позже"""
+    return (
+        f"🔴 {workload.overdue} · 🟠 {workload.due_today} · "
+        f"🟡 {workload.due_week} · ⚪ {workload.later}"
+    )
+
+
+WORKLOAD_LEGEND = "🔴 просрочено · 🟠 сегодня · 🟡 на этой неделе · ⚪ позже"
@@ -5,4 +5,9 @@ class AdminStates(StatesGroup):
     waiting_for_manager_selection = State()
     waiting_for_task_text = State()
     waiting_for_task_deadline = State()
-
+    bulk_selecting_managers = State()
+    bulk_waiting_for_task_text = State()
+    bulk_waiting_for_task_deadline = State()
+    bulk_waiting_for_task_list = State()
+    broadcast_waiting_for_text = State()
+    broadcast_confirm = State()
@@ -0,0 +1,59 @@
+"""Микробенчмарк: стоимость сборки pydantic-клавиатур против выдачи из кэша.
+
+Запуск из корня проекта:
+    python tools/benchmark_keyboards.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# bot.config требует эти переменные при импорте
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ADMIN_TELEGRAM_ID", "0")
+
+from bot.database.models import User, Task  # noqa: E402
+from bot.keyboards import admin_keyboards, manager_keyboards  # noqa: E402
+from bot.keyboards.cache import keyboard_cache  # noqa: E402
+
+NUMBER = 2000
+
+
+def report(name: str, uncached, cached):
+    uncached_time = timeit.timeit(uncached, number=NUMBER)
+    cached_time = timeit.timeit(cached, number=NUMBER)
+    print(
+        f"{name:<22} без кэша: {uncached_time / NUMBER * 1e6:8.1f} мкс"
+        f"   с кэшем: {cached_time / NUMBER * 1e6:8.1f} мкс"
+        f"   x{uncached_time / cached_time:.0f}"
+    )
+
+
+def main():
+    managers = [
+        User(id=i, telegram_id=100000 + i, first_name=f"Менеджер {i}", role="manager")
+        for i in range(1, 51)
+    ]
+    now = datetime.utcnow()
+    tasks = [
+        Task(id=i, manager_id=1, text=f"Задача номер {i} с достаточно длинным описанием", deadline=now + timedelta(days=i))
+        for i in range(1, 101)
+    ]
+
+    def build_manager_list():
+        keyboard_cache.clear()
+        admin_keyboards.get_manager_list_keyboard(managers)
+
+    def build_tasks_page():
+        keyboard_cache.clear()
+        manager_keyboards.get_tasks_keyboard(tasks, page=3)
+
+    report("Меню администратора", admin_keyboards._build_admin_menu, admin_keyboards.get_admin_menu)
+    report("Список менеджеров (50)", build_manager_list, lambda: admin_keyboards.get_manager_list_keyboard(managers))
+    report("Страница задач (10)", build_tasks_page, lambda: manager_keyboards.get_tasks_keyboard(tasks, page=3))
+
+
+if __name__ == "__main__":
+    main()
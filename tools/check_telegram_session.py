@@ -0,0 +1,211 @@
+"""Проверка ResilientSession (bot/services/telegram_session.py) на фейковом Bot API.
+
+Поднимает tools/fake_telegram_api.py в том же процессе, планирует сбои
+через /_control/fail и проверяет поведение сессии:
+    - 429: пауза retry_after и повтор, в том числе для методов отправки;
+    - 5xx: повтор с экспоненциальной задержкой;
+    - send*: после 5xx не повторяется (сообщение могло уйти);
+    - предохранитель: размыкается после серии ошибок, отклоняет запросы
+      без обращения к API, после паузы пропускает один пробный запрос.
+
+Запуск из корня проекта:
+    python tools/check_telegram_session.py
+Код возврата 1, если хотя бы одна проверка не прошла.
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramServerError
+from aiohttp import web
+
+from fake_telegram_api import FakeTelegramAPI
+
+CHAT_ID = -100
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 1.0
+BACKOFF_BASE = 0.2
+
+
+def _load_session_module():
+    """telegram_session без импорта пакета bot (ему нужны настройки из .env)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.path.join(root, "bot", "services", "telegram_session.py")
+    spec = importlib.util.spec_from_file_location("telegram_session", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+session_module = _load_session_module()
+
+
+class Checker:
+    def __init__(self):
+        self.failed = 0
+
+    def check(self, ok: bool, title: str, details: str = ""):
+        if not ok:
+            self.failed += 1
+        suffix = f" ({details})" if details else ""
+        print(f"{'✅' if ok else '❌'} {title}{suffix}")
+
+
+def _calls(api: FakeTelegramAPI, method: str) -> int:
+    return sum(1 for call in api.calls if call["method"] == method)
+
+
+def _fail(api: FakeTelegramAPI, method: str, status: int, times: int):
+    api.failures[method] = [status, times]
+
+
+async def check_retry_after(api: FakeTelegramAPI, bot: Bot, checker: Checker):
+    api.calls.clear()
+    _fail(api, "getChatMemberCount", 429, 1)
+    started = time.monotonic()
+    count = await bot.get_chat_member_count(CHAT_ID)
+    elapsed = time.monotonic() - started
+    checker.check(
+        count == api.member_count and _calls(api, "getChatMemberCount") == 2 and elapsed >= api.retry_after,
+        "429: запрос повторён после retry_after",
+        f"вызовов {_calls(api, 'getChatMemberCount')}, {elapsed:.2f} с"
+    )
+
+    api.calls.clear()
+    _fail(api, "sendMessage", 429, 1)
+    await bot.send_message(CHAT_ID, "flood")
+    checker.check(
+        _calls(api, "sendMessage") == 2,
+        "429: sendMessage тоже повторяется (запрос отклонён до отправки)",
+        f"вызовов {_calls(api, 'sendMessage')}"
+    )
+
+
+async def check_server_error_backoff(api: FakeTelegramAPI, bot: Bot, checker: Checker):
+    api.calls.clear()
+    _fail(api, "getChatMemberCount", 502, 2)
+    started = time.monotonic()
+    count = await bot.get_chat_member_count(CHAT_ID)
+    elapsed = time.monotonic() - started
+    calls = [call["at"] for call in api.calls if call["method"] == "getChatMemberCount"]
+    gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+    # Задержка попытки n — base * 2^(n-1) с разбросом 0.5..1
+    growing = len(gaps) == 2 and gaps[0] >= BACKOFF_BASE * 0.5 and gaps[1] >= BACKOFF_BASE
+    checker.check(
+        count == api.member_count and len(calls) == 3 and growing,
+        "5xx: два повтора с растущей задержкой",
+        f"паузы {', '.join(f'{gap:.2f}' for gap in gaps)} с, всего {elapsed:.2f} с"
+    )
+
+
+async def check_send_not_retried(api: FakeTelegramAPI, bot: Bot, checker: Checker):
+    api.calls.clear()
+    _fail(api, "sendMessage", 502, 1)
+    try:
+        await bot.send_message(CHAT_ID, "once")
+        raised = False
+    except TelegramServerError:
+        raised = True
+    checker.check(
+        raised and _calls(api, "sendMessage") == 1,
+        "5xx: sendMessage не повторяется, ошибка у вызывающего",
+        f"вызовов {_calls(api, 'sendMessage')}"
+    )
+
+
+async def check_circuit_breaker(api: FakeTelegramAPI, bot: Bot, session, checker: Checker):
+    # Успешный запрос обнуляет счётчик ошибок предыдущих проверок
+    await bot.get_chat_member_count(CHAT_ID)
+    api.calls.clear()
+    _fail(api, "getChatMemberCount", 502, 1000)
+    # Повторы тоже считаются ошибками: цепь размыкается уже на первом вызове
+    try:
+        await bot.get_chat_member_count(CHAT_ID)
+    except TelegramServerError:
+        pass
+    checker.check(
+        session.breaker.is_open and _calls(api, "getChatMemberCount") == BREAKER_THRESHOLD,
+        f"Предохранитель разомкнут после {BREAKER_THRESHOLD} ошибок подряд",
+        f"вызовов {_calls(api, 'getChatMemberCount')}"
+    )
+
+    before = _calls(api, "getChatMemberCount")
+    try:
+        await bot.get_chat_member_count(CHAT_ID)
+        rejected = False
+    except session_module.TelegramCircuitOpenError:
+        rejected = True
+    checker.check(
+        rejected and _calls(api, "getChatMemberCount") == before,
+        "Разомкнутый предохранитель отклоняет запрос без обращения к API"
+    )
+
+    # Пробный запрос после паузы снова неудачен — цепь размыкается ещё на паузу
+    await asyncio.sleep(BREAKER_COOLDOWN)
+    try:
+        await bot.get_chat_member_count(CHAT_ID)
+    except TelegramServerError:
+        pass
+    try:
+        await bot.get_chat_member_count(CHAT_ID)
+        rejected = False
+    except session_module.TelegramCircuitOpenError:
+        rejected = True
+    checker.check(
+        _calls(api, "getChatMemberCount") == before + 1 and rejected,
+        "Неудачный пробный запрос: один вызов API, цепь снова разомкнута"
+    )
+
+    # Сервис восстановился: пробный запрос проходит и замыкает цепь
+    api.failures.clear()
+    await asyncio.sleep(BREAKER_COOLDOWN)
+    count = await bot.get_chat_member_count(CHAT_ID)
+    checker.check(
+        count == api.member_count and not session.breaker.is_open and session.breaker.failures == 0,
+        "Успешный пробный запрос замыкает цепь"
+    )
+
+
+async def run(port: int) -> int:
+    api = FakeTelegramAPI(retry_after=1)
+    runner = web.AppRunner(api.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    session = session_module.ResilientSession(
+        api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"),
+        retry_attempts=3,
+        backoff_base=BACKOFF_BASE,
+        breaker_threshold=BREAKER_THRESHOLD,
+        breaker_cooldown=BREAKER_COOLDOWN
+    )
+    bot = Bot(token="123:fake", session=session)
+    checker = Checker()
+    try:
+        await check_retry_after(api, bot, checker)
+        await check_server_error_backoff(api, bot, checker)
+        await check_send_not_retried(api, bot, checker)
+        await check_circuit_breaker(api, bot, session, checker)
+    finally:
+        await session.close()
+        await runner.cleanup()
+
+    print()
+    print("\n".join(session.latency.summary()))
+    return 1 if checker.failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка ResilientSession на фейковом Bot API")
+    parser.add_argument("--port", type=int, default=8082)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.port)))
+
+
+if __name__ == "__main__":
+    main()
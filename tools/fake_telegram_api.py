@@ -0,0 +1,373 @@
+"""Локальная замена Telegram Bot API для интеграционных и нагрузочных прогонов.
+
+Реализует подмножество методов, которыми пользуется бот: getMe, getUpdates,
+sendMessage, editMessageText, editMessageReplyMarkup, answerCallbackQuery,
+getChatMemberCount, setWebhook и deleteWebhook. Токен может быть любым вида "<id>:<secret>".
+Все вызовы записываются, задержку ответа и долю ответов 429 можно задать
+при запуске или на ходу.
+
+Запуск из корня проекта:
+    python tools/fake_telegram_api.py --port 8081 --latency 0.05 --flood-rate 0.01
+
+Бот подключается к серверу через .env:
+    BOT_TOKEN=123:fake
+    TELEGRAM_API_URL=http://127.0.0.1:8081
+
+Апдейты подаются и вызовы читаются через служебные ручки:
+    POST /_control/message   {"user_id": 1, "text": "/start"}
+    POST /_control/callback  {"user_id": 1, "data": "t:c:1", "message_id": 10}
+    POST /_control/updates   апдейт Bot API или список апдейтов без update_id
+    GET  /_control/calls     записанные вызовы (?method=sendMessage&since=0)
+    GET  /_control/stats     число вызовов по методам
+    POST /_control/config    {"latency": 0.05, "jitter": 0.02, "flood_rate": 0.1, "retry_after": 1}
+    POST /_control/fail      {"method": "sendMessage", "status": 502, "times": 2}
+                             следующие times вызовов метода получат ошибку status
+                             (для 429 — с retry_after); times=0 снимает сбой
+    POST /_control/reset     очистить очередь апдейтов и журнал вызовов
+
+Если бот вызвал setWebhook, апдейты не копятся в очереди, а отправляются
+POST-запросом на указанный адрес (режим вебхука).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from itertools import count
+from typing import Any, Dict, List, Optional
+
+from aiohttp import ClientSession, web
+
+logger = logging.getLogger("fake_telegram_api")
+
+# Параметры методов, которые aiogram передаёт строкой с JSON внутри формы
+_JSON_FIELDS = ("reply_markup", "allowed_updates", "entities", "link_preview_options", "reply_parameters")
+
+# Эти методы не замедляются и не получают 429: иначе искажается сам опрос
+_CONTROL_METHODS = ("getUpdates", "getMe", "setWebhook", "deleteWebhook")
+
+
+class FakeTelegramAPI:
+    """Состояние сервера: очередь апдейтов, журнал вызовов, режим сбоев"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        flood_rate: float = 0.0,
+        retry_after: int = 1,
+        member_count: int = 10
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.member_count = member_count
+        self.updates: List[Dict[str, Any]] = []
+        self.calls: List[Dict[str, Any]] = []
+        self.webhook_url: Optional[str] = None
+        # Запланированные сбои: метод → [код ответа, сколько раз осталось]
+        self.failures: Dict[str, List[int]] = {}
+        self._update_ids = count(1)
+        self._message_ids = count(1)
+        self._callback_ids = count(1)
+        self._new_updates = asyncio.Event()
+        self._webhook_session: Optional[ClientSession] = None
+        self._methods = {
+            "getMe": self.get_me,
+            "getUpdates": self.get_updates,
+            "sendMessage": self.send_message,
+            "editMessageText": self.edit_message_text,
+            "editMessageReplyMarkup": self.edit_message_reply_markup,
+            "answerCallbackQuery": self.answer_callback_query,
+            "getChatMemberCount": self.get_chat_member_count,
+            "setWebhook": self.set_webhook,
+            "deleteWebhook": self.delete_webhook,
+        }
+
+    # --- Bot API ---
+
+    async def get_me(self, token: str, params: dict):
+        bot_id = int(token.split(":", 1)[0]) if token.split(":", 1)[0].isdigit() else 1
+        return {"id": bot_id, "is_bot": True, "first_name": "Fake Bot", "username": "fake_bot"}
+
+    async def get_updates(self, token: str, params: dict):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        if offset:
+            # Как в Telegram: offset подтверждает всё, что раньше него
+            self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:limit]
+
+    async def send_message(self, token: str, params: dict):
+        return self._message(params["chat_id"], params.get("text", ""), params.get("reply_markup"))
+
+    async def edit_message_text(self, token: str, params: dict):
+        if params.get("inline_message_id"):
+            return True
+        message = self._message(params["chat_id"], params.get("text", ""), params.get("reply_markup"))
+        message["message_id"] = int(params["message_id"])
+        message["edit_date"] = message["date"]
+        return message
+
+    async def edit_message_reply_markup(self, token: str, params: dict):
+        if params.get("inline_message_id"):
+            return True
+        message = self._message(params["chat_id"], "", params.get("reply_markup"))
+        message["message_id"] = int(params["message_id"])
+        message["edit_date"] = message["date"]
+        return message
+
+    async def answer_callback_query(self, token: str, params: dict):
+        return True
+
+    async def get_chat_member_count(self, token: str, params: dict):
+        return self.member_count
+
+    async def set_webhook(self, token: str, params: dict):
+        self.webhook_url = params["url"]
+        return True
+
+    async def delete_webhook(self, token: str, params: dict):
+        self.webhook_url = None
+        if str(params.get("drop_pending_updates")).lower() == "true":
+            self.updates.clear()
+        return True
+
+    def _message(self, chat_id, text: str, reply_markup=None) -> dict:
+        chat_id = int(chat_id)
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "text": text,
+        }
+        if reply_markup:
+            message["reply_markup"] = reply_markup
+        return message
+
+    # --- Подача апдейтов ---
+
+    async def push_update(self, update: dict) -> dict:
+        update = {**update, "update_id": next(self._update_ids)}
+        if self.webhook_url:
+            if self._webhook_session is None:
+                self._webhook_session = ClientSession()
+            async with self._webhook_session.post(self.webhook_url, json=update) as response:
+                await response.read()
+        else:
+            self.updates.append(update)
+            self._new_updates.set()
+        return update
+
+    def message_update(self, user_id: int, text: str, chat_id: Optional[int] = None) -> dict:
+        user = {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id or user_id, "type": "private" if not chat_id else "supergroup"},
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return {"message": message}
+
+    def callback_update(self, user_id: int, data: str, message_id: Optional[int] = None) -> dict:
+        user = {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+        return {
+            "callback_query": {
+                "id": str(next(self._callback_ids)),
+                "from": user,
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id or next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "",
+                },
+            }
+        }
+
+    # --- HTTP ---
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        token = request.match_info["token"]
+        method = request.match_info["method"]
+        params = await _read_params(request)
+        self.calls.append({"method": method, "params": params, "at": time.time()})
+
+        handler = self._methods.get(method)
+        if handler is None:
+            return _error(404, "Not Found: method not found")
+
+        failure = self.failures.get(method)
+        if failure:
+            status = failure[0]
+            failure[1] -= 1
+            if failure[1] <= 0:
+                del self.failures[method]
+            if status == 429:
+                return _error(
+                    429,
+                    f"Too Many Requests: retry after {self.retry_after}",
+                    parameters={"retry_after": self.retry_after}
+                )
+            return _error(status, "Bad Gateway" if status == 502 else f"Error {status}")
+
+        if method not in _CONTROL_METHODS:
+            if self.latency or self.jitter:
+                await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+            if self.flood_rate and random.random() < self.flood_rate:
+                return _error(
+                    429,
+                    f"Too Many Requests: retry after {self.retry_after}",
+                    parameters={"retry_after": self.retry_after}
+                )
+
+        try:
+            result = await handler(token, params)
+        except (KeyError, ValueError) as e:
+            return _error(400, f"Bad Request: {e}")
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_push_message(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        update = self.message_update(int(body["user_id"]), body["text"], body.get("chat_id"))
+        return web.json_response(await self.push_update(update))
+
+    async def handle_push_callback(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        update = self.callback_update(int(body["user_id"]), body["data"], body.get("message_id"))
+        return web.json_response(await self.push_update(update))
+
+    async def handle_push_updates(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        updates = body if isinstance(body, list) else [body]
+        return web.json_response([await self.push_update(update) for update in updates])
+
+    async def handle_calls(self, request: web.Request) -> web.Response:
+        method = request.query.get("method")
+        since = float(request.query.get("since", 0))
+        calls = [
+            call for call in self.calls
+            if call["at"] >= since and (method is None or call["method"] == method)
+        ]
+        return web.json_response(calls)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        stats: Dict[str, int] = {}
+        for call in self.calls:
+            stats[call["method"]] = stats.get(call["method"], 0) + 1
+        return web.json_response({"calls": stats, "pending_updates": len(self.updates)})
+
+    async def handle_config(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        for name in ("latency", "jitter", "flood_rate", "retry_after", "member_count"):
+            if name in body:
+                setattr(self, name, type(getattr(self, name))(body[name]))
+        return web.json_response({
+            "latency": self.latency,
+            "jitter": self.jitter,
+            "flood_rate": self.flood_rate,
+            "retry_after": self.retry_after,
+            "member_count": self.member_count,
+        })
+
+    async def handle_fail(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        times = int(body.get("times", 1))
+        if times > 0:
+            self.failures[body["method"]] = [int(body.get("status", 502)), times]
+        else:
+            self.failures.pop(body["method"], None)
+        return web.json_response({method: {"status": status, "times": left} for method, (status, left) in self.failures.items()})
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.updates.clear()
+        self.calls.clear()
+        self.failures.clear()
+        return web.json_response({"ok": True})
+
+    async def close(self, app: web.Application):
+        if self._webhook_session is not None:
+            await self._webhook_session.close()
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/_control/message", self.handle_push_message)
+        app.router.add_post("/_control/callback", self.handle_push_callback)
+        app.router.add_post("/_control/updates", self.handle_push_updates)
+        app.router.add_get("/_control/calls", self.handle_calls)
+        app.router.add_get("/_control/stats", self.handle_stats)
+        app.router.add_post("/_control/config", self.handle_config)
+        app.router.add_post("/_control/fail", self.handle_fail)
+        app.router.add_post("/_control/reset", self.handle_reset)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle_method)
+        app.on_cleanup.append(self.close)
+        return app
+
+
+async def _read_params(request: web.Request) -> dict:
+    """Параметры вызова из query, формы или JSON-тела"""
+    params: Dict[str, Any] = dict(request.query)
+    if request.content_type == "application/json":
+        params.update(await request.json())
+        return params
+    if request.can_read_body:
+        form = await request.post()
+        for name, value in form.items():
+            if not isinstance(value, str):
+                # Файлы не нужны для проверок, достаточно имени
+                value = getattr(value, "filename", "")
+            elif name in _JSON_FIELDS:
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            params[name] = value
+    return params
+
+
+def _error(code: int, description: str, parameters: Optional[dict] = None) -> web.Response:
+    body = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return web.json_response(body, status=code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, с")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля ответов 429 (0..1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответах 429, с")
+    parser.add_argument("--member-count", type=int, default=10, help="ответ getChatMemberCount")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    api = FakeTelegramAPI(
+        latency=args.latency,
+        jitter=args.jitter,
+        flood_rate=args.flood_rate,
+        retry_after=args.retry_after,
+        member_count=args.member_count
+    )
+    logger.info(f"Fake Telegram API on http://{args.host}:{args.port}")
+    web.run_app(api.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
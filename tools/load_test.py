@@ -0,0 +1,89 @@
+"""Нагрузочный прогон бота через tools/fake_telegram_api.py.
+
+Подаёт N сообщений от нескольких пользователей и ждёт, пока бот ответит на
+каждое, затем печатает пропускную способность и задержку ответа.
+
+Запуск из корня проекта (бот запущен с TELEGRAM_API_URL на фейковый сервер):
+    python tools/fake_telegram_api.py --port 8081 &
+    python -m bot.main &
+    python tools/load_test.py --url http://127.0.0.1:8081 --updates 500 --users 50
+"""
+import argparse
+import asyncio
+import time
+
+from aiohttp import ClientSession
+
+# Методы, которыми бот отвечает пользователю
+REPLY_METHODS = ("sendMessage", "editMessageText", "answerCallbackQuery")
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run(url: str, updates: int, users: int, text: str, first_user: int, timeout: float):
+    async with ClientSession() as http:
+        async with http.post(f"{url}/_control/reset") as response:
+            await response.read()
+
+        pushed = {}
+        started = time.time()
+        for i in range(updates):
+            user_id = first_user + i % users
+            pushed.setdefault(user_id, []).append(time.time())
+            async with http.post(f"{url}/_control/message", json={"user_id": user_id, "text": text}) as response:
+                await response.read()
+
+        # Первый ответ в чат после каждого сообщения считается ответом на него
+        latencies = []
+        answered = 0
+        deadline = started + timeout
+        while time.time() < deadline:
+            async with http.get(f"{url}/_control/calls") as response:
+                calls = [call for call in await response.json() if call["method"] in REPLY_METHODS]
+            replies = {}
+            for call in calls:
+                chat_id = call["params"].get("chat_id")
+                if chat_id is not None:
+                    replies.setdefault(int(chat_id), []).append(call["at"])
+            answered = sum(min(len(replies.get(user_id, [])), len(times)) for user_id, times in pushed.items())
+            if answered >= updates:
+                latencies = [
+                    reply - sent
+                    for user_id, times in pushed.items()
+                    for sent, reply in zip(times, replies[user_id])
+                ]
+                break
+            await asyncio.sleep(0.2)
+
+        elapsed = time.time() - started
+        if not latencies:
+            print(f"Бот ответил на {answered} из {updates} сообщений за {elapsed:.1f} с")
+            return
+
+        finished = max(call["at"] for call in calls)
+        print(f"Сообщений: {updates} от {users} пользователей")
+        print(f"Время: {finished - started:.2f} с, {updates / (finished - started):.1f} апдейтов/с")
+        print(
+            f"Задержка ответа: p50={percentile(latencies, 0.5) * 1000:.0f} мс, "
+            f"p95={percentile(latencies, 0.95) * 1000:.0f} мс, "
+            f"max={max(latencies) * 1000:.0f} мс"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон бота через фейковый Bot API")
+    parser.add_argument("--url", default="http://127.0.0.1:8081")
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--text", default="/start")
+    parser.add_argument("--first-user", type=int, default=1000000)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.updates, args.users, args.text, args.first_user, args.timeout))
+
+
+if __name__ == "__main__":
+    main()